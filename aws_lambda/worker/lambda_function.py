@@ -79,8 +79,8 @@ def lambda_handler(event, context):
                 
                 if chunks:
                     print(f"  Storing {len(chunks)} chunks in Chroma...")
-                    # 4. Upsert into ChromaDB (HttpClient)
-                    ingestor.db.add_documents(chunks, metas, ids)
+                    # 4. Upsert changed chunks into ChromaDB (HttpClient) and drop orphans
+                    ingestor.db.upsert_changed(chunks, metas, ids)
                     processed_count += 1
                 else:
                     print(f"  No content found for {page_id} after chunking.")
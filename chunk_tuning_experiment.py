@@ -174,6 +174,14 @@ import chromadb
 from chromadb.api.types import EmbeddingFunction, Documents, Embeddings
 from dotenv import load_dotenv
 from google import genai
+from google.genai import errors as genai_errors
+
+from src.backend.utils.rate_limiter import (
+    estimate_tokens,
+    get_rate_limiter,
+    is_rate_limit_error,
+    parse_retry_delay,
+)
 
 load_dotenv()
 
@@ -182,38 +190,42 @@ EMBED_MODEL = "gemini-embedding-001"
 
 class NewGoogleEmbedder(EmbeddingFunction):
     """Embedder using the current google.genai SDK and gemini-embedding-001.
-    Includes rate-limit handling: pauses between batches of 80 to stay under
-    the free-tier limit of 100 embed requests/minute.
+    Paces calls with the shared Gemini embedding rate limiter (the same one
+    the backend uses) and retries on 429 after the server's retryDelay.
     """
 
-    BATCH_SIZE = 80   # embeddings per batch (free tier = 100 req/min)
-    PAUSE_SECS = 45   # seconds to wait between batches
+    MAX_RETRIES = 5
 
     def __init__(self):
         api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
         if not api_key:
             raise ValueError("GEMINI_API_KEY or GOOGLE_API_KEY not set")
         self.client = genai.Client(api_key=api_key)
-        self._call_count = 0  # track calls within a minute window
+        self.rate_limiter = get_rate_limiter("gemini-embedding")
 
     def __call__(self, input: Documents) -> Embeddings:
         if not input:
             return []
         embeddings = []
-        for idx, doc in enumerate(input):
+        for doc in input:
             if not doc.strip():
                 continue
 
-            # Rate-limit: pause after every BATCH_SIZE calls
-            if self._call_count > 0 and self._call_count % self.BATCH_SIZE == 0:
-                print(f"    ⏳ Rate limit: pausing {self.PAUSE_SECS}s after {self._call_count} embeddings...")
-                time.sleep(self.PAUSE_SECS)
-
-            result = self.client.models.embed_content(
-                model=EMBED_MODEL, contents=doc
-            )
-            embeddings.append(result.embeddings[0].values)
-            self._call_count += 1
+            for attempt in range(self.MAX_RETRIES):
+                self.rate_limiter.acquire(tokens=estimate_tokens(doc))
+                try:
+                    result = self.client.models.embed_content(
+                        model=EMBED_MODEL, contents=doc
+                    )
+                except genai_errors.APIError as e:
+                    if is_rate_limit_error(e) and attempt < self.MAX_RETRIES - 1:
+                        wait = self.rate_limiter.on_rate_limited(parse_retry_delay(e))
+                        print(f"    ⏳ Rate limited: retrying in {wait:.0f}s...")
+                        continue
+                    raise
+                self.rate_limiter.on_success()
+                embeddings.append(result.embeddings[0].values)
+                break
 
         return embeddings
 
@@ -255,7 +267,7 @@ def run_experiment(config: dict, raw_docs: list[dict]) -> ExperimentResult:
         name=COLLECTION, embedding_function=embedder
     )
 
-    # Add documents in batches to let the embedder pace its API calls
+    # Add documents in batches; the embedder's rate limiter paces API calls
     BATCH = 80
     for batch_start in range(0, len(texts), BATCH):
         batch_end = min(batch_start + BATCH, len(texts))
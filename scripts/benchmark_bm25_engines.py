@@ -0,0 +1,121 @@
+"""
+BM25 query engine benchmark: bm25s retrieve vs the segment engines.
+
+Builds synthetic Zipf-distributed corpora directly as BM25 postings (same
+lucene scoring as bm25s, computed with NumPy so 1M chunks build in seconds)
+and times top-k queries with:
+    bm25s        bm25s.BM25.retrieve (the library default)
+    exhaustive   BM25Segment.retrieve, every posting of the query terms
+    maxscore     BM25Segment.retrieve with MaxScore early termination
+Queries are a few terms drawn from random chunks, so they mix common and
+rare terms the way real questions do. Every engine's top-k scores are
+checked against exhaustive scoring.
+
+Usage:
+    uv run python scripts/benchmark_bm25_engines.py
+    uv run python scripts/benchmark_bm25_engines.py --docs 100000 1000000 --k 10 50
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def synthetic_segment(docs: int, max_len: int, vocab: int, zipf: float, seed: int):
+    """A BM25Segment over random documents, plus each document's terms for sampling queries."""
+    import bm25s
+
+    from src.backend.load.bm25_chunk_store import ChunkStore
+    from src.backend.load.bm25_shard import BM25Segment
+
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(max_len // 4, max_len + 1, size=docs)
+    terms = np.minimum(rng.zipf(zipf, size=(docs, max_len)) - 1, vocab - 1)
+    positions = np.arange(max_len) < lengths[:, None]
+    doc_of = np.broadcast_to(np.arange(docs)[:, None], terms.shape)[positions]
+    pairs, tf = np.unique(terms[positions].astype(np.int64) * docs + doc_of, return_counts=True)
+    term_of, doc_of = np.divmod(pairs, docs)
+
+    # bm25s defaults: lucene idf and term frequency saturation, k1=1.5, b=0.75
+    k1, b = 1.5, 0.75
+    df = np.bincount(term_of, minlength=vocab)
+    idf = np.log(1 + (docs - df + 0.5) / (df + 0.5))
+    norm = k1 * (1 - b + b * lengths / lengths.mean())
+    data = (idf[term_of] * tf / (tf + norm[doc_of])).astype(np.float32)
+    indptr = np.concatenate([[0], np.cumsum(df)])
+
+    index = bm25s.BM25()
+    index.scores = {"data": data, "indices": doc_of.astype(np.int32), "indptr": indptr, "num_docs": docs}
+    index.vocab_dict = {f"t{i}": i for i in range(vocab)}
+    index.nonoccurrence_array = None
+    store = ChunkStore.build([str(i) for i in range(docs)], [""] * docs, [{}] * docs)
+    segment = BM25Segment(index, store, tf=tf.astype(np.float32), doc_len=lengths.astype(np.int32))
+    return segment, terms, lengths
+
+
+def sample_queries(terms: np.ndarray, lengths: np.ndarray, count: int, seed: int) -> list[list[str]]:
+    rng = np.random.default_rng(seed + 1)
+    queries = []
+    for doc in rng.integers(0, len(terms), size=count):
+        words = terms[doc, :lengths[doc]]
+        picked = rng.choice(words, size=min(int(rng.integers(2, 6)), len(words)), replace=False)
+        queries.append([f"t{t}" for t in picked])
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency of the BM25 query engines on synthetic corpora")
+    parser.add_argument("--docs", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--max-len", type=int, default=60, help="Maximum indexed terms per chunk")
+    parser.add_argument("--vocab", type=int, default=200_000)
+    parser.add_argument("--zipf", type=float, default=1.3, help="Zipf exponent of term frequencies")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, nargs="+", default=[10])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for docs in args.docs:
+        t0 = time.perf_counter()
+        segment, terms, lengths = synthetic_segment(docs, args.max_len, args.vocab, args.zipf, args.seed)
+        queries = sample_queries(terms, lengths, args.queries, args.seed)
+        del terms
+        postings = len(segment.index.scores["data"])
+        print(f"\n{docs} chunks, {postings} postings (built in {time.perf_counter() - t0:.1f}s), "
+              f"{len(queries)} queries")
+        print(f"{'k':>4} {'Engine':<11} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8} {'exact':>7}")
+        print("─" * 52)
+        # Length norms are computed on the first query
+        segment.retrieve(queries[0], 1)
+
+        for k in args.k:
+            runs = {
+                "bm25s": lambda q: segment.index.retrieve([q], k=k, show_progress=False, return_as="tuple"),
+                "exhaustive": lambda q: segment.retrieve(q, k, engine="exhaustive"),
+                "maxscore": lambda q: segment.retrieve(q, k, engine="maxscore"),
+            }
+            reference = [[score for score, _ in segment.retrieve(q, k, engine="exhaustive")] for q in queries]
+            for name, run in runs.items():
+                latencies, exact = [], 0
+                for query, expected in zip(queries, reference):
+                    t0 = time.perf_counter()
+                    result = run(query)
+                    latencies.append((time.perf_counter() - t0) * 1000)
+                    scores = result[1][0] if name == "bm25s" else [score for score, _ in result]
+                    exact += np.allclose(scores, expected, rtol=1e-4)
+                latencies = np.asarray(latencies)
+                print(f"{k:>4} {name:<11} {np.percentile(latencies, 50):>8.2f} "
+                      f"{np.percentile(latencies, 95):>8.2f} {latencies.mean():>8.2f} "
+                      f"{exact / len(queries):>7.0%}")
+
+
+if __name__ == "__main__":
+    main()
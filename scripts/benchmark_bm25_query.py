@@ -0,0 +1,116 @@
+"""
+BM25 query micro-benchmark: tokenize and tokenize + retrieve latency.
+
+Compares per-query bm25s.tokenize (which builds a throwaway vocabulary for
+every query) with the index's saved BM25Tokenizer, both with a cold query
+cache and with repeated questions. Runs against a saved index directory, or
+against a synthetic corpus when --index is not given.
+
+Usage:
+    uv run python scripts/benchmark_bm25_query.py
+    uv run python scripts/benchmark_bm25_query.py --docs 100000 --queries 500
+    uv run python scripts/benchmark_bm25_query.py --index workmate_db/bm25_index
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def synthetic_manager(docs: int, words_per_doc: int, vocab_size: int, seed: int):
+    """In-memory index over Zipf-distributed words (plus some stopwords)."""
+    from src.backend.load.bm25_manager import BM25Manager
+
+    rng = np.random.default_rng(seed)
+    vocab = np.array([f"term{i}" for i in range(vocab_size)] + ["the", "and", "of", "to"])
+    word_ids = np.minimum(rng.zipf(1.2, size=(docs, words_per_doc)) - 1, len(vocab) - 1)
+    chunks = [" ".join(vocab[row]) for row in word_ids]
+    manager = BM25Manager()
+    manager.build_index(chunks, [{"workspace_id": "bench"} for _ in chunks], [str(i) for i in range(docs)])
+    return manager
+
+
+def sample_queries(manager, count: int, seed: int) -> list[str]:
+    """Questions made of a few words from random indexed chunks, plus a term no chunk has."""
+    rng = random.Random(seed)
+    segments = [s for shard in manager.shards.values() for s in shard.segments if len(s)]
+    queries = []
+    for _ in range(count):
+        segment = rng.choice(segments)
+        words = segment.docs[rng.randrange(len(segment))][1].split()
+        queries.append(" ".join(rng.sample(words, min(4, len(words))) + ["whatisthis"]))
+    return queries
+
+
+def timed(fn, queries) -> np.ndarray:
+    latencies = []
+    for query in queries:
+        t0 = time.perf_counter()
+        fn(query)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return np.asarray(latencies)
+
+
+def main():
+    import bm25s
+
+    from src.backend.load.bm25_manager import BM25Manager
+
+    parser = argparse.ArgumentParser(description="Query tokenize + retrieve latency of the BM25 index")
+    parser.add_argument("--index", help="Saved BM25 index directory (default: a synthetic corpus)")
+    parser.add_argument("--docs", type=int, default=50_000)
+    parser.add_argument("--words-per-doc", type=int, default=120)
+    parser.add_argument("--vocab", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.index:
+        manager = BM25Manager()
+        manager.load(args.index)
+    else:
+        t0 = time.perf_counter()
+        manager = synthetic_manager(args.docs, args.words_per_doc, args.vocab, args.seed)
+        print(f"Built a synthetic index of {args.docs} chunks in {time.perf_counter() - t0:.1f}s")
+    queries = sample_queries(manager, args.queries, args.seed)
+    tokenizer = manager.tokenizer
+    shards = list(manager.shards.values())
+
+    def bm25s_tokenize(query):
+        return bm25s.tokenize([query.lower()], return_ids=False, show_progress=False)[0]
+
+    def retrieve(terms):
+        for shard in shards:
+            shard.search(terms, args.k)
+
+    runs = [
+        ("bm25s.tokenize", bm25s_tokenize, lambda q: retrieve(bm25s_tokenize(q))),
+        ("BM25Tokenizer (cold)", tokenizer._query_terms, lambda q: retrieve(tokenizer._query_terms(q))),
+        ("BM25Tokenizer (cached)", tokenizer.query_terms, lambda q: retrieve(tokenizer.query_terms(q))),
+    ]
+    # Prime the cache and the memory-mapped pages before timing
+    for query in queries:
+        retrieve(tokenizer.query_terms(query))
+
+    print(f"{args.queries} queries, k={args.k}\n")
+    print(f"{'Tokenizer':<24} {'tok p50':>8} {'tok p95':>8} {'total p50':>10} {'total p95':>10}  (ms)")
+    print("─" * 66)
+    for name, tokenize, total in runs:
+        tok, full = timed(tokenize, queries), timed(total, queries)
+        print(f"{name:<24} {np.percentile(tok, 50):>8.3f} {np.percentile(tok, 95):>8.3f} "
+              f"{np.percentile(full, 50):>10.3f} {np.percentile(full, 95):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
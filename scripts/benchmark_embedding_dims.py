@@ -0,0 +1,125 @@
+"""
+Recall benchmark for reduced-dimension and half-precision vector storage.
+
+Loads the full-size vectors from a Chroma collection, uses a random sample of
+them as queries (leave-one-out), and reports recall@k of each index option
+against exact full-size search. No embedding API calls are made.
+
+Index options are what the vector store can actually hold: any
+EMBEDDING_DIMENSION, in float32 (Chroma or the numpy backend) or float16
+(VECTOR_BACKEND=numpy with NUMPY_VECTOR_DTYPE=float16). The "+Rescore" column
+reranks oversampled candidates with the full-size float32 vectors, as
+RESCORE_OVERSAMPLE does from the rescore store.
+
+Usage:
+    uv run python scripts/benchmark_embedding_dims.py
+    uv run python scripts/benchmark_embedding_dims.py --dims 256 768 1536 --k 10 --oversample 3
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+PAGE_SIZE = 1000
+
+
+def load_vectors(collection_name: str) -> np.ndarray:
+    from src.backend.load.chroma_manager import create_chroma_client
+
+    collection = create_chroma_client().get_collection(collection_name)
+    total = collection.count()
+    pages = []
+    for offset in range(0, total, PAGE_SIZE):
+        page = collection.get(limit=PAGE_SIZE, offset=offset, include=["embeddings"])
+        pages.append(np.asarray(page["embeddings"], dtype=np.float32))
+    return np.concatenate(pages) if pages else np.empty((0, 0), dtype=np.float32)
+
+
+def top_k(matrix: np.ndarray, queries: np.ndarray, query_rows: np.ndarray, k: int) -> np.ndarray:
+    """Exact top-k by inner product, excluding each query's own row."""
+    scores = queries @ matrix.T
+    scores[np.arange(len(query_rows)), query_rows] = -np.inf
+    candidates = np.argpartition(-scores, k, axis=1)[:, :k]
+    order = np.take_along_axis(scores, candidates, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(f[:k]) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def compress(matrix: np.ndarray, dimension: int, dtype: str) -> np.ndarray:
+    from src.backend.load.quantization import dequantize, quantize, reduce_dimension
+
+    reduced = reduce_dimension(matrix, dimension)
+    if dtype == "float32":
+        return reduced
+    return np.stack([dequantize(quantize(v, dtype), dtype) for v in reduced])
+
+
+def bytes_per_vector(dimension: int, dtype: str) -> int:
+    return dimension * {"float32": 4, "float16": 2, "int8": 1}[dtype] + (4 if dtype == "int8" else 0)
+
+
+def main():
+    from src.backend.load.quantization import l2_normalize
+
+    parser = argparse.ArgumentParser(description="Recall@k of reduced / quantized embeddings")
+    parser.add_argument("--collection", default="notion_docs")
+    parser.add_argument("--dims", type=int, nargs="+", default=[256, 768, 1536])
+    parser.add_argument(
+        "--dtypes", nargs="+", default=["float32", "float16"],
+        help="Index precisions (int8 is only available for the embedding cache, not the index)",
+    )
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200, help="Number of sampled query vectors")
+    parser.add_argument("--oversample", type=int, default=3, help="Candidate multiplier for rescoring")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    full = l2_normalize(load_vectors(args.collection))
+    n, native_dim = full.shape if full.size else (0, 0)
+    if n <= args.k * args.oversample:
+        print(f"ERROR: need more than {args.k * args.oversample} vectors, found {n}.")
+        sys.exit(1)
+
+    rng = np.random.default_rng(args.seed)
+    query_rows = rng.choice(n, size=min(args.queries, n), replace=False)
+    truth = top_k(full, full[query_rows], query_rows, args.k)
+
+    print(f"{n} vectors x {native_dim} dims, {len(query_rows)} queries, k={args.k}\n")
+    print(f"{'Dims':>5} {'Dtype':>8} {'Bytes/vec':>10} {f'Recall@{args.k}':>10} "
+          f"{'+Rescore':>9} {'ms/query':>9}")
+    print("─" * 56)
+    for dimension in args.dims:
+        if dimension > native_dim:
+            continue
+        for dtype in args.dtypes:
+            approx = compress(full, dimension, dtype)
+            queries = approx[query_rows]
+
+            t0 = time.perf_counter()
+            found = top_k(approx, queries, query_rows, args.k)
+            elapsed_ms = (time.perf_counter() - t0) * 1000 / len(query_rows)
+
+            # Rescore an oversampled candidate set with the full-size vectors
+            candidates = top_k(approx, queries, query_rows, args.k * args.oversample)
+            full_scores = np.einsum("qd,qcd->qc", full[query_rows], full[candidates])
+            rescored = np.take_along_axis(candidates, (-full_scores).argsort(axis=1), axis=1)
+
+            print(f"{dimension:>5} {dtype:>8} {bytes_per_vector(dimension, dtype):>10} "
+                  f"{recall(found, truth):>10.3f} {recall(rescored, truth):>9.3f} {elapsed_ms:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+HNSW parameter benchmark: query latency and recall@k against exact search.
+
+Builds an in-memory Chroma index from the vectors in the embedding cache for
+every combination of space / construction_ef / M / search_ef and reports
+p50/p95 query latency and recall@k against brute-force search in the same
+space. Chroma reads search_ef when it loads an index, so each setting gets
+its own build. Queries are held-out cached vectors, so no embedding API calls
+are made.
+
+Usage:
+    uv run python scripts/benchmark_hnsw.py
+    uv run python scripts/benchmark_hnsw.py --spaces cosine --construction-ef 100 200 \\
+        --M 16 32 --search-ef 10 50 100 200 --k 10
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def exact_top_k(index: np.ndarray, queries: np.ndarray, k: int, space: str) -> np.ndarray:
+    """Brute-force top-k row indices in the given HNSW space."""
+    from src.backend.load.quantization import l2_normalize
+
+    if space == "cosine":
+        scores = l2_normalize(queries) @ l2_normalize(index).T
+    elif space == "ip":
+        scores = queries @ index.T
+    else:
+        # Negative squared L2 distance, so larger is closer in every space
+        scores = 2 * queries @ index.T - (index ** 2).sum(axis=1)
+    candidates = np.argpartition(-scores, k, axis=1)[:, :k]
+    order = np.take_along_axis(scores, candidates, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def build_collection(client, name, index: np.ndarray, space, construction_ef, M, search_ef):
+    from src.backend.load.chroma_manager import hnsw_configuration
+
+    collection = client.create_collection(
+        name,
+        configuration=hnsw_configuration(
+            space=space, construction_ef=construction_ef, search_ef=search_ef, M=M
+        ),
+    )
+    batch = client.get_max_batch_size()
+    for start in range(0, len(index), batch):
+        rows = index[start:start + batch]
+        collection.add(
+            ids=[str(i) for i in range(start, start + len(rows))],
+            embeddings=rows,
+        )
+    return collection
+
+
+def run_queries(collection, queries: np.ndarray, k: int):
+    latencies, found = [], []
+    for query in queries:
+        t0 = time.perf_counter()
+        result = collection.query(query_embeddings=[query], n_results=k, include=[])
+        latencies.append((time.perf_counter() - t0) * 1000)
+        found.append([int(i) for i in result["ids"][0]])
+    return np.asarray(latencies), found
+
+
+def recall(found, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(f[:k]) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def main():
+    import chromadb
+
+    from src.backend.load.chroma_manager import HNSW_SPACES
+    from src.backend.load.embedding_cache import EmbeddingCache
+    from src.backend.load.quantization import reduce_dimension
+
+    parser = argparse.ArgumentParser(description="Recall/latency of HNSW settings against exact search")
+    parser.add_argument("--namespace", default="gemini-embedding-001",
+                        help="Embedding cache namespace to load (e.g. gemini-embedding-001@768)")
+    parser.add_argument("--limit", type=int, default=0, help="Maximum number of cached vectors to use")
+    parser.add_argument("--dimension", type=int, help="Truncate vectors to this size before indexing")
+    parser.add_argument("--spaces", nargs="+", default=["l2", "cosine"], choices=HNSW_SPACES)
+    parser.add_argument("--construction-ef", type=int, nargs="+", default=[100, 200])
+    parser.add_argument("--M", type=int, nargs="+", default=[16, 32])
+    parser.add_argument("--search-ef", type=int, nargs="+", default=[10, 50, 100, 200])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200, help="Number of held-out query vectors")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    vectors = EmbeddingCache().vectors_for(args.namespace, limit=args.limit or None)
+    if len(vectors) <= args.queries + args.k:
+        print(f"ERROR: need more than {args.queries + args.k} cached vectors for "
+              f"'{args.namespace}', found {len(vectors)}.")
+        sys.exit(1)
+    matrix = reduce_dimension(np.stack(vectors), args.dimension)
+
+    rng = np.random.default_rng(args.seed)
+    order = rng.permutation(len(matrix))
+    queries, index = matrix[order[:args.queries]], matrix[order[args.queries:]]
+
+    print(f"{len(index)} indexed vectors x {matrix.shape[1]} dims, {len(queries)} queries, k={args.k}\n")
+    print(f"{'Space':>6} {'ConstrEF':>8} {'M':>4} {'SearchEF':>8} {'Build s':>8} "
+          f"{'p50 ms':>7} {'p95 ms':>7} {f'Recall@{args.k}':>10}")
+    print("─" * 66)
+
+    client = chromadb.EphemeralClient()
+    for space in args.spaces:
+        truth = exact_top_k(index, queries, args.k, space)
+
+        t0 = time.perf_counter()
+        for query in queries:
+            exact_top_k(index, query[None, :], args.k, space)
+        exact_ms = (time.perf_counter() - t0) * 1000 / len(queries)
+        print(f"{space:>6} {'exact':>8} {'':>4} {'':>8} {'':>8} {exact_ms:>7.2f} {'':>7} {1.0:>10.3f}")
+
+        for construction_ef in args.construction_ef:
+            for M in args.M:
+                for search_ef in args.search_ef:
+                    name = f"hnsw_bench_{space}_{construction_ef}_{M}_{search_ef}"
+                    t0 = time.perf_counter()
+                    collection = build_collection(
+                        client, name, index, space, construction_ef, M, search_ef
+                    )
+                    build_s = time.perf_counter() - t0
+
+                    latencies, found = run_queries(collection, queries, args.k)
+                    print(f"{space:>6} {construction_ef:>8} {M:>4} {search_ef:>8} {build_s:>8.1f} "
+                          f"{np.percentile(latencies, 50):>7.2f} {np.percentile(latencies, 95):>7.2f} "
+                          f"{recall(found, truth):>10.3f}")
+                    client.delete_collection(name)
+
+    print("\nApply a setting with CHROMA_HNSW_SPACE / CHROMA_HNSW_CONSTRUCTION_EF / "
+          "CHROMA_HNSW_M (new collections) and CHROMA_HNSW_SEARCH_EF (all collections).")
+
+
+if __name__ == "__main__":
+    main()
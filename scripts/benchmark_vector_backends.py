@@ -0,0 +1,154 @@
+"""
+Vector backend benchmark: the in-process NumPy store vs Chroma.
+
+Loads the same synthetic embeddings (spread over a few workspaces) into
+    numpy        NumpyVectorClient, float32 and float16 storage
+    persistent   chromadb.PersistentClient (HNSW, in this process)
+    http         chromadb.HttpClient, when --chroma-host is given
+and reports load time, p50/p95 query latency with a workspace filter (the
+filter every chat request sends) and recall@k against exact search. Only
+the collection APIs ChromaManager calls are used, so no embedding API calls
+are made. Collections are built in a temporary directory (and a temporary
+collection on the Chroma server, deleted afterwards).
+
+Usage:
+    uv run python scripts/benchmark_vector_backends.py
+    uv run python scripts/benchmark_vector_backends.py --docs 10000 100000 --dimension 768
+    uv run python scripts/benchmark_vector_backends.py --chroma-host localhost --chroma-port 8000
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+UPSERT_BATCH = 1000
+
+
+def synthetic_corpus(docs: int, dimension: int, workspaces: int, seed: int):
+    """Unit vectors around a few hundred topics, so neighbourhoods look like real embeddings."""
+    from src.backend.load.quantization import l2_normalize
+
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(max(docs // 50, 1), dimension))
+    vectors = l2_normalize(topics[rng.integers(0, len(topics), size=docs)] + rng.normal(size=(docs, dimension)))
+    # A sync writes each workspace's chunks together
+    metadatas = [
+        {"workspace_id": f"ws{i * workspaces // docs}", "parent_id": f"p{i // 8}"} for i in range(docs)
+    ]
+    return vectors, metadatas
+
+
+def load(collection, vectors: np.ndarray, metadatas: list[dict]) -> float:
+    t0 = time.perf_counter()
+    for start in range(0, len(vectors), UPSERT_BATCH):
+        stop = start + UPSERT_BATCH
+        collection.upsert(
+            ids=[str(i) for i in range(start, min(stop, len(vectors)))],
+            embeddings=vectors[start:stop],
+            metadatas=metadatas[start:stop],
+            documents=[f"chunk {i}" for i in range(start, min(stop, len(vectors)))],
+        )
+    return time.perf_counter() - t0
+
+
+def run_queries(collection, queries: np.ndarray, wheres: list[dict], k: int):
+    latencies, found = [], []
+    for query, where in zip(queries, wheres):
+        t0 = time.perf_counter()
+        result = collection.query(
+            query_embeddings=[query], n_results=k, where=where,
+            include=["documents", "metadatas", "distances"],
+        )
+        latencies.append((time.perf_counter() - t0) * 1000)
+        found.append([int(i) for i in result["ids"][0]])
+    return np.asarray(latencies), found
+
+
+def exact_top_k(vectors: np.ndarray, metadatas: list[dict], queries: np.ndarray, wheres: list[dict], k: int):
+    workspace_of = np.array([m["workspace_id"] for m in metadatas])
+    truth = []
+    for query, where in zip(queries, wheres):
+        rows = np.flatnonzero(workspace_of == where["workspace_id"])
+        scores = vectors[rows] @ query
+        truth.append(rows[np.argsort(-scores)[:k]].tolist())
+    return truth
+
+
+def recall(found, truth) -> float:
+    return float(np.mean([len(set(f) & set(t)) / max(len(t), 1) for f, t in zip(found, truth)]))
+
+
+def main():
+    import chromadb
+
+    from src.backend.load.numpy_vector_store import NumpyVectorClient
+
+    parser = argparse.ArgumentParser(description="Latency/recall of the NumPy vector store vs Chroma clients")
+    parser.add_argument("--docs", type=int, nargs="+", default=[10_000, 50_000])
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--workspaces", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--space", default="cosine", choices=["l2", "cosine", "ip"])
+    parser.add_argument("--chroma-host", help="Also benchmark an HttpClient against this Chroma server")
+    parser.add_argument("--chroma-port", default="8000")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for docs in args.docs:
+        vectors, metadatas = synthetic_corpus(docs, args.dimension, args.workspaces, args.seed)
+        rng = np.random.default_rng(args.seed + 1)
+        queries = vectors[rng.integers(0, docs, size=args.queries)] + rng.normal(
+            scale=0.02, size=(args.queries, args.dimension)
+        ).astype(np.float32)
+        wheres = [{"workspace_id": f"ws{i % args.workspaces}"} for i in range(args.queries)]
+        truth = exact_top_k(vectors, metadatas, queries, wheres, args.k)
+
+        print(f"\n{docs} chunks x {args.dimension} dims, {args.workspaces} workspaces, "
+              f"{args.queries} filtered queries, k={args.k}")
+        print(f"{'Backend':<18} {'Load s':>7} {'p50 ms':>8} {'p95 ms':>8} {f'Recall@{args.k}':>10}")
+        print("─" * 55)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            backends = [
+                ("numpy float32", lambda: NumpyVectorClient(f"{tmp}/numpy32", dtype="float32")),
+                ("numpy float16", lambda: NumpyVectorClient(f"{tmp}/numpy16", dtype="float16")),
+                ("persistent", lambda: chromadb.PersistentClient(path=f"{tmp}/chroma")),
+            ]
+            if args.chroma_host:
+                backends.append(
+                    ("http", lambda: chromadb.HttpClient(host=args.chroma_host, port=args.chroma_port))
+                )
+
+            for name, make_client in backends:
+                client = make_client()
+                collection_name = f"vector_bench_{uuid.uuid4().hex[:8]}"
+                collection = client.get_or_create_collection(
+                    collection_name, configuration={"hnsw": {"space": args.space}}
+                )
+                try:
+                    load_s = load(collection, vectors, metadatas)
+                    # Warm up caches and memory-mapped pages
+                    run_queries(collection, queries[:10], wheres[:10], args.k)
+                    latencies, found = run_queries(collection, queries, wheres, args.k)
+                    print(f"{name:<18} {load_s:>7.1f} {np.percentile(latencies, 50):>8.2f} "
+                          f"{np.percentile(latencies, 95):>8.2f} {recall(found, truth):>10.3f}")
+                finally:
+                    client.delete_collection(collection_name)
+
+    print("\nUse the in-process store with VECTOR_BACKEND=numpy (NUMPY_VECTOR_DTYPE=float16 to halve its size).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Migrate the shared Chroma collection to the per-workspace layout.
+
+Copies every chunk that has a workspace_id (with its stored embedding, so no
+embedding API calls are made) into that workspace's own collection. Chunks
+without a workspace (file uploads) stay in the base collection.
+
+Usage:
+    uv run python scripts/migrate_to_workspace_collections.py
+    uv run python scripts/migrate_to_workspace_collections.py --delete-source-chunks
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+PAGE_SIZE = 500
+
+
+def migrate(collection_name: str, delete_source_chunks: bool):
+    from src.backend.load.chroma_manager import (
+        HNSW_SETTINGS,
+        create_chroma_client,
+        hnsw_configuration,
+        workspace_collection_name,
+    )
+
+    client = create_chroma_client()
+    source = client.get_collection(collection_name)
+    targets = {}
+    migrated_ids = []
+    per_workspace = {}
+
+    total = source.count()
+    print(f"Migrating {total} chunks from '{collection_name}' to per-workspace collections")
+
+    for offset in range(0, total, PAGE_SIZE):
+        page = source.get(
+            limit=PAGE_SIZE,
+            offset=offset,
+            include=["documents", "metadatas", "embeddings"],
+        )
+        if not page["ids"]:
+            break
+
+        groups = {}
+        for i, meta in enumerate(page["metadatas"]):
+            workspace_id = (meta or {}).get("workspace_id")
+            if workspace_id:
+                groups.setdefault(workspace_id, []).append(i)
+
+        for workspace_id, rows in groups.items():
+            name = workspace_collection_name(collection_name, workspace_id)
+            if name not in targets:
+                targets[name] = client.get_or_create_collection(
+                    name, configuration=hnsw_configuration(**HNSW_SETTINGS)
+                )
+            targets[name].upsert(
+                ids=[page["ids"][i] for i in rows],
+                documents=[page["documents"][i] for i in rows],
+                metadatas=[page["metadatas"][i] for i in rows],
+                embeddings=[page["embeddings"][i] for i in rows],
+            )
+            migrated_ids.extend(page["ids"][i] for i in rows)
+            per_workspace[workspace_id] = per_workspace.get(workspace_id, 0) + len(rows)
+
+        print(f"  {min(offset + PAGE_SIZE, total)}/{total}")
+
+    for workspace_id, count in sorted(per_workspace.items(), key=lambda item: -item[1]):
+        print(f"  {workspace_id}: {count} chunks")
+    print(f"Copied {len(migrated_ids)} chunks into {len(targets)} workspace collections; "
+          f"{total - len(migrated_ids)} chunks without a workspace stay in '{collection_name}'.")
+
+    # Deleting is done after the copy so an interrupted run can simply be restarted
+    if delete_source_chunks:
+        for start in range(0, len(migrated_ids), PAGE_SIZE):
+            source.delete(ids=migrated_ids[start:start + PAGE_SIZE])
+        print(f"Removed the migrated chunks from '{collection_name}'.")
+
+    print("\nDone. Set CHROMA_COLLECTION_LAYOUT=per_workspace for the API and ingestion processes.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Split a shared Chroma collection into one per workspace")
+    parser.add_argument("--collection", default="notion_docs", help="Collection to split (default: notion_docs)")
+    parser.add_argument(
+        "--delete-source-chunks", action="store_true",
+        help="Remove migrated chunks from the shared collection once copied",
+    )
+    args = parser.parse_args()
+
+    migrate(args.collection, args.delete_source_chunks)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Re-project an existing Chroma collection to a smaller embedding dimension.
+
+Vectors are truncated and re-normalized locally (gemini-embedding-001 is a
+Matryoshka model), so no embedding API calls are made.
+
+Usage:
+    uv run python scripts/reproject_collection.py --dimension 768
+    uv run python scripts/reproject_collection.py --dimension 768 --seed-rescore --replace
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+PAGE_SIZE = 500
+
+
+def reproject(source_name: str, target_name: str, dimension: int, seed_rescore: bool, replace: bool):
+    import numpy as np
+
+    from src.backend.load.chroma_manager import HNSW_SETTINGS, create_chroma_client, hnsw_configuration
+    from src.backend.load.google_embedder import DEFAULT_EMBEDDING_DIM
+    from src.backend.load.quantization import reduce_dimension
+    from src.backend.load.rescore_store import RescoreVectorStore
+
+    client = create_chroma_client()
+    source = client.get_collection(source_name)
+    target = client.get_or_create_collection(
+        target_name, configuration=hnsw_configuration(**HNSW_SETTINGS)
+    )
+    rescore_store = RescoreVectorStore() if seed_rescore else None
+
+    total = source.count()
+    print(f"Re-projecting {total} chunks from '{source_name}' to '{target_name}' ({dimension} dims)")
+
+    for offset in range(0, total, PAGE_SIZE):
+        page = source.get(
+            limit=PAGE_SIZE,
+            offset=offset,
+            include=["documents", "metadatas", "embeddings"],
+        )
+        if not page["ids"]:
+            break
+
+        full = np.asarray(page["embeddings"], dtype=np.float32)
+        if full.shape[1] < dimension:
+            print(f"ERROR: source vectors have {full.shape[1]} dims, cannot project up to {dimension}.")
+            sys.exit(1)
+
+        target.upsert(
+            ids=page["ids"],
+            documents=page["documents"],
+            metadatas=page["metadatas"],
+            embeddings=reduce_dimension(full, dimension),
+        )
+
+        # Keep the full-size vectors locally so RESCORE_OVERSAMPLE can rescore candidates
+        if rescore_store is not None:
+            namespace = "gemini-embedding-001"
+            if full.shape[1] != DEFAULT_EMBEDDING_DIM:
+                namespace = f"{namespace}@{full.shape[1]}"
+            rescore_store.put_many(
+                namespace,
+                page["ids"],
+                page["documents"],
+                [(meta or {}).get("workspace_id") for meta in page["metadatas"]],
+                full,
+            )
+
+        print(f"  {min(offset + PAGE_SIZE, total)}/{total}")
+
+    if replace:
+        # Move the original aside before renaming the target into its place, so a
+        # failure at any step leaves the data under one of the two names
+        backup_name = f"{source_name}_backup"
+        source.modify(name=backup_name)
+        try:
+            target.modify(name=source_name)
+        except Exception:
+            client.get_collection(backup_name).modify(name=source_name)
+            raise
+        client.delete_collection(backup_name)
+        print(f"Replaced '{source_name}' with the re-projected collection.")
+
+    print(
+        f"\nDone. Set EMBEDDING_DIMENSION={dimension}"
+        + (" and RESCORE_OVERSAMPLE (e.g. 3)" if seed_rescore else "")
+        + " for the API and ingestion processes."
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-project a Chroma collection to fewer dimensions")
+    parser.add_argument("--dimension", type=int, required=True, help="Target vector size, e.g. 768")
+    parser.add_argument("--source", default="notion_docs", help="Collection to read (default: notion_docs)")
+    parser.add_argument("--target", help="Collection to write (default: <source>_<dimension>)")
+    parser.add_argument(
+        "--seed-rescore", action="store_true",
+        help="Store the original full-size vectors in the rescore store (RESCORE_VECTORS_PATH)",
+    )
+    parser.add_argument(
+        "--replace", action="store_true",
+        help="Rename the target to the source name, then delete the original source collection",
+    )
+    args = parser.parse_args()
+
+    reproject(
+        args.source,
+        args.target or f"{args.source}_{args.dimension}",
+        args.dimension,
+        args.seed_rescore,
+        args.replace,
+    )
+
+
+if __name__ == "__main__":
+    main()
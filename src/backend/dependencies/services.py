@@ -3,19 +3,26 @@ import os
 
 from fastapi import HTTPException
 
-from src.backend.load.bm25_manager import BM25Manager, BM25_INDEX_PATH
+from src.backend.load.bm25_manager import BM25Manager, BM25_INDEX_PATH, BM25_LEGACY_INDEX_PATH
 from src.backend.load.chroma_manager import ChromaManager
 from src.backend.load.hybrid_retriever import HybridRetriever
 from src.backend.llm.gemini_client import GeminiClient
 from src.backend.llm.voyage_reranker import VoyageReranker
+from src.backend.utils.semantic_cache import SemanticCache
 
 logger = logging.getLogger(__name__)
 
+# Answers to earlier questions, reused for paraphrases (see routers/conversations.py)
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "86400"))
+
 _chroma_manager = None
 _gemini_client = None
 _voyage_reranker = None
 _bm25_manager = None
 _hybrid_retriever = None
+_answer_cache = None
 
 
 def get_chroma_manager() -> ChromaManager:
@@ -59,8 +66,12 @@ def get_bm25_manager() -> BM25Manager:
         _bm25_manager = BM25Manager()
         if os.path.exists(BM25_INDEX_PATH):
             _bm25_manager.load(BM25_INDEX_PATH)
+        elif os.path.exists(BM25_LEGACY_INDEX_PATH):
+            _bm25_manager.load(BM25_LEGACY_INDEX_PATH)
         else:
             logger.warning(f"BM25 index not found at {BM25_INDEX_PATH}. Run NotionIngestor to build it.")
+        # Pick up indexes written by background syncs without a restart
+        _bm25_manager.watch(BM25_INDEX_PATH)
     return _bm25_manager
 
 
@@ -69,3 +80,12 @@ def get_hybrid_retriever() -> HybridRetriever:
     if _hybrid_retriever is None:
         _hybrid_retriever = HybridRetriever(get_chroma_manager(), get_bm25_manager())
     return _hybrid_retriever
+
+
+def get_answer_cache() -> SemanticCache:
+    global _answer_cache
+    if _answer_cache is None:
+        _answer_cache = SemanticCache(
+            ANSWER_CACHE_SIZE, threshold=ANSWER_CACHE_THRESHOLD, ttl_seconds=ANSWER_CACHE_TTL
+        )
+    return _answer_cache
@@ -2,17 +2,27 @@
 from __future__ import annotations
 
 import logging
-import re
 from typing import List, Dict, Any, Optional
 
 from google import genai
 from google.genai import types
 
+from src.backend.utils.rate_limiter import (
+    estimate_tokens,
+    get_rate_limiter,
+    is_rate_limit_error,
+    parse_retry_delay,
+)
+
 from .config import DEFAULT_GEMINI_MODEL_ID
 from . import prompts
 
 logger = logging.getLogger(__name__)
 
+# Returned in place of an answer when generation fails
+GENERATION_ERROR_MESSAGE = "Sorry, something went wrong while generating a response. Please try again."
+RATE_LIMIT_MESSAGE_PREFIX = "I'm currently unable to respond due to API rate limits."
+
 
 class GeminiClient:
     """
@@ -28,6 +38,18 @@ class GeminiClient:
 
         self.client = genai.Client(api_key=api_key)
         self.model_id = model_id or DEFAULT_GEMINI_MODEL_ID
+        self.rate_limiter = get_rate_limiter("gemini-llm")
+
+    def _rate_limit_message(self, error: Exception) -> str:
+        """Report a 429 to the shared limiter and build the user-facing message."""
+        retry_after = parse_retry_delay(error)
+        self.rate_limiter.on_rate_limited(retry_after)
+        retry_secs = f"{retry_after:.0f}" if retry_after is not None else "unknown"
+        logger.warning(
+            f"⚠️  Gemini rate limit hit (model: {self.model_id}). "
+            f"Retry after: {retry_secs}s"
+        )
+        return f"{RATE_LIMIT_MESSAGE_PREFIX} Please try again in about {retry_secs} seconds."
 
     def filter_chunks(
         self, chunks: List[Dict[str, Any]], user_question: str
@@ -36,6 +58,7 @@ class GeminiClient:
         LLM Re-ranking: Asks Gemini to filter out irrelevant chunks before generation.
         Uses sequential chunk_N IDs (chunk_1, chunk_2, ...) for the filter prompt so
         the LLM and the matching logic agree on the same ID format.
+        Blocks while waiting for rate limit budget, so call it off the event loop.
         """
         if not chunks:
             return []
@@ -57,11 +80,13 @@ class GeminiClient:
         )
 
         try:
+            self.rate_limiter.acquire(tokens=estimate_tokens(prompt) + cfg.max_output_tokens)
             response = self.client.models.generate_content(
                 model=self.model_id,
                 contents=prompt,
                 config=cfg,
             )
+            self.rate_limiter.on_success()
             output = getattr(response, "text", "") or ""
             print(f"Re-ranker Output: {output}")
 
@@ -93,19 +118,19 @@ class GeminiClient:
             return filtered_chunks
 
         except Exception as e:
+            if is_rate_limit_error(e):
+                self.rate_limiter.on_rate_limited(parse_retry_delay(e))
             logger.warning(f"Re-ranking failed (falling back to all chunks): {e}")
             return chunks
 
-    def ask_workmate(
+    def _answer_request(
         self,
         chunks: List[Dict[str, Any]],
         user_question: str,
-        debug: bool = False,
-        conversation_history: Optional[List[Dict[str, str]]] = None,
-    ) -> str:
-        """
-        Generate an answer using ONLY the provided top-k context chunks.
-        """
+        debug: bool,
+        conversation_history: Optional[List[Dict[str, str]]],
+    ):
+        """Prompt and generation config shared by the answer methods."""
         if conversation_history:
             final_prompt = prompts.get_rag_prompt_with_history(
                 chunks, user_question, conversation_history, debug
@@ -119,29 +144,66 @@ class GeminiClient:
             temperature=0.0,
             max_output_tokens=1024,
         )
+        return final_prompt, cfg
 
+    def _answer_error(self, e: Exception) -> str:
+        # Friendly message for MVP; later add structured logging + retries
+        if is_rate_limit_error(e):
+            return self._rate_limit_message(e)
+        logger.error(f"❌ Gemini error: {e}")
+        return GENERATION_ERROR_MESSAGE
+
+    def ask_workmate(
+        self,
+        chunks: List[Dict[str, Any]],
+        user_question: str,
+        debug: bool = False,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+    ) -> str:
+        """
+        Generate an answer using ONLY the provided top-k context chunks.
+        Blocks while waiting for rate limit budget; use ask_workmate_async from async code.
+        """
+        final_prompt, cfg = self._answer_request(chunks, user_question, debug, conversation_history)
         try:
+            self.rate_limiter.acquire(
+                tokens=estimate_tokens(final_prompt) + cfg.max_output_tokens
+            )
             response = self.client.models.generate_content(
                 model=self.model_id,
                 contents=final_prompt,
                 config=cfg,
             )
+            self.rate_limiter.on_success()
             return getattr(response, "text", "") or ""
         except Exception as e:
-            # Friendly message for MVP; later add structured logging + retries
-            error_str = str(e)
-            if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str:
-                retry_match = re.search(
-                    r"retryDelay['\"]:\s*['\"](\d+)s?['\"]", error_str
-                )
-                retry_secs = retry_match.group(1) if retry_match else "unknown"
-                logger.warning(
-                    f"⚠️  Gemini rate limit hit (model: {self.model_id}). "
-                    f"Retry after: {retry_secs}s"
-                )
-                return f"I'm currently unable to respond due to API rate limits. Please try again in about {retry_secs} seconds."
-            logger.error(f"❌ Gemini error: {e}")
-            return "Sorry, something went wrong while generating a response. Please try again."
+            return self._answer_error(e)
+
+    async def ask_workmate_async(
+        self,
+        chunks: List[Dict[str, Any]],
+        user_question: str,
+        debug: bool = False,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+    ) -> str:
+        """
+        ask_workmate for async endpoints: waits for rate limit budget and for
+        Gemini without blocking the event loop.
+        """
+        final_prompt, cfg = self._answer_request(chunks, user_question, debug, conversation_history)
+        try:
+            await self.rate_limiter.acquire_async(
+                tokens=estimate_tokens(final_prompt) + cfg.max_output_tokens
+            )
+            response = await self.client.aio.models.generate_content(
+                model=self.model_id,
+                contents=final_prompt,
+                config=cfg,
+            )
+            self.rate_limiter.on_success()
+            return getattr(response, "text", "") or ""
+        except Exception as e:
+            return self._answer_error(e)
 
     async def ask_workmate_stream(
         self,
@@ -154,20 +216,12 @@ class GeminiClient:
         Async generator that streams the answer using Gemini's streaming API.
         Yields text chunks as they arrive.
         """
-        if conversation_history:
-            final_prompt = prompts.get_rag_prompt_with_history(
-                chunks, user_question, conversation_history, debug
-            )
-        else:
-            final_prompt = prompts.get_rag_prompt(chunks, user_question, debug)
-
-        cfg = types.GenerateContentConfig(
-            system_instruction=prompts.WORKMATE_SYSTEM_INSTRUCTION,
-            temperature=0.0,
-            max_output_tokens=1024,
-        )
+        final_prompt, cfg = self._answer_request(chunks, user_question, debug, conversation_history)
 
         try:
+            await self.rate_limiter.acquire_async(
+                tokens=estimate_tokens(final_prompt) + cfg.max_output_tokens
+            )
             response = self.client.models.generate_content_stream(
                 model=self.model_id,
                 contents=final_prompt,
@@ -177,18 +231,10 @@ class GeminiClient:
                 text = getattr(chunk, "text", "") or ""
                 if text:
                     yield text
+            self.rate_limiter.on_success()
         except Exception as e:
-            error_str = str(e)
-            if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str:
-                retry_match = re.search(
-                    r"retryDelay['\"]:\s*['\"](\d+)s?['\"]", error_str
-                )
-                retry_secs = retry_match.group(1) if retry_match else "unknown"
-                logger.warning(
-                    f"⚠️  Gemini rate limit hit (model: {self.model_id}). "
-                    f"Retry after: {retry_secs}s"
-                )
-                yield f"I'm currently unable to respond due to API rate limits. Please try again in about {retry_secs} seconds."
+            if is_rate_limit_error(e):
+                yield self._rate_limit_message(e)
             else:
                 logger.error(f"❌ Gemini error: {e}")
-                yield "Sorry, something went wrong while generating a response. Please try again."
+                yield GENERATION_ERROR_MESSAGE
@@ -1,14 +1,31 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import logging
 import os
+import time
 from typing import Any, Dict, List, Tuple
 
+from src.backend.load.embedding_cache import normalize_query
+from src.backend.utils.ttl_cache import TTLCache
+
 logger = logging.getLogger(__name__)
 
 DEFAULT_RERANK_MODEL = "rerank-2"
 RELEVANCE_THRESHOLD = 0.4
 
+# Relevance scores per (model, question, chunk id, chunk content); repeated and
+# follow-up questions mostly rerank chunks that were already scored
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "10000"))
+RERANK_CACHE_TTL = float(os.getenv("RERANK_CACHE_TTL", "3600"))
+# Seconds arerank() waits for Voyage before keeping the retrieval order
+RERANK_TIMEOUT = float(os.getenv("RERANK_TIMEOUT", "5"))
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
 
 class VoyageReranker:
     """
@@ -20,7 +37,11 @@ class VoyageReranker:
         self,
         model: str = DEFAULT_RERANK_MODEL,
         threshold: float = RELEVANCE_THRESHOLD,
+        cache_size: int = RERANK_CACHE_SIZE,
     ):
+        """
+        :param cache_size: Capacity of the relevance score LRU (0 disables it).
+        """
         api_key = os.getenv("VOYAGE_API_KEY")
         if not api_key:
             logger.warning(
@@ -28,12 +49,15 @@ class VoyageReranker:
                 "Set VOYAGE_API_KEY in .env to enable VoyageAI reranking."
             )
             self.client = None
+            self.async_client = None
         else:
             import voyageai
             self.client = voyageai.Client(api_key=api_key)
+            self.async_client = voyageai.AsyncClient(api_key=api_key)
 
         self.model = model
         self.threshold = threshold
+        self.score_cache = TTLCache(cache_size, ttl_seconds=RERANK_CACHE_TTL)
 
     def rerank(
         self,
@@ -43,6 +67,8 @@ class VoyageReranker:
     ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
         """
         Rerank chunks by relevance to the query.
+        Scores already known for this question and chunk content come from
+        score_cache; only the remaining chunks are sent to Voyage.
 
         Returns:
             final_chunks  — top_k chunks above threshold, score field stripped (clean for generation)
@@ -55,52 +81,147 @@ class VoyageReranker:
             logger.warning("[VoyageReranker] Reranking skipped (no API key). Returning top_k unranked.")
             return chunks[:top_k], []
 
-        documents = [
-            f"Page: {c['page_title']}\nSection: {c['section']}\n{c['text']}"
-            if c.get("section")
-            else f"Page: {c['page_title']}\n{c['text']}"
-            for c in chunks
-        ]
-
+        documents, keys, scores, missing = self._lookup(chunks, query)
         try:
-            result = self.client.rerank(
-                query=query,
-                documents=documents,
-                model=self.model,
-                top_k=len(chunks),  # fetch all scores; we apply threshold + top_k ourselves
+            if missing:
+                result = self.client.rerank(
+                    query=query,
+                    documents=[documents[i] for i in missing],
+                    model=self.model,
+                    top_k=len(missing),  # fetch all scores; we apply threshold + top_k ourselves
+                )
+                self._store(result, keys, scores, missing)
+            return self._select(chunks, scores, missing, top_k)
+
+        except Exception as e:
+            logger.warning(
+                f"[VoyageReranker] Reranking failed, falling back to top {top_k} unranked: {e}"
             )
+            return chunks[:top_k], []
 
-            scored_chunks: List[Dict[str, Any]] = []
-            for item in result.results:
-                chunk = chunks[item.index]
-                scored_chunks.append({**chunk, "rerank_score": round(item.relevance_score, 4)})
+    async def arerank(
+        self,
+        chunks: List[Dict[str, Any]],
+        query: str,
+        top_k: int = 5,
+        timeout: float | None = RERANK_TIMEOUT,
+        stats: Dict[str, Any] | None = None,
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        rerank() for async endpoints: Voyage is called through its async
+        client, so the event loop keeps serving other requests meanwhile.
+        If no answer arrives within timeout seconds (None waits forever),
+        the request is abandoned and the top_k chunks are returned in their
+        retrieval (RRF) order, exactly as when the API call fails.
+
+        :param stats: If given, stats["rerank"] is set to the outcome ("ok",
+                      "cached", "timeout", "error" or "disabled"), the time in
+                      ms and how many chunks were sent to Voyage.
+        """
+        started = time.perf_counter()
 
-            scored_chunks.sort(key=lambda x: x["rerank_score"], reverse=True)
+        def record(status: str, sent: int = 0):
+            if stats is not None:
+                elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+                stats["rerank"] = {"status": status, "ms": elapsed_ms, "sent": sent}
 
-            logger.info(
-                f"[VoyageReranker] scores: "
-                f"{[(c['page_title'], c['rerank_score']) for c in scored_chunks]}"
-            )
+        if not chunks:
+            return [], []
 
-            above_threshold = [c for c in scored_chunks if c["rerank_score"] >= self.threshold]
-            final_scored = above_threshold[:top_k]
+        if self.async_client is None:
+            logger.warning("[VoyageReranker] Reranking skipped (no API key). Returning top_k unranked.")
+            record("disabled")
+            return chunks[:top_k], []
 
-            if not final_scored:
-                logger.warning(
-                    f"[VoyageReranker] All {len(chunks)} chunks below threshold "
-                    f"({self.threshold}). Top score: "
-                    f"{scored_chunks[0]['rerank_score'] if scored_chunks else 'N/A'}."
+        documents, keys, scores, missing = self._lookup(chunks, query)
+        try:
+            if missing:
+                result = await asyncio.wait_for(
+                    self.async_client.rerank(
+                        query=query,
+                        documents=[documents[i] for i in missing],
+                        model=self.model,
+                        top_k=len(missing),
+                    ),
+                    timeout=timeout,
                 )
+                self._store(result, keys, scores, missing)
+            record("ok" if missing else "cached", len(missing))
+            return self._select(chunks, scores, missing, top_k)
 
-            # Strip rerank_score before passing to generation prompt
-            final_chunks = [
-                {k: v for k, v in c.items() if k != "rerank_score"} for c in final_scored
-            ]
-
-            return final_chunks, scored_chunks
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"[VoyageReranker] Reranking timed out after {timeout}s, "
+                f"falling back to top {top_k} in retrieval order"
+            )
+            record("timeout", len(missing))
+            return chunks[:top_k], []
 
         except Exception as e:
             logger.warning(
                 f"[VoyageReranker] Reranking failed, falling back to top {top_k} unranked: {e}"
             )
+            record("error", len(missing))
             return chunks[:top_k], []
+
+    def _lookup(self, chunks: List[Dict[str, Any]], query: str):
+        """(documents, cache keys, cached scores or None, indices of chunks to send to Voyage)."""
+        documents = [
+            f"Page: {c['page_title']}\nSection: {c['section']}\n{c['text']}"
+            if c.get("section")
+            else f"Page: {c['page_title']}\n{c['text']}"
+            for c in chunks
+        ]
+
+        # The formatted document is what gets scored, so its hash covers title and section too
+        query_hash = _digest(normalize_query(query))
+        keys = [
+            (self.model, query_hash, c.get("chunk_id"), _digest(document))
+            for c, document in zip(chunks, documents)
+        ]
+        scores = [self.score_cache.get(key) for key in keys]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        return documents, keys, scores, missing
+
+    def _store(self, result, keys, scores, missing):
+        for item in result.results:
+            i = missing[item.index]
+            scores[i] = item.relevance_score
+            self.score_cache.put(keys[i], item.relevance_score)
+
+    def _select(self, chunks, scores, missing, top_k: int):
+        """Sort by score, then apply the threshold and top_k (see rerank() for the return value)."""
+        logger.info(
+            f"[VoyageReranker] {len(chunks) - len(missing)} cached scores, "
+            f"{len(missing)} chunks sent to Voyage"
+        )
+
+        scored_chunks: List[Dict[str, Any]] = [
+            {**chunk, "rerank_score": round(score, 4)}
+            for chunk, score in zip(chunks, scores)
+            if score is not None
+        ]
+
+        scored_chunks.sort(key=lambda x: x["rerank_score"], reverse=True)
+
+        logger.info(
+            f"[VoyageReranker] scores: "
+            f"{[(c['page_title'], c['rerank_score']) for c in scored_chunks]}"
+        )
+
+        above_threshold = [c for c in scored_chunks if c["rerank_score"] >= self.threshold]
+        final_scored = above_threshold[:top_k]
+
+        if not final_scored:
+            logger.warning(
+                f"[VoyageReranker] All {len(chunks)} chunks below threshold "
+                f"({self.threshold}). Top score: "
+                f"{scored_chunks[0]['rerank_score'] if scored_chunks else 'N/A'}."
+            )
+
+        # Strip rerank_score before passing to generation prompt
+        final_chunks = [
+            {k: v for k, v in c.items() if k != "rerank_score"} for c in final_scored
+        ]
+
+        return final_chunks, scored_chunks
@@ -0,0 +1,172 @@
+"""
+Columnar storage for the chunks behind a BM25 segment.
+
+Chunk ids and texts are UTF-8 blobs with int64 offset arrays. Every
+metadata field is dictionary-encoded: each distinct value (a workspace id, a
+page title, a source type...) is stored once, JSON-encoded in a blob of its
+own, and rows hold a small integer code (-1 when the row lacks the field).
+On disk every array and blob is memory-mapped, so a loaded segment keeps
+almost nothing resident; a row's text and metadata are decoded only when a
+search returns it.
+
+Files in a segment directory:
+    ids.bin, ids.offsets.npy                 chunk ids
+    text.bin, text.offsets.npy               chunk texts
+    meta.json                                metadata field names
+    meta.<n>.npy                             codes of the n-th field
+    meta.<n>.values.bin, .values.offsets.npy its distinct values
+"""
+
+import json
+import mmap
+import os
+
+import numpy as np
+
+META_FIELDS = "meta.json"
+
+
+def _value_key(value):
+    # Keeps True and 1 (equal and same hash) as different values
+    return type(value), value
+
+
+def _pack(strings) -> tuple[bytes, np.ndarray]:
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return b"".join(encoded), offsets
+
+
+def _narrow(codes: np.ndarray, distinct: int) -> np.ndarray:
+    """Smallest signed dtype that holds every code and -1."""
+    for dtype in (np.int8, np.int16):
+        if distinct <= np.iinfo(dtype).max:
+            return codes.astype(dtype)
+    return codes
+
+
+def _write_blob(directory: str, name: str, blob: bytes, offsets: np.ndarray):
+    with open(os.path.join(directory, f"{name}.bin"), "wb") as f:
+        f.write(blob)
+    np.save(os.path.join(directory, f"{name}.offsets.npy"), offsets)
+
+
+def _map_blob(directory: str, name: str):
+    offsets = np.load(os.path.join(directory, f"{name}.offsets.npy"), mmap_mode="r")
+    with open(os.path.join(directory, f"{name}.bin"), "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+    return blob, offsets
+
+
+def _slice(blob, offsets: np.ndarray, i) -> bytes:
+    return blob[offsets[i]:offsets[i + 1]]
+
+
+class ChunkStore:
+    """Row -> (chunk_id, text, metadata), stored column by column."""
+
+    def __init__(self, ids, text, fields: list[str], values: dict[str, tuple], codes: dict[str, np.ndarray]):
+        """
+        :param ids: (blob, offsets) of the chunk ids; text likewise.
+        :param values: Field -> (blob, offsets) of its JSON-encoded distinct values.
+        :param codes: Field -> per-row index into its values (-1 if absent).
+        """
+        self._ids = ids
+        self._text = text
+        self.fields = fields
+        self.values = values
+        self.codes = codes
+        # Field -> {value key: code}, built on first filter by that field
+        self._lookups: dict[str, dict] = {}
+
+    @classmethod
+    def build(cls, ids: list[str], texts: list[str], metadatas: list[dict]) -> "ChunkStore":
+        lookups: dict[str, dict] = {}
+        codes: dict[str, np.ndarray] = {}
+        for row, meta in enumerate(metadatas):
+            for field, value in meta.items():
+                if field not in codes:
+                    codes[field] = np.full(len(metadatas), -1, dtype=np.int32)
+                    lookups[field] = {}
+                lookup = lookups[field]
+                codes[field][row] = lookup.setdefault(_value_key(value), len(lookup))
+
+        store = cls(
+            _pack(ids),
+            _pack(texts),
+            list(codes),
+            {
+                field: _pack(json.dumps(value, ensure_ascii=False) for _, value in lookup)
+                for field, lookup in lookups.items()
+            },
+            {field: _narrow(c, len(lookups[field])) for field, c in codes.items()},
+        )
+        store._lookups = lookups
+        return store
+
+    @classmethod
+    def load(cls, directory: str) -> "ChunkStore":
+        """Memory-map a saved store."""
+        with open(os.path.join(directory, META_FIELDS)) as f:
+            fields = json.load(f)["fields"]
+        return cls(
+            _map_blob(directory, "ids"),
+            _map_blob(directory, "text"),
+            fields,
+            {field: _map_blob(directory, f"meta.{n}.values") for n, field in enumerate(fields)},
+            {
+                field: np.load(os.path.join(directory, f"meta.{n}.npy"), mmap_mode="r")
+                for n, field in enumerate(fields)
+            },
+        )
+
+    def save(self, directory: str):
+        _write_blob(directory, "ids", *self._ids)
+        _write_blob(directory, "text", *self._text)
+        for n, field in enumerate(self.fields):
+            np.save(os.path.join(directory, f"meta.{n}.npy"), self.codes[field])
+            _write_blob(directory, f"meta.{n}.values", *self.values[field])
+        with open(os.path.join(directory, META_FIELDS), "w") as f:
+            json.dump({"fields": self.fields}, f, ensure_ascii=False)
+
+    def __len__(self):
+        return len(self._ids[1]) - 1
+
+    def chunk_id(self, row: int) -> str:
+        return _slice(*self._ids, row).decode("utf-8")
+
+    def text(self, row: int) -> str:
+        return _slice(*self._text, row).decode("utf-8")
+
+    def _value(self, field: str, code):
+        return json.loads(_slice(*self.values[field], code))
+
+    def meta(self, row: int) -> dict:
+        meta = {}
+        for field in self.fields:
+            code = self.codes[field][row]
+            if code >= 0:
+                meta[field] = self._value(field, code)
+        return meta
+
+    def __getitem__(self, row: int) -> tuple[str, str, dict]:
+        return self.chunk_id(row), self.text(row), self.meta(row)
+
+    def __iter__(self):
+        return (self[row] for row in range(len(self)))
+
+    def value_rows(self, field: str, value) -> np.ndarray:
+        """Boolean mask of rows whose field equals value."""
+        if field not in self.fields:
+            return np.zeros(len(self), dtype=bool)
+        lookup = self._lookups.get(field)
+        if lookup is None:
+            distinct = len(self.values[field][1]) - 1
+            lookup = {_value_key(self._value(field, code)): code for code in range(distinct)}
+            self._lookups[field] = lookup
+        code = lookup.get(_value_key(value))
+        if code is None:
+            return np.zeros(len(self), dtype=bool)
+        return np.asarray(self.codes[field]) == code
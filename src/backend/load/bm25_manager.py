@@ -1,55 +1,283 @@
+import fcntl
+import json
 import logging
 import os
 import pickle
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
 
-import bm25s
+from src.backend.load.bm25_shard import (
+    BM25_ENGINE,
+    BM25_ENGINES,
+    FILTER_FIELDS,
+    MANIFEST,
+    BM25Segment,
+    BM25Shard,
+    condition_values,
+    shard_key,
+)
+from src.backend.load.bm25_tokenizer import TOKENIZER_CONFIG, BM25Tokenizer
+from src.backend.utils.where_filters import where_workspace_ids
 
 logger = logging.getLogger(__name__)
 
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../"))
-BM25_INDEX_PATH = os.path.join(PROJECT_ROOT, "workmate_db", "bm25_index.pkl")
+# Directory holding one sub-directory per shard (see bm25_shard.py)
+BM25_INDEX_PATH = os.path.join(PROJECT_ROOT, "workmate_db", "bm25_index")
+# Single-pickle format written by earlier versions; migrated by open_writer()
+BM25_LEGACY_INDEX_PATH = os.path.join(PROJECT_ROOT, "workmate_db", "bm25_index.pkl")
+
+# Root manifest holding the index version and the version each shard was
+# last written at; every write bumps it and API processes watching the index
+# reload when it changes
+INDEX_MANIFEST = "index.json"
+# Minimum seconds between version checks in a watching process
+BM25_RELOAD_INTERVAL = float(os.getenv("BM25_RELOAD_INTERVAL", "5"))
+
+
+def read_index_manifest(path: str) -> dict:
+    """Version and per-shard versions of the index at path (version 0 if it has never been written)."""
+    try:
+        with open(os.path.join(path, INDEX_MANIFEST)) as f:
+            manifest = json.load(f)
+        return {"version": int(manifest["version"]), "shards": manifest.get("shards", {})}
+    except (FileNotFoundError, NotADirectoryError, KeyError, ValueError):
+        return {"version": 0, "shards": {}}
+
+
+def read_index_version(path: str) -> int:
+    return read_index_manifest(path)["version"]
+
+
+def _write_index_manifest(directory: str, version: int, shards: dict[str, int]):
+    tmp_path = os.path.join(directory, f"{INDEX_MANIFEST}.tmp-{os.getpid()}")
+    with open(tmp_path, "w") as f:
+        json.dump({"version": version, "shards": shards, "updated_at": time.time()}, f)
+    os.replace(tmp_path, os.path.join(directory, INDEX_MANIFEST))
+
+
+def _shard_keys(path: str) -> list[str]:
+    """Shards saved in an index directory."""
+    if not os.path.isdir(path):
+        return []
+    return [
+        key for key in sorted(os.listdir(path))
+        if os.path.exists(os.path.join(path, key, MANIFEST))
+    ]
+
+
+@contextmanager
+def _index_lock(path: str):
+    """Serialize writers across processes (the lock file sits next to the index directory)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+@dataclass(frozen=True)
+class _IndexState:
+    """
+    Everything a search reads: the tokenizer, the shards built with it, and
+    the version of the index (and of each shard) they were loaded at. Never
+    changed once installed; reloads and writes build a new state and swap
+    it in with one assignment, so a search or versions_for() sees either the
+    old index or the new one, never a mix.
+    """
+    tokenizer: BM25Tokenizer
+    shards: dict = field(default_factory=dict)
+    version: int = 0
+    shard_versions: dict = field(default_factory=dict)
 
 
 class BM25Manager:
-    def __init__(self):
-        self.index = None
-        self.chunks: list[str] = []
-        self.metadatas: list[dict] = []
-        self.ids: list[str] = []
+    def __init__(self, engine: str = BM25_ENGINE):
+        """
+        :param engine: Segment query engine, "exhaustive" or "maxscore"
+                       (see BM25Segment.retrieve). Defaults to BM25_ENGINE.
+        """
+        if engine not in BM25_ENGINES:
+            raise ValueError(f"Unsupported BM25 engine '{engine}'. Use one of {BM25_ENGINES}")
+        self.engine = engine
+        # Directory incremental updates are written to (set by load/save/open_writer)
+        self.path = None
+        # The tokenizer is configured from the environment for new indexes;
+        # load() restores the saved one
+        self._state = _IndexState(BM25Tokenizer())
+        self._watch_path = None
+        self._reload_interval = BM25_RELOAD_INTERVAL
+        self._next_check = 0.0
+        self._reloading = False
+        self._reload_lock = threading.Lock()
+
+    @property
+    def tokenizer(self) -> BM25Tokenizer:
+        return self._state.tokenizer
+
+    @property
+    def shards(self) -> dict[str, BM25Shard]:
+        return self._state.shards
+
+    @property
+    def version(self) -> int:
+        """Version of the loaded index (see INDEX_MANIFEST)."""
+        return self._state.version
+
+    @property
+    def shard_versions(self) -> dict[str, int]:
+        return self._state.shard_versions
+
+    @classmethod
+    def open_writer(cls, path: str = BM25_INDEX_PATH) -> "BM25Manager":
+        """
+        Open the on-disk index for incremental updates (sync_shard, upsert,
+        delete, drop_shard, compact). Nothing is loaded up front: each write
+        reads just the shard it changes, so a sync or upload costs the same
+        however many workspaces the index holds. The writer only holds the
+        shards it has written; searches use a manager from load().
+        A legacy pickle is converted on first open.
+        """
+        if not os.path.isdir(path) and os.path.exists(BM25_LEGACY_INDEX_PATH):
+            converted = cls()
+            converted.load(BM25_LEGACY_INDEX_PATH)
+            converted.save(path)
+        manager = cls()
+        manager.path = path
+        return manager
 
     def build_index(self, chunks: list[str], metadatas: list[dict], ids: list[str]):
-        self.chunks = chunks
-        self.metadatas = metadatas
-        self.ids = ids
-
-        corpus_indices = list(range(len(chunks)))
-        indexed_texts = [
-            f"{m.get('title', '')} {c}".lower()
-            for c, m in zip(chunks, metadatas)
-        ]
-        tokenized_corpus = bm25s.tokenize(indexed_texts)
-        self.index = bm25s.BM25(corpus=corpus_indices)
-        self.index.index(tokenized_corpus)
-        logger.info(f"BM25 index built with {len(chunks)} documents")
+        """Replace the whole index in memory, one shard per workspace. Persist with save()."""
+        groups: dict[str, list[int]] = {}
+        for i, meta in enumerate(metadatas):
+            groups.setdefault(shard_key(meta.get("workspace_id")), []).append(i)
+
+        tokenizer = self.tokenizer
+        shards = {
+            key: BM25Shard(key, tokenizer, [BM25Segment.build(
+                [chunks[i] for i in rows],
+                [metadatas[i] for i in rows],
+                [ids[i] for i in rows],
+                tokenizer,
+            )])
+            for key, rows in groups.items()
+        }
+        self._state = replace(self._state, shards=shards)
+        logger.info(f"BM25 index built with {len(chunks)} documents in {len(shards)} shards")
+
+    def watch(self, path: str = BM25_INDEX_PATH, interval: float = BM25_RELOAD_INTERVAL):
+        """
+        Hot-reload from path: searches check the index version at most once
+        per interval and, when it changed, a background thread loads the new
+        index and swaps it in.
+        """
+        self._watch_path = path
+        self._reload_interval = interval
+
+    def check_for_update(self):
+        """Start a background reload if the watched index has a new version. Never blocks on loading."""
+        if self._watch_path is None:
+            return
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self._reload_interval
+
+        if read_index_version(self._watch_path) == self.version:
+            return
+        with self._reload_lock:
+            if self._reloading:
+                return
+            self._reloading = True
+        threading.Thread(target=self._reload, name="bm25-reload", daemon=True).start()
+
+    def _reload(self):
+        try:
+            fresh = BM25Manager(self.engine)
+            fresh.load(self._watch_path)
+            # Searches already running keep the state they started with
+            self._state = fresh._state
+            self.path = fresh.path
+            logger.info(f"BM25 index reloaded (version {fresh.version})")
+        except Exception as e:
+            # e.g. a compaction removed a segment mid-load; retried on the next check
+            logger.error(f"BM25 index reload failed, keeping version {self.version}: {e}")
+        finally:
+            self._reloading = False
+
+    def versions_for(self, where: dict | None = None) -> tuple:
+        """
+        Version of the part of the index a where filter can read: the
+        versions of the filtered workspaces' shards, or the whole index's.
+        Changes whenever a sync rewrites any of them, so it can key caches
+        of search results (also checks for a newer index, like search()).
+        """
+        self.check_for_update()
+        state = self._state
+        workspace_ids = where_workspace_ids(where)
+        if workspace_ids is None:
+            return (state.version,)
+        keys = sorted(set(shard_key(ws) for ws in workspace_ids))
+        return tuple((key, state.shard_versions.get(key, state.version)) for key in keys)
 
     def search(self, query: str, top_k: int = 10, where: dict | None = None) -> list[dict]:
-        if self.index is None:
+        self.check_for_update()
+        state = self._state
+        shards, tokenizer = state.shards, state.tokenizer
+        if not shards:
             logger.warning("BM25 index not built, returning empty results")
             return []
 
-        # Over-fetch when filtering to compensate for filtered-out results
-        fetch_k = min(top_k * 3 if where else top_k, len(self.chunks))
-        query_tokens = bm25s.tokenize([query.lower()])
-        results, _ = self.index.retrieve(query_tokens, k=fetch_k)
+        # Conditions on FILTER_FIELDS (workspace, source type) are applied as row
+        # masks during scoring; only other conditions need over-fetch + post-filter
+        residual = self._residual(where)
+        fetch_k = top_k * 3 if residual else top_k
+        query_terms = tokenizer.query_terms(query)
+        hits = [
+            hit
+            for shard in self._shards_for(shards, where)
+            for hit in shard.search(query_terms, fetch_k, where, self.engine)
+        ]
+        return self._results(hits, residual, top_k)
+
+    def search_many(self, queries: list[str], top_k: int = 10, where: dict | None = None) -> list[list[dict]]:
+        """
+        search() for a batch of questions, e.g. an evaluation run. Each
+        segment scores the whole batch in matrix form (BM25Shard.search_many);
+        results match calling search() per question, up to the order of ties.
+        """
+        self.check_for_update()
+        state = self._state
+        shards, tokenizer = state.shards, state.tokenizer
+        if not shards:
+            logger.warning("BM25 index not built, returning empty results")
+            return [[] for _ in queries]
+
+        residual = self._residual(where)
+        fetch_k = top_k * 3 if residual else top_k
+        query_terms = [tokenizer.query_terms(query) for query in queries]
+        per_query = [[] for _ in queries]
+        for shard in self._shards_for(shards, where):
+            for hits, shard_hits in zip(per_query, shard.search_many(query_terms, fetch_k, where)):
+                hits.extend(shard_hits)
+        return [self._results(hits, residual, top_k) for hits in per_query]
 
+    def _results(self, hits, residual: dict, top_k: int) -> list[dict]:
+        """Result dicts for the best (score, segment, row) hits that pass the residual filter."""
+        hits.sort(key=lambda hit: hit[0], reverse=True)
         output = []
-        for idx in results[0]:
-            meta = self.metadatas[idx]
-            if where and not self._matches_filter(meta, where):
+        for _, segment, row in hits:
+            chunk_id, text, meta = segment.docs[row]
+            if residual and not self._matches_filter(meta, residual):
                 continue
             output.append({
-                "chunk_id": self.ids[idx],
-                "text": self.chunks[idx],
+                "chunk_id": chunk_id,
+                "text": text,
                 "page_title": meta.get("title", "Unknown Source"),
                 "section": meta.get("section_header") or meta.get("parent_title", ""),
                 **meta,
@@ -58,37 +286,206 @@ class BM25Manager:
                 break
         return output
 
+    @staticmethod
+    def _shards_for(shards: dict[str, BM25Shard], where: dict | None) -> list[BM25Shard]:
+        """Shards a where filter can match: just the filtered workspaces', or all of them."""
+        workspace_ids = where_workspace_ids(where)
+        if workspace_ids is None:
+            return list(shards.values())
+        keys = dict.fromkeys(shard_key(ws) for ws in workspace_ids)
+        return [shards[key] for key in keys if key in shards]
+
+    @staticmethod
+    def _residual(where: dict | None) -> dict:
+        """Conditions of a where filter that BM25Segment.row_mask() does not apply."""
+        return {
+            key: condition for key, condition in (where or {}).items()
+            if key not in FILTER_FIELDS or condition_values(condition) is None
+        }
+
     @staticmethod
     def _matches_filter(meta: dict, where: dict) -> bool:
         """Check if metadata matches a ChromaDB-style where filter."""
         for key, condition in where.items():
-            if isinstance(condition, dict):
-                if "$in" in condition:
-                    if meta.get(key) not in condition["$in"]:
-                        return False
-            elif meta.get(key) != condition:
+            accepted = condition_values(condition)
+            if accepted is None:
+                continue
+            values, negated = accepted
+            if (meta.get(key) in values) == negated:
                 return False
         return True
 
+    def sync_shard(self, workspace_id, chunks: list[str], metadatas: list[dict], ids: list[str]) -> dict:
+        """
+        Make a workspace's shard hold exactly these chunks (a full workspace
+        sync). Only new and changed chunks are indexed; the rest are
+        tombstoned. Other workspaces' shards are untouched.
+        """
+        key = shard_key(workspace_id)
+        with self._updating(key) as shard:
+            counts = shard.sync(chunks, metadatas, ids)
+        print(
+            f"BM25 shard '{key}': {counts['added']} added, {counts['updated']} updated, "
+            f"{counts['unchanged']} unchanged, {counts['deleted']} deleted"
+        )
+        return counts
+
+    def upsert(self, chunks: list[str], metadatas: list[dict], ids: list[str]):
+        """Add or replace chunks by id, routed to their workspace's shard."""
+        groups: dict[str, list[int]] = {}
+        for i, meta in enumerate(metadatas):
+            groups.setdefault(shard_key(meta.get("workspace_id")), []).append(i)
+
+        for key, rows in groups.items():
+            with self._updating(key) as shard:
+                shard.upsert(
+                    [chunks[i] for i in rows],
+                    [metadatas[i] for i in rows],
+                    [ids[i] for i in rows],
+                )
+
+    def delete(self, ids: list[str]) -> int:
+        """Tombstone chunks by id in whichever shards hold them."""
+        deleted = 0
+        for key in _shard_keys(self._writable_path()):
+            with _index_lock(self.path):
+                shard = self._read_shard(key)
+                count = shard.delete(ids)
+                if count:
+                    self._persist(shard)
+                    deleted += count
+        return deleted
+
+    def drop_shard(self, workspace_id):
+        """Remove a workspace's shard entirely."""
+        key = shard_key(workspace_id)
+        if self.path:
+            with _index_lock(self.path):
+                shutil.rmtree(os.path.join(self.path, key), ignore_errors=True)
+                self._publish(key, None)
+        else:
+            self._state = replace(self._state, shards={k: s for k, s in self.shards.items() if k != key})
+
+    def compact(self, workspace_id=None):
+        """Force compaction of one workspace's shard, or of every shard."""
+        saved = _shard_keys(self._writable_path())
+        for key in [shard_key(workspace_id)] if workspace_id is not None else saved:
+            if key in saved:
+                with self._updating(key) as shard:
+                    shard.compact()
+
+    def _writable_path(self) -> str:
+        if self.path is None:
+            raise RuntimeError("BM25 index has no path; use open_writer() for incremental updates")
+        return self.path
+
+    @contextmanager
+    def _updating(self, key: str):
+        """
+        Read-modify-write of one shard under the index lock: the shard is
+        reloaded from disk, changed by the caller and saved, so a change
+        always applies to the latest saved state and concurrent writers
+        (other processes or managers) never overwrite each other's segments.
+        """
+        with _index_lock(self._writable_path()):
+            shard = self._read_shard(key)
+            yield shard
+            self._persist(shard)
+
+    def _read_shard(self, key: str) -> BM25Shard:
+        """Latest saved state of a shard (empty if it has none). Caller holds the index lock."""
+        # Another writer may have created the index (and its tokenizer) since it was opened
+        tokenizer = self.tokenizer
+        if os.path.exists(os.path.join(self.path, TOKENIZER_CONFIG)):
+            tokenizer = BM25Tokenizer.load(self.path)
+        directory = os.path.join(self.path, key)
+        if os.path.exists(os.path.join(directory, MANIFEST)):
+            return BM25Shard.load(directory, key, tokenizer)
+        return BM25Shard(key, tokenizer)
+
+    def _persist(self, shard: BM25Shard):
+        """Compact if due, write the shard and publish it. Caller holds the index lock."""
+        if shard.needs_compaction():
+            shard.compact()
+        shard.save(os.path.join(self.path, shard.key))
+        if not os.path.exists(os.path.join(self.path, TOKENIZER_CONFIG)):
+            shard.tokenizer.save(self.path)
+        self._publish(shard.key, shard)
+
+    def _publish(self, key: str, shard: BM25Shard | None):
+        """
+        Bump the index version for a write of one shard, for watching
+        processes, and install the shard (None: removed) in this manager's
+        state along with the new versions. Caller holds the index lock.
+        """
+        manifest = read_index_manifest(self.path)
+        version = manifest["version"] + 1
+        shard_versions = {**manifest["shards"], key: version}
+        _write_index_manifest(self.path, version, shard_versions)
+
+        state = self._state
+        shards = {k: s for k, s in state.shards.items() if k != key}
+        if shard is not None:
+            shards[key] = shard
+        tokenizer = shard.tokenizer if shard is not None else state.tokenizer
+        self._state = _IndexState(tokenizer, shards, version, shard_versions)
+
     def save(self, path: str = BM25_INDEX_PATH):
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "wb") as f:
-            pickle.dump(
-                {
-                    "index": self.index,
-                    "chunks": self.chunks,
-                    "metadatas": self.metadatas,
-                    "ids": self.ids,
-                },
-                f,
-            )
-        logger.info(f"BM25 index saved to {path}")
+        """
+        Write the whole index as a directory of shards, replacing whatever
+        is at path. Written to a temporary directory and swapped in, so a
+        concurrent load never sees a half-written index.
+        """
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        old_path = f"{path}.old-{os.getpid()}"
+        state = self._state
+        with _index_lock(path):
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            for shard in state.shards.values():
+                for segment in shard.segments:
+                    segment.name = None
+                shard.next_segment = 1
+                shard.save(os.path.join(tmp_path, shard.key))
+            state.tokenizer.save(tmp_path)
+            version = read_index_version(path) + 1
+            # Shards missing from the manifest (e.g. removed by this rebuild)
+            # fall back to the index version, which every write changes
+            shard_versions = dict.fromkeys(state.shards, version)
+            _write_index_manifest(tmp_path, version, shard_versions)
+
+            if os.path.exists(path):
+                os.replace(path, old_path)
+            os.replace(tmp_path, path)
+            # Processes that still map the old files keep reading them until they reload
+            shutil.rmtree(old_path, ignore_errors=True)
+        self._state = replace(state, version=version, shard_versions=shard_versions)
+        self.path = path
+        logger.info(f"BM25 index saved to {path} (version {self.version})")
 
     def load(self, path: str = BM25_INDEX_PATH):
+        """Memory-map every shard of a saved index directory (or read a legacy pickle file)."""
+        if os.path.isfile(path):
+            return self._load_pickle(path)
+        # Read before the shards, so a write that lands mid-load triggers another reload
+        manifest = read_index_manifest(path)
+        tokenizer = BM25Tokenizer.load(path)
+        shards = {
+            key: BM25Shard.load(os.path.join(path, key), key, tokenizer)
+            for key in _shard_keys(path)
+        }
+        self._state = _IndexState(tokenizer, shards, manifest["version"], manifest["shards"])
+        self.path = path
+        documents = sum(shard.live_count for shard in shards.values())
+        logger.info(
+            f"BM25 index loaded from {path} ({documents} documents in {len(shards)} shards, "
+            f"version {manifest['version']})"
+        )
+
+    def _load_pickle(self, path: str):
         with open(path, "rb") as f:
             data = pickle.load(f)
-        self.index = data["index"]
-        self.chunks = data["chunks"]
-        self.metadatas = data["metadatas"]
-        self.ids = data["ids"]
-        logger.info(f"BM25 index loaded from {path} ({len(self.chunks)} documents)")
+        self.build_index(data["chunks"], data["metadatas"], data["ids"])
+        logger.info(
+            f"BM25 index loaded from legacy pickle {path} ({len(data['ids'])} documents); "
+            f"it is converted to {BM25_INDEX_PATH} on the next sync"
+        )
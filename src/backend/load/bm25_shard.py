@@ -0,0 +1,629 @@
+"""
+BM25 shards: one lexical index per workspace, plus one for chunks without a
+workspace (file uploads).
+
+A shard is a list of immutable bm25s segments. New and changed chunks are
+appended as a new segment; deleted or superseded rows are tombstoned and
+masked out at query time. Once a shard has too many segments or tombstones
+it is compacted back into a single segment.
+
+Segments keep term frequencies and row lengths rather than final scores, and
+a shard scores all its segments with shard-wide statistics (live row count,
+average length and document frequencies summed over its segments; see
+CorpusStats), so a small segment holding a few edited chunks scores them
+exactly as a freshly built shard would.
+
+Chunk records live in a columnar ChunkStore (see bm25_chunk_store.py) whose
+dictionary-encoded metadata columns double as filters: where conditions on
+FILTER_FIELDS become boolean row masks applied while scoring, before top-k
+selection, instead of post-filtering an over-fetched result list.
+
+On disk, under the BM25 index directory (which also holds the index-wide
+index.json version and tokenizer.json, see bm25_manager.py):
+    <shard>/manifest.json    segment names and their tombstoned rows
+    <shard>/seg-000001/      bm25s arrays (.npy, memory-mapped), term
+                             frequencies, row lengths and the segment's
+                             ChunkStore files
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import shutil
+from collections import Counter
+from dataclasses import dataclass
+
+import bm25s
+import numpy as np
+
+from src.backend.load.bm25_chunk_store import ChunkStore
+from src.backend.load.bm25_tokenizer import BM25Tokenizer
+
+logger = logging.getLogger(__name__)
+
+BM25_MAX_SEGMENTS = int(os.getenv("BM25_MAX_SEGMENTS", "8"))
+# Compact a shard once this fraction of its rows are tombstones
+BM25_COMPACT_DELETED_RATIO = float(os.getenv("BM25_COMPACT_DELETED_RATIO", "0.25"))
+
+# Shard for chunks without a workspace_id (file uploads)
+UPLOADS_SHARD = "uploads"
+MANIFEST = "manifest.json"
+
+# Metadata fields whose where conditions are applied as row masks
+FILTER_FIELDS = ("workspace_id", "source_type")
+
+# How a segment scores a query: "exhaustive" adds up every posting of the
+# query terms; "maxscore" skips postings that cannot change the top k
+BM25_ENGINES = ("exhaustive", "maxscore")
+BM25_ENGINE = os.getenv("BM25_ENGINE", "exhaustive")
+# Term frequency of every posting (aligned with the bm25s postings) and
+# token count of every row, from which scores are computed at query time
+TERM_FREQS = "tf.npy"
+DOC_LENGTHS = "doc_len.npy"
+# Relative cost of probing one row by binary search vs scanning one posting
+PROBE_COST = 16
+# Cells of the float32 (queries x rows) score matrix retrieve_many() fills at a time
+BATCH_SCORE_CELLS = 1 << 22
+
+_SHARD_NAME_RE = re.compile(r"[^a-zA-Z0-9._-]")
+
+
+def shard_key(workspace_id) -> str:
+    """Shard holding a workspace's chunks."""
+    if not workspace_id:
+        return UPLOADS_SHARD
+    return "ws_" + _SHARD_NAME_RE.sub("_", str(workspace_id))
+
+
+def index_text(chunk: str, meta: dict) -> str:
+    """Text that is tokenized for a chunk: its title plus the chunk body."""
+    return f"{meta.get('title', '')} {chunk}".lower()
+
+
+def condition_values(condition) -> tuple[list, bool] | None:
+    """
+    (values, negated) for a condition on one field: an equality, $eq or $in
+    condition accepts rows holding one of values; a $ne or $nin condition
+    (negated) accepts every other row, including rows without the field, as
+    Chroma does. None for other operators.
+    """
+    if not isinstance(condition, dict):
+        return [condition], False
+    if len(condition) != 1:
+        return None
+    operator, operand = next(iter(condition.items()))
+    if operator in ("$in", "$nin"):
+        return list(operand), operator == "$nin"
+    if operator in ("$eq", "$ne"):
+        return [operand], operator == "$ne"
+    return None
+
+
+def kth_largest(values: np.ndarray, k: int) -> float:
+    return float(np.partition(values, len(values) - k)[len(values) - k])
+
+
+def top_k_rows(scores: np.ndarray, k: int, candidates: np.ndarray | None = None) -> list[tuple[float, int]]:
+    """(score, row) of the k best candidate rows, best first, via argpartition."""
+    if candidates is None:
+        candidates = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+    elif len(candidates) > k:
+        candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+    rows = candidates[np.argsort(-scores[candidates], kind="stable")]
+    return [(float(scores[row]), int(row)) for row in rows]
+
+
+@dataclass(frozen=True)
+class CorpusStats:
+    """
+    Lucene BM25 statistics of the live rows of a shard: their count, average
+    length and the idf of each query term. Every segment of the shard scores
+    with the same stats, so their scores can be merged.
+    """
+    rows: int
+    avgdl: float
+    idf: dict
+
+
+def corpus_stats(segments, query_terms) -> CorpusStats:
+    """Stats over the live rows of segments (tombstoned rows are excluded, as after a compaction)."""
+    rows = sum(segment.live_count for segment in segments)
+    length = sum(segment.live_length for segment in segments)
+    df = dict.fromkeys(query_terms, 0)
+    for segment in segments:
+        vocab = segment.index.vocab_dict
+        for term in df:
+            token_id = vocab.get(term)
+            if token_id is not None:
+                df[term] += segment.live_df(token_id)
+    # Same idf as bm25s' lucene method
+    idf = {term: math.log(1 + (rows - count + 0.5) / (count + 0.5)) for term, count in df.items()}
+    return CorpusStats(rows, length / rows if rows else 1.0, idf)
+
+
+def _posting_term_freqs(index, tokens: list[list[str]]) -> np.ndarray:
+    """Term frequency of every (term, row) posting of a bm25s index, in its posting order."""
+    rows = len(tokens)
+    lengths = [len(doc) for doc in tokens]
+    vocab = index.vocab_dict
+    term_ids = np.fromiter((vocab[t] for doc in tokens for t in doc), dtype=np.int64, count=sum(lengths))
+    keys, counts = np.unique(term_ids * rows + np.repeat(np.arange(rows), lengths), return_counts=True)
+
+    indptr, indices = index.scores["indptr"], index.scores["indices"]
+    posting_terms = np.repeat(np.arange(len(indptr) - 1, dtype=np.int64), np.diff(indptr))
+    return counts[np.searchsorted(keys, posting_terms * rows + indices)].astype(np.float32)
+
+
+class BM25Segment:
+    """
+    One immutable bm25s index over a batch of chunks, plus their records and
+    tombstones. bm25s provides the vocabulary and posting lists; scores are
+    computed from each posting's term frequency and each row's length with
+    the CorpusStats of the search, not with this segment's own statistics.
+    """
+
+    def __init__(self, index, docs: ChunkStore, tf: np.ndarray, doc_len: np.ndarray,
+                 name: str | None = None, deleted=()):
+        self.index = index
+        # Row -> (chunk_id, text, metadata)
+        self.docs = docs
+        # Term frequency per posting and token count per row
+        self.tf = tf
+        self.doc_len = doc_len
+        # None until the segment has been written to disk
+        self.name = name
+        self.deleted = set(deleted)
+        self._live_mask = None
+        self._live_length = None
+        self._live_df: dict[int, int] = {}
+        self._value_masks: dict[tuple, np.ndarray] = {}
+        # (avgdl, per-row length norms, token id -> best tf component) for the last avgdl scored with
+        self._norms = None
+
+    @classmethod
+    def build(cls, chunks: list[str], metadatas: list[dict], ids: list[str], tokenizer: BM25Tokenizer):
+        tokens = tokenizer.tokenize_corpus(index_text(c, m) for c, m in zip(chunks, metadatas))
+        # No corpus attached: retrieve() returns row numbers into docs
+        index = bm25s.BM25()
+        index.index(tokens, show_progress=False)
+        return cls(
+            index,
+            ChunkStore.build(ids, chunks, metadatas),
+            tf=_posting_term_freqs(index, tokens),
+            doc_len=np.array([len(doc) for doc in tokens], dtype=np.int32),
+        )
+
+    @classmethod
+    def load(cls, directory: str, name: str, deleted=()):
+        path = os.path.join(directory, name)
+        index = bm25s.BM25.load(path, mmap=True, show_progress=False)
+        return cls(
+            index,
+            ChunkStore.load(path),
+            np.load(os.path.join(path, TERM_FREQS), mmap_mode="r"),
+            np.load(os.path.join(path, DOC_LENGTHS), mmap_mode="r"),
+            name,
+            deleted,
+        )
+
+    def save(self, directory: str, name: str):
+        path = os.path.join(directory, name)
+        self.index.save(path, show_progress=False)
+        self.docs.save(path)
+        np.save(os.path.join(path, TERM_FREQS), self.tf)
+        np.save(os.path.join(path, DOC_LENGTHS), self.doc_len)
+        self.name = name
+
+    def __len__(self):
+        return len(self.docs)
+
+    @property
+    def live_count(self) -> int:
+        return len(self.docs) - len(self.deleted)
+
+    @property
+    def live_length(self) -> int:
+        """Total token count of the live rows."""
+        if self._live_length is None:
+            live = self.live_mask()
+            doc_len = np.asarray(self.doc_len)
+            self._live_length = int(doc_len.sum() if live is None else doc_len[live].sum())
+        return self._live_length
+
+    def live_df(self, token_id: int) -> int:
+        """Number of live rows containing a term."""
+        df = self._live_df.get(token_id)
+        if df is None:
+            rows, _ = self._postings(token_id)
+            live = self.live_mask()
+            df = len(rows) if live is None else int(np.count_nonzero(live[rows]))
+            self._live_df[token_id] = df
+        return df
+
+    def delete(self, rows):
+        self.deleted.update(rows)
+        self._live_mask = None
+        self._live_length = None
+        self._live_df = {}
+
+    def live_mask(self) -> np.ndarray | None:
+        """Boolean mask of rows that are not tombstoned (None when none are)."""
+        if not self.deleted:
+            return None
+        if self._live_mask is None:
+            self._live_mask = np.ones(len(self.docs), dtype=bool)
+            self._live_mask[list(self.deleted)] = False
+        return self._live_mask
+
+    def value_mask(self, field: str, value) -> np.ndarray:
+        """Boolean mask of rows whose metadata field equals value (cached per value)."""
+        key = (field, value)
+        mask = self._value_masks.get(key)
+        if mask is None:
+            mask = self.docs.value_rows(field, value)
+            self._value_masks[key] = mask
+        return mask
+
+    def row_mask(self, where: dict | None) -> np.ndarray | None:
+        """
+        Rows that are live and match the where conditions on FILTER_FIELDS
+        (None when every row qualifies). Other conditions, including operators
+        condition_values() does not handle, are left to the caller.
+        """
+        mask = None
+        for field, condition in (where or {}).items():
+            accepted = condition_values(condition) if field in FILTER_FIELDS else None
+            if accepted is None:
+                continue
+            values, negated = accepted
+            field_mask = np.zeros(len(self.docs), dtype=bool)
+            for value in values:
+                field_mask |= self.value_mask(field, value)
+            if negated:
+                field_mask = ~field_mask
+            mask = field_mask if mask is None else mask & field_mask
+
+        live = self.live_mask()
+        if live is not None:
+            mask = live if mask is None else mask & live
+        return mask
+
+    def query_tokens(self, query_terms, stats: CorpusStats) -> list[tuple[int, float]]:
+        """(token id, idf) of each query term this segment has seen, repeats included."""
+        vocab = self.index.vocab_dict
+        return [
+            (vocab[term], stats.idf[term])
+            for term in query_terms
+            if term in vocab
+        ]
+
+    def _postings(self, token_id: int) -> tuple[np.ndarray, np.ndarray]:
+        """(rows, term frequencies) of a term; rows are ascending."""
+        start, end = self.index.scores["indptr"][token_id], self.index.scores["indptr"][token_id + 1]
+        return self.index.scores["indices"][start:end], self.tf[start:end]
+
+    def _length_norms(self, avgdl: float):
+        """Per-row lucene length normalization k1 * (1 - b + b * dl / avgdl), cached for the last avgdl."""
+        if self._norms is None or self._norms[0] != avgdl:
+            k1, b = self.index.k1, self.index.b
+            norms = (k1 * (1 - b + b * np.asarray(self.doc_len, dtype=np.float32) / avgdl)).astype(np.float32)
+            self._norms = (avgdl, norms, {})
+        return self._norms[1]
+
+    def _impacts(self, token_id: int, idf: float, norms: np.ndarray, rows=None, tf=None):
+        """(rows, score contributions) of a term's postings, or of the given subset of them."""
+        if rows is None:
+            rows, tf = self._postings(token_id)
+        return rows, (idf * tf / (tf + norms[rows])).astype(np.float32)
+
+    def _term_bound(self, token_id: int, norms: np.ndarray) -> float:
+        """Highest tf component tf / (tf + norm) in a term's postings (cached with the norms)."""
+        bounds = self._norms[2]
+        bound = bounds.get(token_id)
+        if bound is None:
+            rows, tf = self._postings(token_id)
+            bound = float((tf / (tf + norms[rows])).max()) if len(rows) else 0.0
+            bounds[token_id] = bound
+        return bound
+
+    def retrieve(self, query_terms, k: int, where: dict | None = None,
+                 engine: str = BM25_ENGINE, stats: CorpusStats | None = None) -> list[tuple[float, int]]:
+        """
+        Top-k (score, row) pairs among live rows matching where. Scores are
+        summed from the postings of the query terms with the given stats
+        (this segment's own when None), skipping masked-out rows, and top-k
+        selection only considers the masked rows. Both engines return the
+        same scores; "maxscore" skips work that cannot change them.
+        """
+        mask = self.row_mask(where)
+        candidates = np.flatnonzero(mask) if mask is not None else None
+        if k <= 0 or len(self.docs) == 0 or (candidates is not None and len(candidates) == 0):
+            return []
+
+        stats = stats or corpus_stats([self], query_terms)
+        norms = self._length_norms(stats.avgdl)
+        scores = np.zeros(len(self.docs), dtype=np.float32)
+        tokens = self.query_tokens(query_terms, stats)
+        if engine == "maxscore":
+            contenders = self._score_maxscore(scores, tokens, norms, k, mask)
+            if contenders is not None:
+                return top_k_rows(scores, k, contenders)
+        else:
+            for token_id, idf in tokens:
+                rows, values = self._impacts(token_id, idf, norms)
+                if mask is not None:
+                    keep = mask[rows]
+                    rows, values = rows[keep], values[keep]
+                np.add.at(scores, rows, values)
+        return top_k_rows(scores, k, candidates)
+
+    def retrieve_many(self, queries, k: int, where: dict | None = None,
+                      stats: CorpusStats | None = None) -> list[list[tuple[float, int]]]:
+        """
+        retrieve() for several queries (lists of query terms) at once, with
+        the exhaustive engine's scores. stats must cover every query's terms.
+        A batch of queries is scored into one (queries x rows) matrix and its
+        top k rows per query are selected with a single argpartition and
+        argsort over the matrix.
+        """
+        mask = self.row_mask(where)
+        candidates = np.flatnonzero(mask) if mask is not None else None
+        rows_total = len(self.docs)
+        if k <= 0 or rows_total == 0 or (candidates is not None and len(candidates) == 0):
+            return [[] for _ in queries]
+
+        stats = stats or corpus_stats([self], {term for terms in queries for term in terms})
+        norms = self._length_norms(stats.avgdl)
+        results = []
+        batch_size = max(1, BATCH_SCORE_CELLS // rows_total)
+        for start in range(0, len(queries), batch_size):
+            batch = queries[start:start + batch_size]
+            # np.add.at on the int32 postings beats one bincount over the whole
+            # batch, which would widen every posting to int64/float64 first
+            scores = np.zeros((len(batch), rows_total), dtype=np.float32)
+            for query_scores, query_terms in zip(scores, batch):
+                for token_id, idf in self.query_tokens(query_terms, stats):
+                    np.add.at(query_scores, *self._impacts(token_id, idf, norms))
+            if candidates is not None:
+                scores = scores[:, candidates]
+            if scores.shape[1] > k:
+                best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            else:
+                best = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+            best_scores = np.take_along_axis(scores, best, axis=1)
+            order = np.argsort(-best_scores, axis=1, kind="stable")
+            best = np.take_along_axis(best, order, axis=1)
+            best_scores = np.take_along_axis(best_scores, order, axis=1)
+            rows = candidates[best] if candidates is not None else best
+            results.extend(
+                list(zip(map(float, query_scores), map(int, query_rows)))
+                for query_scores, query_rows in zip(best_scores, rows)
+            )
+        return results
+
+    def _score_maxscore(self, scores: np.ndarray, tokens: list[tuple[int, float]], norms: np.ndarray,
+                        k: int, mask) -> np.ndarray | None:
+        """
+        MaxScore early termination. Terms are added in decreasing order of
+        their best possible contribution. As soon as the k-th best score so
+        far is at least what the remaining terms could add together, no row
+        that has not matched yet can reach the top k, so the remaining
+        (typically long, low-idf) postings are only probed, by binary search,
+        for the rows still in contention, which are pruned after each term.
+
+        Fills scores and returns the rows in contention, or None when every
+        term was scored in full (scores are then exhaustive).
+        """
+        weights = Counter(token_id for token_id, _ in tokens)
+        idfs = dict(tokens)
+        bounds = {
+            token_id: idfs[token_id] * self._term_bound(token_id, norms) * count
+            for token_id, count in weights.items()
+        }
+        terms = sorted(bounds, key=bounds.get, reverse=True)
+        # remaining[i]: the most that the terms after terms[i] can add to a row
+        remaining = np.cumsum([bounds[t] for t in terms][::-1])[::-1].tolist()[1:] + [0.0]
+        # scored[i]: the most that terms[:i + 1] can give a row
+        scored = np.cumsum([bounds[t] for t in terms]).tolist()
+
+        # Lower bound on the final k-th best score. Scores only grow, and the
+        # k-th best among one term's (distinct) rows never exceeds the overall one
+        threshold = 0.0
+        contenders = None
+        for i, token_id in enumerate(terms):
+            idf = idfs[token_id] * weights[token_id]
+            if contenders is None:
+                rows, values = self._impacts(token_id, idf, norms)
+                if mask is not None:
+                    keep = mask[rows]
+                    rows, values = rows[keep], values[keep]
+                np.add.at(scores, rows, values)
+                # No point switching after the last term, or while the remaining
+                # terms could outscore every term scored so far
+                if i == len(terms) - 1 or remaining[i] >= scored[i]:
+                    continue
+                if len(rows) >= k:
+                    threshold = max(threshold, kth_largest(scores[rows], k))
+                if threshold > 0 and remaining[i] <= threshold:
+                    # Rows that have not matched yet score 0 and can reach at most remaining[i]
+                    floor = threshold - remaining[i]
+                    contenders = np.flatnonzero(scores >= floor if floor > 0 else scores > 0)
+            else:
+                rows, tf = self._postings(token_id)
+                if len(contenders) * PROBE_COST < len(rows):
+                    positions = np.minimum(np.searchsorted(rows, contenders), len(rows) - 1)
+                    found = rows[positions] == contenders
+                    matched, values = self._impacts(
+                        token_id, idf, norms, contenders[found], tf[positions[found]]
+                    )
+                    scores[matched] += values
+                else:
+                    # Too many contenders for probing to beat a scan of the postings
+                    np.add.at(scores, *self._impacts(token_id, idf, norms, rows, tf))
+                threshold = max(threshold, kth_largest(scores[contenders], k))
+                contenders = contenders[scores[contenders] + remaining[i] >= threshold]
+        return contenders
+
+
+class BM25Shard:
+    def __init__(self, key: str, tokenizer: BM25Tokenizer, segments: list[BM25Segment] | None = None,
+                 next_segment: int = 1):
+        self.key = key
+        # Index-wide tokenizer new segments are built with
+        self.tokenizer = tokenizer
+        self.segments = segments or []
+        self.next_segment = next_segment
+
+    @classmethod
+    def load(cls, directory: str, key: str, tokenizer: BM25Tokenizer):
+        with open(os.path.join(directory, MANIFEST)) as f:
+            manifest = json.load(f)
+        segments = [
+            BM25Segment.load(directory, entry["name"], entry["deleted"])
+            for entry in manifest["segments"]
+        ]
+        return cls(key, tokenizer, segments, manifest["next_segment"])
+
+    def save(self, directory: str):
+        """
+        Write new segments, then atomically replace the manifest. Segment
+        directories are never modified once written; ones no longer listed
+        (after compaction) are removed.
+        """
+        os.makedirs(directory, exist_ok=True)
+        for segment in self.segments:
+            if segment.name is None:
+                segment.save(directory, f"seg-{self.next_segment:06d}")
+                self.next_segment += 1
+
+        manifest = {
+            "segments": [
+                {"name": s.name, "deleted": sorted(s.deleted)} for s in self.segments
+            ],
+            "next_segment": self.next_segment,
+        }
+        tmp_path = os.path.join(directory, f"{MANIFEST}.tmp-{os.getpid()}")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, os.path.join(directory, MANIFEST))
+
+        # Processes that still map removed segments keep reading them until they reload
+        live = {s.name for s in self.segments}
+        for entry in os.listdir(directory):
+            if entry.startswith("seg-") and entry not in live:
+                shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+
+    @property
+    def live_count(self) -> int:
+        return sum(s.live_count for s in self.segments)
+
+    @property
+    def deleted_count(self) -> int:
+        return sum(len(s.deleted) for s in self.segments)
+
+    def search(self, query_terms, k: int, where: dict | None = None,
+               engine: str = BM25_ENGINE) -> list[tuple[float, BM25Segment, int]]:
+        """Top-k (score, segment, row) hits over every segment, all scored with the shard's statistics."""
+        stats = corpus_stats(self.segments, query_terms)
+        hits = [
+            (score, segment, row)
+            for segment in self.segments
+            for score, row in segment.retrieve(query_terms, k, where, engine, stats)
+        ]
+        hits.sort(key=lambda hit: hit[0], reverse=True)
+        return hits[:k]
+
+    def search_many(self, queries, k: int, where: dict | None = None) -> list[list[tuple[float, BM25Segment, int]]]:
+        """search() for several queries, scored in batches (see BM25Segment.retrieve_many)."""
+        stats = corpus_stats(self.segments, {term for terms in queries for term in terms})
+        per_query = [[] for _ in queries]
+        for segment in self.segments:
+            for hits, top in zip(per_query, segment.retrieve_many(queries, k, where, stats)):
+                hits.extend((score, segment, row) for score, row in top)
+        for hits in per_query:
+            hits.sort(key=lambda hit: hit[0], reverse=True)
+            del hits[k:]
+        return per_query
+
+    def _locate(self) -> dict[str, tuple[BM25Segment, int]]:
+        """Chunk id -> (segment, row) of its live row. Decodes every chunk id, so writer-side only."""
+        locations = {}
+        for segment in self.segments:
+            for row in range(len(segment)):
+                if row not in segment.deleted:
+                    locations[segment.docs.chunk_id(row)] = (segment, row)
+        return locations
+
+    def _tombstone(self, locations, chunk_ids) -> int:
+        count = 0
+        for chunk_id in chunk_ids:
+            if chunk_id in locations:
+                segment, row = locations[chunk_id]
+                segment.delete([row])
+                count += 1
+        return count
+
+    def _append(self, chunks, metadatas, ids):
+        if ids:
+            self.segments.append(BM25Segment.build(chunks, metadatas, ids, self.tokenizer))
+
+    def upsert(self, chunks: list[str], metadatas: list[dict], ids: list[str]):
+        """Append chunks, tombstoning any previous version of the same ids."""
+        self._tombstone(self._locate(), ids)
+        self._append(chunks, metadatas, ids)
+
+    def delete(self, ids) -> int:
+        """Tombstone chunks by id; returns how many were live in this shard."""
+        return self._tombstone(self._locate(), ids)
+
+    def sync(self, chunks: list[str], metadatas: list[dict], ids: list[str]) -> dict:
+        """
+        Make the shard hold exactly these chunks: unchanged rows are kept,
+        changed and new chunks are appended, and everything else is tombstoned.
+        """
+        locations = self._locate()
+        changed = []
+        for i, chunk_id in enumerate(ids):
+            if chunk_id in locations:
+                segment, row = locations[chunk_id]
+                if segment.docs.text(row) == chunks[i] and segment.docs.meta(row) == metadatas[i]:
+                    continue
+            changed.append(i)
+
+        current_ids = set(ids)
+        stale_ids = [chunk_id for chunk_id in locations if chunk_id not in current_ids]
+        updated = self._tombstone(locations, [ids[i] for i in changed])
+        self._tombstone(locations, stale_ids)
+        self._append(
+            [chunks[i] for i in changed],
+            [metadatas[i] for i in changed],
+            [ids[i] for i in changed],
+        )
+        return {
+            "added": len(changed) - updated,
+            "updated": updated,
+            "unchanged": len(ids) - len(changed),
+            "deleted": len(stale_ids),
+        }
+
+    def needs_compaction(self) -> bool:
+        total = self.live_count + self.deleted_count
+        if len(self.segments) > BM25_MAX_SEGMENTS:
+            return True
+        return total > 0 and self.deleted_count / total > BM25_COMPACT_DELETED_RATIO
+
+    def compact(self):
+        """Rebuild the shard's live rows into a single segment."""
+        live = [
+            segment.docs[row]
+            for segment in self.segments
+            for row in range(len(segment))
+            if row not in segment.deleted
+        ]
+        self.segments = []
+        if live:
+            ids, chunks, metadatas = (list(column) for column in zip(*live))
+            self._append(chunks, metadatas, ids)
+        logger.info(f"Compacted BM25 shard '{self.key}' to {len(live)} documents")
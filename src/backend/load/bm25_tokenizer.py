@@ -0,0 +1,95 @@
+"""
+Tokenizer shared by BM25 indexing and querying.
+
+Its settings (token pattern, stopword list, optional Snowball stemmer) are
+fixed when an index is built and saved with it as tokenizer.json, so query
+terms are always produced the way the corpus was tokenized, whatever the
+current environment says. Queries are tokenized once (with a small cache for
+repeated questions); each segment then maps the terms straight to its own
+token ids and drops the ones it has never seen.
+"""
+
+import json
+import os
+import re
+from functools import lru_cache
+
+from bm25s.tokenization import _infer_stopwords
+
+# Stopword list name understood by bm25s ("en", "de", "fr", ...); empty disables it
+BM25_STOPWORDS = os.getenv("BM25_STOPWORDS", "en")
+# Snowball stemmer language (e.g. "english"), requires PyStemmer; empty disables stemming
+BM25_STEMMER = os.getenv("BM25_STEMMER", "")
+BM25_QUERY_CACHE_SIZE = int(os.getenv("BM25_QUERY_CACHE_SIZE", "1024"))
+
+TOKENIZER_CONFIG = "tokenizer.json"
+# Same pattern bm25s.tokenize uses
+TOKEN_PATTERN = r"(?u)\b\w\w+\b"
+
+
+class BM25Tokenizer:
+    def __init__(self, stopwords=BM25_STOPWORDS, stemmer: str | None = BM25_STEMMER or None,
+                 token_pattern: str = TOKEN_PATTERN):
+        """
+        :param stopwords: A bm25s stopword list name or an explicit list of words.
+        :param stemmer: Snowball language for PyStemmer, or None.
+        """
+        if isinstance(stopwords, str):
+            stopwords = _infer_stopwords(stopwords) if stopwords else []
+        self.stopwords = sorted(stopwords or [])
+        self.stemmer = stemmer
+        self.token_pattern = token_pattern
+        self._stopword_set = frozenset(self.stopwords)
+        self._split = re.compile(token_pattern).findall
+        self._stem = self._load_stemmer(stemmer)
+        self.query_terms = lru_cache(maxsize=BM25_QUERY_CACHE_SIZE)(self._query_terms)
+
+    @staticmethod
+    def _load_stemmer(language: str | None):
+        if not language:
+            return None
+        try:
+            import Stemmer
+        except ImportError as e:
+            raise ImportError(
+                f"BM25 stemming ('{language}') requires PyStemmer: uv add PyStemmer"
+            ) from e
+        # Stems repeat heavily across a corpus, so memoize them
+        return lru_cache(maxsize=100_000)(Stemmer.Stemmer(language).stemWord)
+
+    def tokenize(self, text: str) -> list[str]:
+        """Lowercase, split, drop stopwords and stem."""
+        terms = [t for t in self._split(text.lower()) if t not in self._stopword_set]
+        if self._stem is not None:
+            terms = [self._stem(t) for t in terms]
+        return terms
+
+    def tokenize_corpus(self, texts) -> list[list[str]]:
+        return [self.tokenize(text) for text in texts]
+
+    def _query_terms(self, query: str) -> tuple[str, ...]:
+        # Repeated terms are kept, so they count once per occurrence
+        return tuple(self.tokenize(query))
+
+    def to_dict(self) -> dict:
+        return {
+            "stopwords": self.stopwords,
+            "stemmer": self.stemmer,
+            "token_pattern": self.token_pattern,
+        }
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = os.path.join(directory, f"{TOKENIZER_CONFIG}.tmp-{os.getpid()}")
+        with open(tmp_path, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, os.path.join(directory, TOKENIZER_CONFIG))
+
+    @classmethod
+    def load(cls, directory: str) -> "BM25Tokenizer":
+        """Tokenizer an index was built with. Indexes saved before tokenizer.json used bm25s defaults."""
+        path = os.path.join(directory, TOKENIZER_CONFIG)
+        if not os.path.exists(path):
+            return cls(stopwords="en", stemmer=None)
+        with open(path) as f:
+            return cls(**json.load(f))
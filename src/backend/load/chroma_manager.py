@@ -1,11 +1,31 @@
+import hashlib
+import json
 import logging
 import os
+import re
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 import chromadb
+from chromadb.errors import NotFoundError
+import numpy as np
 from dotenv import load_dotenv
 from google import genai
 
-from src.backend.load.google_embedder import GoogleEmbedder
+from src.backend.load.embedding_cache import EmbeddingCache, normalize_query
+from src.backend.load.embedding_pipeline import (
+    EMBEDDING_MAX_IN_FLIGHT,
+    UPSERT_BATCH_SIZE,
+    EmbeddingPipeline,
+    run_sync,
+)
+from src.backend.load.google_embedder import GoogleEmbedder, MAX_BATCH_SIZE
+from src.backend.load.numpy_vector_store import NumpyVectorClient
+from src.backend.load.quantization import cosine_scores, reduce_dimension
+from src.backend.load.rescore_store import RescoreVectorStore
+from src.backend.utils.ttl_cache import TTLCache
+from src.backend.utils.where_filters import where_workspace_ids
 
 load_dotenv()
 
@@ -15,63 +35,403 @@ logger = logging.getLogger(__name__)
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../"))
 DEFAULT_DB_PATH = os.path.join(PROJECT_ROOT, "workmate_db")
 
+# "chroma": a Chroma server (CHROMA_HOST) or a local PersistentClient.
+# "numpy": exact in-process search over memory-mapped vectors, stored in
+# <db_path>/numpy_vectors (see numpy_vector_store.py).
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+VECTOR_BACKENDS = ("chroma", "numpy")
+NUMPY_VECTOR_DIR = "numpy_vectors"
+
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+QUERY_EMBEDDING_CACHE_TTL = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "3600"))
+
+# Size of the vectors stored in Chroma (None = native 3072)
+EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", "0")) or None
+# When > 0 (and EMBEDDING_DIMENSION is set), fetch n_results * RESCORE_OVERSAMPLE
+# candidates from the reduced index and rescore them with the full-size float32
+# vectors kept in the rescore store (see rescore_store.py). Works with any
+# EMBEDDING_CACHE_DTYPE and NUMPY_VECTOR_DTYPE.
+RESCORE_OVERSAMPLE = int(os.getenv("RESCORE_OVERSAMPLE", "0"))
+
+
+# Page size for metadata scans and id-based deletes
+SCAN_PAGE_SIZE = 1000
+
+# "single": all workspaces share one collection and queries filter on workspace_id.
+# "per_workspace": each workspace gets its own collection (<name>__ws_<id>); chunks
+# without a workspace (file uploads) stay in the base collection. Existing data is
+# moved with scripts/migrate_to_workspace_collections.py.
+CHROMA_COLLECTION_LAYOUT = os.getenv("CHROMA_COLLECTION_LAYOUT", "single")
+COLLECTION_LAYOUTS = ("single", "per_workspace")
+# Threads used to query several workspace collections in parallel
+CHROMA_FANOUT_WORKERS = int(os.getenv("CHROMA_FANOUT_WORKERS", "8"))
+# Shared by every ChromaManager, so short-lived managers (one per ingestion run)
+# don't each leave a pool of idle threads behind
+_FANOUT_EXECUTOR = ThreadPoolExecutor(max_workers=CHROMA_FANOUT_WORKERS, thread_name_prefix="chroma-fanout")
+
+# HNSW index settings (unset = Chroma's defaults: l2, construction_ef 100,
+# search_ef 100, M 16). space, construction_ef and M only take effect when a
+# collection is created; search_ef is also applied to existing collections.
+HNSW_SPACES = ("l2", "cosine", "ip")
+HNSW_SETTINGS = {
+    "space": os.getenv("CHROMA_HNSW_SPACE") or None,
+    "construction_ef": int(os.getenv("CHROMA_HNSW_CONSTRUCTION_EF", "0")) or None,
+    "search_ef": int(os.getenv("CHROMA_HNSW_SEARCH_EF", "0")) or None,
+    "M": int(os.getenv("CHROMA_HNSW_M", "0")) or None,
+}
+
+WORKSPACE_COLLECTION_SEPARATOR = "__ws_"
+# Collection metadata key holding a token replaced on every write through this
+# manager (including the ingestion worker's), for versions_for()
+WRITE_VERSION_KEY = "write_version"
+_COLLECTION_NAME_RE = re.compile(r"[^a-zA-Z0-9._-]")
+
+
+def chunk_content_hash(document, metadata) -> str:
+    """Hash of a chunk's text and metadata, used to skip unchanged chunks on re-sync."""
+    payload = json.dumps(
+        {
+            "text": document,
+            "metadata": {k: v for k, v in metadata.items() if k != "content_hash"},
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def hnsw_configuration(space=None, construction_ef=None, search_ef=None, M=None) -> dict | None:
+    """Chroma collection configuration for the given HNSW settings (None keeps Chroma's default)."""
+    if space is not None and space not in HNSW_SPACES:
+        raise ValueError(f"Unsupported HNSW space '{space}'. Use one of {HNSW_SPACES}")
+    hnsw = {
+        "space": space,
+        "ef_construction": construction_ef,
+        "ef_search": search_ef,
+        "max_neighbors": M,
+    }
+    hnsw = {key: value for key, value in hnsw.items() if value is not None}
+    return {"hnsw": hnsw} if hnsw else None
+
+
+def workspace_collection_name(base_name: str, workspace_id) -> str:
+    """Name of the collection holding one workspace's chunks in the per_workspace layout."""
+    safe_id = _COLLECTION_NAME_RE.sub("_", str(workspace_id))
+    return f"{base_name}{WORKSPACE_COLLECTION_SEPARATOR}{safe_id}"
+
+
+def _merge_query_results(results, n_results):
+    """
+    Merge per-collection query results into one, keeping the n_results
+    closest for each query embedding.
+    """
+    fields = [
+        f for f in ("ids", "documents", "metadatas", "distances", "embeddings")
+        if results[0].get(f) is not None
+    ]
+    distance_at = fields.index("distances")
+    merged = {f: [] for f in fields}
+    for q in range(len(results[0]["ids"])):
+        rows = []
+        for result in results:
+            if not result.get("ids") or not result["ids"][q]:
+                continue
+            rows.extend(zip(*(result[f][q] for f in fields)))
+        rows.sort(key=lambda row: row[distance_at])
+        rows = rows[:n_results]
+        for i, f in enumerate(fields):
+            merged[f].append([row[i] for row in rows])
+    return merged
+
+
+def _split_query_results(results) -> list[dict]:
+    """One single-query result per query of a multi-query result."""
+    fields = [
+        f for f in ("ids", "documents", "metadatas", "distances", "embeddings")
+        if results.get(f) is not None
+    ]
+    return [{f: [results[f][q]] for f in fields} for q in range(len(results["ids"]))]
+
+
+def create_chroma_client(db_path=DEFAULT_DB_PATH, backend=VECTOR_BACKEND):
+    """
+    NumpyVectorClient for the "numpy" backend; otherwise HttpClient when
+    CHROMA_HOST is set, else a local PersistentClient.
+    """
+    if backend not in VECTOR_BACKENDS:
+        raise ValueError(f"Unsupported vector backend '{backend}'. Use one of {VECTOR_BACKENDS}")
+    if backend == "numpy":
+        path = os.path.join(db_path, NUMPY_VECTOR_DIR)
+        logger.info(f"Using the in-process vector store at {path}")
+        return NumpyVectorClient(path)
+
+    chroma_host = os.getenv("CHROMA_HOST")
+    chroma_port = os.getenv("CHROMA_PORT", "8000")
+
+    if chroma_host:
+        logger.info(f"Connecting to ChromaDB at {chroma_host}:{chroma_port} via HttpClient")
+        return chromadb.HttpClient(host=chroma_host, port=chroma_port)
+    logger.info(f"Connecting to ChromaDB at {db_path} via PersistentClient")
+    return chromadb.PersistentClient(path=db_path)
+
 
 class ChromaManager:
-    def __init__(self, db_path=DEFAULT_DB_PATH, collection_name="notion_docs"):
+    def __init__(
+        self,
+        db_path=DEFAULT_DB_PATH,
+        collection_name="notion_docs",
+        embedding_cache=None,
+        rescore_store=None,
+        max_in_flight=EMBEDDING_MAX_IN_FLIGHT,
+        query_cache_size=QUERY_EMBEDDING_CACHE_SIZE,
+        embedding_dimension=EMBEDDING_DIMENSION,
+        rescore_oversample=RESCORE_OVERSAMPLE,
+        layout=CHROMA_COLLECTION_LAYOUT,
+        hnsw=None,
+        backend=VECTOR_BACKEND,
+    ):
         """
         Initialize the ChromaDB client and collection.
         :param db_path: Path to the persistent database directory.
         :param collection_name: Name of the collection to use.
+        :param embedding_cache: EmbeddingCache to consult before calling the
+                                embedding API (defaults to the on-disk cache).
+        :param rescore_store: RescoreVectorStore holding full-size vectors when
+                              rescoring (defaults to the on-disk store).
+        :param max_in_flight: Embedding batches kept in flight during add_documents.
+        :param query_cache_size: Capacity of the in-process query embedding LRU (0 disables it).
+        :param embedding_dimension: Size of the vectors stored in Chroma (e.g. 768 or 1536).
+        :param rescore_oversample: Candidate multiplier for full-precision rescoring
+                                   of reduced-dimension searches (0 disables it).
+        :param layout: "single" or "per_workspace" (one collection per workspace,
+                       queried in parallel when a filter spans several workspaces).
+        :param hnsw: HNSW settings for this manager's collections, a dict with any of
+                     space ("l2", "cosine", "ip"), construction_ef, search_ef and M.
+                     Defaults to the CHROMA_HNSW_* environment variables.
+                     The numpy backend searches exactly and only uses space.
+        :param backend: "chroma" or "numpy" (see create_chroma_client).
         """
+        if layout not in COLLECTION_LAYOUTS:
+            raise ValueError(f"Unsupported collection layout '{layout}'. Use one of {COLLECTION_LAYOUTS}")
         self.db_path = db_path
+        self.layout = layout
+        self.hnsw = {**HNSW_SETTINGS, **(hnsw or {})}
+        self.hnsw_configuration = hnsw_configuration(**self.hnsw)
         self.collection_name = collection_name
+        self.embedding_dimension = embedding_dimension
+        self.rescore_oversample = rescore_oversample if embedding_dimension else 0
 
-        # Initialize Google Embedder (gemini-embedding-001)
-        self.embedder = GoogleEmbedder()
+        # Initialize Google Embedder (gemini-embedding-001). With rescoring on,
+        # full-size vectors are kept in the rescore store and only their
+        # reduced prefix goes to Chroma; otherwise the API returns reduced vectors.
+        if self.rescore_oversample:
+            self.embedder = GoogleEmbedder()
+            self.rescore_store = rescore_store or RescoreVectorStore()
+        else:
+            self.embedder = GoogleEmbedder(output_dimensionality=embedding_dimension)
+            self.rescore_store = None
+        self.embedding_cache = embedding_cache or EmbeddingCache()
+        self.max_in_flight = max_in_flight
+        self.query_cache = TTLCache(query_cache_size, ttl_seconds=QUERY_EMBEDDING_CACHE_TTL)
 
         # Initialize Client
-        chroma_host = os.getenv("CHROMA_HOST")
-        chroma_port = os.getenv("CHROMA_PORT", "8000")
-
-        if chroma_host:
-            logger.info(f"Connecting to ChromaDB at {chroma_host}:{chroma_port} via HttpClient")
-            self.client = chromadb.HttpClient(host=chroma_host, port=chroma_port)
-        else:
-            logger.info(f"Connecting to ChromaDB at {db_path} via PersistentClient")
-            self.client = chromadb.PersistentClient(path=db_path)
+        self.backend = backend
+        self.client = create_chroma_client(db_path, backend)
 
         # Open collection WITHOUT embedding_function to avoid ChromaDB's
         # conflict detection. We embed manually in add_documents() and query().
-        self.collection = self.client.get_or_create_collection(
-            name=collection_name
-        )
+        # In the per_workspace layout this base collection holds chunks that
+        # belong to no workspace (file uploads).
+        self.collection = self._get_or_create(collection_name)
+        self._workspace_collections = {}
+        self._collections_lock = threading.Lock()
         print(
-            f"Connected to ChromaDB at '{db_path}' (Collection: '{collection_name}') with Google Embedder"
+            f"Connected to ChromaDB at '{db_path}' (Collection: '{collection_name}', "
+            f"layout: {layout}, backend: {backend}) with Google Embedder"
+        )
+
+    @property
+    def per_workspace(self):
+        return self.layout == "per_workspace"
+
+    def _get_or_create(self, name):
+        # Open collections WITHOUT embedding_function to avoid ChromaDB's
+        # conflict detection. We embed manually in add_documents() and query().
+        collection = self.client.get_or_create_collection(
+            name=name, configuration=self.hnsw_configuration
         )
+        self._apply_hnsw(collection)
+        return collection
 
-    def add_documents(self, documents, metadatas, ids, batch_size=20):
+    def _apply_hnsw(self, collection):
         """
-        Add documents to the collection in batches.
-        Embeds using Google Embedder before storing.
+        Bring an existing collection's search_ef in line with the configured
+        value, and warn about build-time settings that differ (those need a
+        rebuild, e.g. with scripts/reproject_collection.py). Chroma reads
+        search_ef when it loads the index, so this runs as collections are opened.
         """
-        total = len(documents)
-        for i in range(0, total, batch_size):
-            batch_docs = documents[i:i + batch_size]
-            batch_meta = metadatas[i:i + batch_size]
-            batch_ids = ids[i:i + batch_size]
-            try:
-                # Generate embeddings with Google Embedder
-                embeddings = self.embedder(batch_docs)
-                self.collection.upsert(
-                    documents=batch_docs,
-                    metadatas=batch_meta,
-                    ids=batch_ids,
-                    embeddings=embeddings,
+        if not self.hnsw_configuration:
+            return
+        current = (collection.configuration or {}).get("hnsw") or {}
+        wanted = self.hnsw_configuration["hnsw"]
+
+        search_ef = wanted.get("ef_search")
+        if search_ef is not None and current.get("ef_search") != search_ef:
+            collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
+            print(f"Collection '{collection.name}': search_ef {current.get('ef_search')} -> {search_ef}")
+
+        for key in ("space", "ef_construction", "max_neighbors"):
+            if key in wanted and current.get(key) not in (None, wanted[key]):
+                logger.warning(
+                    f"Collection '{collection.name}' was built with {key}={current[key]}; "
+                    f"configured {key}={wanted[key]} only applies to new collections"
                 )
-                print(f"Added batch {i // batch_size + 1} ({len(batch_docs)} docs, {i + len(batch_docs)}/{total})")
-            except Exception as e:
-                print(f"Error adding batch {i // batch_size + 1}: {e}")
-                raise e
+
+    def _collection_for_workspace(self, workspace_id, create=True):
+        """Collection for a workspace's chunks (None if it doesn't exist and create is False)."""
+        if not self.per_workspace or workspace_id in (None, ""):
+            return self.collection
+        name = workspace_collection_name(self.collection_name, workspace_id)
+        with self._collections_lock:
+            collection = self._workspace_collections.get(name)
+        if collection is not None:
+            return collection
+        if create:
+            collection = self._get_or_create(name)
+        else:
+            try:
+                collection = self.client.get_collection(name)
+            except NotFoundError:
+                return None
+            self._apply_hnsw(collection)
+        with self._collections_lock:
+            return self._workspace_collections.setdefault(name, collection)
+
+    def _all_workspace_collections(self):
+        """Every workspace collection currently in the database."""
+        prefix = f"{self.collection_name}{WORKSPACE_COLLECTION_SEPARATOR}"
+        found = {c.name: c for c in self.client.list_collections() if c.name.startswith(prefix)}
+        with self._collections_lock:
+            known = self._workspace_collections
+        for name, collection in found.items():
+            if name in known:
+                found[name] = known[name]
+            else:
+                self._apply_hnsw(collection)
+        with self._collections_lock:
+            self._workspace_collections = found
+        return list(found.values())
+
+    def _collections_for(self, where):
+        """
+        Collections that can hold chunks matching a where filter. A workspace
+        filter maps to just those workspaces' collections; anything else
+        searches the base collection plus every workspace collection.
+        """
+        if not self.per_workspace:
+            return [self.collection]
+        workspace_ids = where_workspace_ids(where)
+        if workspace_ids is None:
+            return [self.collection] + self._all_workspace_collections()
+        collections = (self._collection_for_workspace(ws, create=False) for ws in workspace_ids)
+        return [c for c in collections if c is not None]
+
+    def versions_for(self, where=None) -> tuple:
+        """
+        (collection name, write version) of every collection a where filter
+        reads, read fresh from the vector store. Any write to one of them,
+        from any process, changes it, so it can key caches of search results
+        alongside BM25Manager.versions_for.
+        """
+        if not self.per_workspace:
+            names = [self.collection_name]
+        else:
+            workspace_ids = where_workspace_ids(where)
+            if workspace_ids is None:
+                prefix = f"{self.collection_name}{WORKSPACE_COLLECTION_SEPARATOR}"
+                return tuple(sorted(
+                    (c.name, (c.metadata or {}).get(WRITE_VERSION_KEY))
+                    for c in self.client.list_collections()
+                    if c.name == self.collection_name or c.name.startswith(prefix)
+                ))
+            names = sorted(set(workspace_collection_name(self.collection_name, ws) for ws in workspace_ids))
+
+        versions = []
+        for name in names:
+            try:
+                metadata = self.client.get_collection(name).metadata
+            except NotFoundError:
+                # Missing collections are left out, so dropping one changes the result
+                continue
+            versions.append((name, (metadata or {}).get(WRITE_VERSION_KEY)))
+        return tuple(versions)
+
+    @staticmethod
+    def _mark_written(collection):
+        """Give a collection a new write version (see versions_for). Call after the write."""
+        # Legacy "hnsw:*" keys can't be passed to modify(); the index settings
+        # live in the collection's configuration and are kept without them
+        metadata = {
+            key: value for key, value in (collection.metadata or {}).items()
+            if not key.startswith("hnsw:")
+        }
+        collection.modify(metadata={**metadata, WRITE_VERSION_KEY: uuid.uuid4().hex})
+
+    def _fan_out(self, fn, collections):
+        """Run fn on each collection, in parallel when there are several."""
+        if len(collections) == 1:
+            return [fn(collections[0])]
+        return list(_FANOUT_EXECUTOR.map(fn, collections))
+
+    def add_documents(
+        self,
+        documents,
+        metadatas,
+        ids,
+        batch_size=MAX_BATCH_SIZE,
+        upsert_batch_size=UPSERT_BATCH_SIZE,
+    ):
+        """
+        Add documents to the collection.
+        Embeds using Google Embedder before storing; each embedding batch of
+        batch_size documents is one API request, so it should match the
+        embedder's. Up to max_in_flight batches are embedded concurrently
+        while finished vectors are upserted in batches of upsert_batch_size.
+        """
+        pipeline = EmbeddingPipeline(
+            self._aembed, self._upsert_batch, max_in_flight=self.max_in_flight
+        )
+        try:
+            run_sync(pipeline.run(documents, metadatas, ids, batch_size, upsert_batch_size))
+        except Exception as e:
+            print(f"Error adding documents: {e}")
+            raise e
+
+    def _upsert_batch(self, documents, metadatas, ids, embeddings):
+        if self.rescore_store is not None:
+            # Stored before the index, so every searchable chunk has its full vector
+            self.rescore_store.put_many(
+                self.embedder.cache_namespace,
+                ids,
+                documents,
+                [meta.get("workspace_id") for meta in metadatas],
+                embeddings,
+            )
+        embeddings = self._to_index(embeddings)
+        groups = {}
+        for i, meta in enumerate(metadatas):
+            workspace_id = meta.get("workspace_id") if self.per_workspace else None
+            groups.setdefault(workspace_id, []).append(i)
+
+        for workspace_id, rows in groups.items():
+            collection = self._collection_for_workspace(workspace_id)
+            collection.upsert(
+                documents=[documents[i] for i in rows],
+                metadatas=[metadatas[i] for i in rows],
+                ids=[ids[i] for i in rows],
+                embeddings=[embeddings[i] for i in rows],
+            )
+            self._mark_written(collection)
 
     def query(self, query_text, n_results=5, where=None):
         """
@@ -79,34 +439,405 @@ class ChromaManager:
         Embeds the query using Google Embedder before searching.
         """
         print(f"Querying: '{query_text}'...")
+        query_embedding = self.embed_query(query_text)
+
+        if not self.rescore_oversample:
+            return self._query_collections(
+                [query_embedding],
+                n_results,
+                where,
+                include=["documents", "metadatas", "distances"],
+            )
+
+        results = self._query_collections(
+            self._to_index([query_embedding]),
+            n_results * self.rescore_oversample,
+            where,
+            include=["documents", "metadatas", "distances", "embeddings"],
+        )
+        return self._rescore(query_embedding, results, n_results)
+
+    def query_many(self, query_texts, n_results=5, where=None):
+        """
+        query() for a batch of questions: uncached questions are embedded in
+        batched API calls and every collection is searched once with all the
+        query embeddings. Returns one query()-shaped result per question.
+        """
+        if not query_texts:
+            return []
+        query_embeddings = self.embed_queries(query_texts)
+
+        if not self.rescore_oversample:
+            results = self._query_collections(
+                query_embeddings,
+                n_results,
+                where,
+                include=["documents", "metadatas", "distances"],
+            )
+            return _split_query_results(results)
+
+        results = self._query_collections(
+            self._to_index(query_embeddings),
+            n_results * self.rescore_oversample,
+            where,
+            include=["documents", "metadatas", "distances", "embeddings"],
+        )
+        return [
+            self._rescore(query_embedding, result, n_results)
+            for query_embedding, result in zip(query_embeddings, _split_query_results(results))
+        ]
+
+    def _query_collections(self, query_embeddings, n_results, where, include):
+        """
+        Query every collection the filter can match and merge by distance.
+        With several workspace collections the searches run in parallel.
+        """
+        collections = self._collections_for(where)
+        if not collections:
+            return {field: [[] for _ in query_embeddings] for field in ["ids", *include]}
+
+        def search(collection):
+            return collection.query(
+                query_embeddings=query_embeddings,
+                n_results=n_results,
+                where=where,
+                include=include,
+            )
+
+        results = self._fan_out(search, collections)
+        if len(results) == 1:
+            return results[0]
+        return _merge_query_results(results, n_results)
+
+    def _to_index(self, embeddings):
+        """Project vectors to the size stored in Chroma (no-op unless rescoring)."""
+        if not self.rescore_oversample:
+            return embeddings
+        return reduce_dimension(embeddings, self.embedding_dimension)
+
+    def _rescore(self, query_embedding, results, n_results):
+        """
+        Re-rank reduced-dimension candidates by cosine similarity of their
+        full-size float32 vectors from the rescore store. Candidates indexed
+        before rescoring was enabled have no full vector and keep their index
+        score (scripts/reproject_collection.py --seed-rescore fills them in).
+        Distances in the returned result are cosine distances.
+        """
+        docs = results["documents"][0]
+        if not docs:
+            return results
+
+        full_vectors = self.rescore_store.get_many(self.embedder.cache_namespace, results["ids"][0])
+        index_vectors = np.asarray(results["embeddings"][0], dtype=np.float32)
+        index_scores = cosine_scores(self._to_index([query_embedding])[0], index_vectors)
+
+        have_full = [i for i, v in enumerate(full_vectors) if v is not None]
+        if len(have_full) < len(docs):
+            logger.warning(
+                f"{len(docs) - len(have_full)}/{len(docs)} rescoring candidates have no "
+                "full-precision vector and keep their reduced-dimension score"
+            )
+        scores = index_scores.copy()
+        if have_full:
+            scores[have_full] = cosine_scores(
+                query_embedding, np.stack([full_vectors[i] for i in have_full])
+            )
+
+        order = np.argsort(-scores)[:n_results]
+        return {
+            "ids": [[results["ids"][0][i] for i in order]],
+            "documents": [[docs[i] for i in order]],
+            "metadatas": [[results["metadatas"][0][i] for i in order]],
+            "distances": [[float(1 - scores[i]) for i in order]],
+        }
+
+    def embed_query(self, query_text):
+        """
+        Embed a question with the same Google model used during ingestion.
+        Repeated and near-identical questions are served from an in-process
+        LRU keyed by (model, normalized question); see query_cache.stats().
+        """
+        return self.embed_queries([query_text])[0]
+
+    def embed_queries(self, query_texts):
+        """
+        Embed several questions, sending only those missing from the query
+        LRU (once per normalized question) to the embedding API, in batches.
+        """
+        keys = [(self.embedder.cache_namespace, normalize_query(text)) for text in query_texts]
+        embeddings = [self.query_cache.get(key) for key in keys]
+        # Normalized question -> first position needing it
+        missing = {}
+        for i, (key, embedding) in enumerate(zip(keys, embeddings)):
+            if embedding is None:
+                missing.setdefault(key, i)
+        if missing:
+            fresh = dict(zip(missing, self._embed([query_texts[i] for i in missing.values()])))
+            for key, embedding in fresh.items():
+                self.query_cache.put(key, embedding)
+            embeddings = [fresh.get(key, embedding) for key, embedding in zip(keys, embeddings)]
+        return embeddings
+
+    def _embed(self, texts):
+        """
+        Embed texts, serving previously seen content from the embedding cache
+        and only sending cache misses to the embedding API.
+        """
+        embeddings, missing = self._lookup_cached(texts)
+        if missing:
+            fresh = self.embedder([texts[i] for i in missing])
+            self._store_fresh(texts, embeddings, missing, fresh)
+        return embeddings
+
+    async def _aembed(self, texts):
+        """Async variant of _embed used by the ingestion pipeline."""
+        embeddings, missing = self._lookup_cached(texts)
+        if missing:
+            fresh = await self.embedder.aembed([texts[i] for i in missing])
+            self._store_fresh(texts, embeddings, missing, fresh)
+        return embeddings
 
-        # Embed the query with the same Google model used during ingestion
-        query_embedding = self.embedder([query_text])
+    def _lookup_cached(self, texts):
+        if self.rescore_store is None:
+            embeddings = self.embedding_cache.get_many(self.embedder.cache_namespace, texts)
+        else:
+            # Rescore vectors must be exact: reuse indexed chunks' vectors, and
+            # only full-precision entries of a (possibly quantized) cache
+            embeddings = self.rescore_store.get_by_texts(self.embedder.cache_namespace, texts)
+            uncached = [i for i, vector in enumerate(embeddings) if vector is None]
+            if uncached:
+                cached = self.embedding_cache.get_many(
+                    self.embedder.cache_namespace, [texts[i] for i in uncached], dtype="float32"
+                )
+                for i, vector in zip(uncached, cached):
+                    embeddings[i] = vector
+        missing = [i for i, vector in enumerate(embeddings) if vector is None]
+        if len(texts) > 1:
+            logger.info(
+                f"Embedding {len(texts)} texts ({len(texts) - len(missing)} from cache, "
+                f"{len(missing)} via API)"
+            )
+        return embeddings, missing
 
-        results = self.collection.query(
-            query_embeddings=query_embedding,
-            n_results=n_results,
-            where=where,
-            include=["documents", "metadatas", "distances"],
+    def _store_fresh(self, texts, embeddings, missing, fresh):
+        for i, vector in zip(missing, fresh):
+            embeddings[i] = vector
+        # Empty texts get placeholder zero vectors; don't cache those
+        to_cache = [i for i in missing if texts[i].strip()]
+        self.embedding_cache.put_many(
+            self.embedder.cache_namespace,
+            [texts[i] for i in to_cache],
+            [embeddings[i] for i in to_cache],
         )
-        return results
 
-    def get_by_parent(self, parent_id, limit=20):
+    def get_by_parent(self, parent_id, limit=20, where=None):
         """
         Fetch all chunks belonging to a parent document.
         Used for sibling chunk expansion at retrieval time.
         """
-        results = self.collection.get(
-            where={"parent_id": parent_id},
-            limit=limit,
-            include=["documents", "metadatas"],
+        grouped = self.get_by_parents([parent_id], per_parent_limit=limit, where=where)
+        return grouped.get(parent_id, {"ids": [], "documents": [], "metadatas": []})
+
+    def upsert_changed(
+        self,
+        documents,
+        metadatas,
+        ids,
+        scope=None,
+        batch_size=MAX_BATCH_SIZE,
+        upsert_batch_size=UPSERT_BATCH_SIZE,
+    ):
+        """
+        Incrementally index chunks.
+        Each chunk's metadata gets a content_hash; only chunks whose hash
+        differs from the stored one are embedded and upserted, and stored
+        chunks within the scope that are no longer present are deleted.
+
+        :param scope: Where filter covering every chunk this call is the
+                      source of truth for (e.g. {"workspace_id": ...} for a
+                      full workspace sync, which also drops deleted pages).
+                      Defaults to the parent documents being indexed, which
+                      removes orphaned chunks when a page shrinks.
+        :return: Counts of added, updated, unchanged and deleted chunks.
+        """
+        metadatas = [
+            {**meta, "content_hash": chunk_content_hash(doc, meta)}
+            for doc, meta in zip(documents, metadatas)
+        ]
+
+        if scope is None:
+            parent_ids = list(dict.fromkeys(m["parent_id"] for m in metadatas if m.get("parent_id")))
+            if self.per_workspace:
+                workspace_ids = dict.fromkeys(m.get("workspace_id") for m in metadatas)
+                collections = [self._collection_for_workspace(ws, create=False) for ws in workspace_ids]
+                collections = [c for c in collections if c is not None]
+            else:
+                collections = [self.collection]
+            existing = {}
+            for start in range(0, len(parent_ids), SCAN_PAGE_SIZE):
+                page = parent_ids[start:start + SCAN_PAGE_SIZE]
+                for collection in collections:
+                    existing.update(self._stored_hashes(collection, {"parent_id": {"$in": page}}))
+        else:
+            existing = {}
+            for collection in self._collections_for(scope):
+                existing.update(self._stored_hashes(collection, scope))
+
+        changed = [
+            i for i, (chunk_id, meta) in enumerate(zip(ids, metadatas))
+            if chunk_id not in existing or existing[chunk_id][0] != meta["content_hash"]
+        ]
+        current_ids = set(ids)
+        stale_by_collection = {}
+        for chunk_id, (_, collection) in existing.items():
+            if chunk_id not in current_ids:
+                stale_by_collection.setdefault(collection.name, (collection, []))[1].append(chunk_id)
+
+        if changed:
+            self.add_documents(
+                [documents[i] for i in changed],
+                [metadatas[i] for i in changed],
+                [ids[i] for i in changed],
+                batch_size=batch_size,
+                upsert_batch_size=upsert_batch_size,
+            )
+        for collection, stale_ids in stale_by_collection.values():
+            for start in range(0, len(stale_ids), SCAN_PAGE_SIZE):
+                collection.delete(ids=stale_ids[start:start + SCAN_PAGE_SIZE])
+            self._mark_written(collection)
+            if self.rescore_store is not None:
+                self.rescore_store.delete(stale_ids)
+
+        counts = {
+            "added": sum(1 for i in changed if ids[i] not in existing),
+            "updated": sum(1 for i in changed if ids[i] in existing),
+            "unchanged": len(ids) - len(changed),
+            "deleted": sum(len(stale_ids) for _, stale_ids in stale_by_collection.values()),
+        }
+        print(
+            f"Incremental index: {counts['added']} added, {counts['updated']} updated, "
+            f"{counts['unchanged']} unchanged, {counts['deleted']} deleted"
         )
-        return results
+        return counts
+
+    def _stored_hashes(self, collection, where):
+        """
+        Map chunk id -> (stored content_hash, collection) for chunks in a
+        collection matching where. The hash is None for legacy chunks.
+        """
+        hashes = {}
+        offset = 0
+        while True:
+            page = collection.get(
+                where=where, include=["metadatas"], limit=SCAN_PAGE_SIZE, offset=offset
+            )
+            page_ids = page.get("ids") or []
+            for chunk_id, meta in zip(page_ids, page.get("metadatas") or []):
+                hashes[chunk_id] = ((meta or {}).get("content_hash"), collection)
+            if len(page_ids) < SCAN_PAGE_SIZE:
+                return hashes
+            offset += SCAN_PAGE_SIZE
+
+    def get_by_parents(self, parent_ids, per_parent_limit=20, where=None, workspace_ids=None):
+        """
+        Fetch chunks for several parent documents.
+        Returns {parent_id: {"ids", "documents", "metadatas"}} with at most
+        per_parent_limit chunks per parent, in collection order.
+        One $in query reads only ids and metadata; documents are then fetched
+        for the chunks that were kept, so large pages don't pull every chunk's
+        text. A single parent is one query limited to per_parent_limit.
+        :param where: The caller's filter (e.g. the user's workspaces); only
+                      chunks matching it are returned.
+        :param workspace_ids: In the per_workspace layout, the workspaces whose
+                              collections to read when where does not restrict
+                              by workspace. The base collection (file uploads)
+                              is always read; other tenants' collections never are.
+        """
+        parent_ids = list(dict.fromkeys(p for p in parent_ids if p))
+        grouped = {pid: {"ids": [], "documents": [], "metadatas": []} for pid in parent_ids}
+        if not parent_ids:
+            return grouped
+
+        collections = [self.collection]
+        if self.per_workspace:
+            scoped_ids = where_workspace_ids(where)
+            for workspace_id in dict.fromkeys(scoped_ids if scoped_ids is not None else workspace_ids or []):
+                collection = self._collection_for_workspace(workspace_id, create=False)
+                if collection is not None:
+                    collections.append(collection)
+
+        def scoped(parent_clause):
+            return {"$and": [parent_clause, where]} if where else parent_clause
+
+        if len(parent_ids) == 1:
+            def fetch(collection):
+                return collection.get(
+                    where=scoped({"parent_id": parent_ids[0]}),
+                    limit=per_parent_limit,
+                    include=["documents", "metadatas"],
+                )
+        else:
+            def fetch(collection):
+                results = collection.get(
+                    where=scoped({"parent_id": {"$in": parent_ids}}), include=["metadatas"]
+                )
+                counts = dict.fromkeys(parent_ids, 0)
+                kept_ids, kept_metas = [], []
+                for chunk_id, meta in zip(results.get("ids") or [], results.get("metadatas") or []):
+                    parent_id = (meta or {}).get("parent_id")
+                    if counts.get(parent_id, per_parent_limit) < per_parent_limit:
+                        counts[parent_id] += 1
+                        kept_ids.append(chunk_id)
+                        kept_metas.append(meta)
+                if not kept_ids:
+                    return {"ids": [], "documents": [], "metadatas": []}
+                docs = collection.get(ids=kept_ids, include=["documents"])
+                doc_by_id = dict(zip(docs["ids"], docs["documents"]))
+                return {
+                    "ids": kept_ids,
+                    "documents": [doc_by_id.get(chunk_id) for chunk_id in kept_ids],
+                    "metadatas": kept_metas,
+                }
+
+        rows = []
+        for results in self._fan_out(fetch, collections):
+            rows.extend(zip(
+                results.get("ids") or [],
+                results.get("documents") or [],
+                results.get("metadatas") or [],
+            ))
+
+        for chunk_id, doc, meta in rows:
+            group = grouped.get((meta or {}).get("parent_id"))
+            if group is None or len(group["ids"]) >= per_parent_limit or doc is None:
+                continue
+            group["ids"].append(chunk_id)
+            group["documents"].append(doc)
+            group["metadatas"].append(meta)
+        return grouped
 
     def delete_by_workspace(self, workspace_id: str):
-        """Delete all chunks belonging to a specific workspace."""
+        """
+        Delete all chunks belonging to a specific workspace. In the
+        per_workspace layout this drops the workspace's collection instead
+        of scanning a shared one; the base collection holds no workspace
+        chunks once migrate_to_workspace_collections.py has run with
+        --delete-source-chunks.
+        """
         try:
-            self.collection.delete(where={"workspace_id": workspace_id})
+            if self.per_workspace:
+                name = workspace_collection_name(self.collection_name, workspace_id)
+                with self._collections_lock:
+                    self._workspace_collections.pop(name, None)
+                try:
+                    self.client.delete_collection(name)
+                except NotFoundError:
+                    pass
+            else:
+                self.collection.delete(where={"workspace_id": workspace_id})
+                self._mark_written(self.collection)
+            if self.rescore_store is not None:
+                self.rescore_store.delete_workspace(workspace_id)
             print(f"Deleted all chunks for workspace '{workspace_id}'")
         except Exception as e:
             logger.error(f"Error deleting chunks for workspace {workspace_id}: {e}")
@@ -114,11 +845,16 @@ class ChromaManager:
 
     def reset(self):
         """
-        DANGER: Deletes and recreates the collection.
-        Useful for testing/dev environments.
+        DANGER: Deletes and recreates the collection (and drops every
+        workspace collection). Useful for testing/dev environments.
         """
+        for collection in self._all_workspace_collections():
+            self.client.delete_collection(collection.name)
+        with self._collections_lock:
+            self._workspace_collections = {}
         self.client.delete_collection(self.collection_name)
-        self.collection = self.client.get_or_create_collection(
-            self.collection_name
-        )
+        self.collection = self._get_or_create(self.collection_name)
+        self._mark_written(self.collection)
+        if self.rescore_store is not None:
+            self.rescore_store.clear()
         print(f"Collection '{self.collection_name}' has been reset.")
@@ -0,0 +1,231 @@
+"""
+Persistent, content-addressed embedding cache backed by SQLite.
+Vectors are keyed by (model, normalized text hash) so unchanged chunks are
+never sent to the embedding API twice, across syncs and process restarts.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from src.backend.load.quantization import VECTOR_DTYPES, dequantize, quantize
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../"))
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH",
+    os.path.join(PROJECT_ROOT, "workmate_db", "embedding_cache.sqlite3"),
+)
+EMBEDDING_CACHE_MAX_MB = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "1024"))
+# Storage precision for cached vectors: float32 (exact), float16 or int8.
+# With rescoring on (RESCORE_OVERSAMPLE), only float32 entries are reused, as
+# indexed vectors must be exact for the rescore store (see rescore_store.py).
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float32")
+
+# Evict down to this fraction of max_bytes so eviction doesn't run on every insert
+_EVICT_TARGET_RATIO = 0.9
+# SQLite limits the number of bound parameters per statement
+_SQL_CHUNK = 500
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text before hashing: NFC, trimmed, whitespace runs collapsed."""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def normalize_query(text: str) -> str:
+    """
+    Aggressive normalization for short user questions: also lowercases and
+    drops punctuation, so "What are the sprint tasks?" and
+    "what are the sprint tasks" share a key.
+    """
+    return normalize_text(_PUNCTUATION_RE.sub(" ", text.lower()))
+
+
+def text_key(model: str, text: str) -> str:
+    """Cache key for a text embedded with the given model."""
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{model}:{digest}"
+
+
+class EmbeddingCache:
+    def __init__(
+        self,
+        path: str = EMBEDDING_CACHE_PATH,
+        max_mb: int = EMBEDDING_CACHE_MAX_MB,
+        dtype: str = EMBEDDING_CACHE_DTYPE,
+    ):
+        """
+        :param path: SQLite file to store vectors in.
+        :param max_mb: Size budget for stored vectors; least recently used
+                       entries are evicted once it is exceeded.
+        :param dtype: Precision new vectors are stored at. Existing entries
+                      keep the precision they were written with.
+        """
+        if dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unsupported cache dtype '{dtype}'. Use one of {VECTOR_DTYPES}")
+        self.path = path
+        self.dtype = dtype
+        self.max_bytes = max_mb * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                dtype TEXT NOT NULL DEFAULT 'float32'
+            )
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(embeddings)")}
+        if "dtype" not in columns:
+            self._conn.execute(
+                "ALTER TABLE embeddings ADD COLUMN dtype TEXT NOT NULL DEFAULT 'float32'"
+            )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access)"
+        )
+        self._conn.commit()
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    def get_many(self, model: str, texts: list[str], dtype: str | None = None) -> list:
+        """
+        Return cached float32 vectors aligned with texts (None for misses).
+        :param dtype: Only return vectors stored at this precision; others count as misses.
+        """
+        keys = [text_key(model, t) for t in texts]
+        found: dict = {}
+
+        with self._lock:
+            unique_keys = list(dict.fromkeys(keys))
+            for start in range(0, len(unique_keys), _SQL_CHUNK):
+                chunk = unique_keys[start:start + _SQL_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector, dtype FROM embeddings WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                for key, blob, stored_dtype in rows:
+                    if dtype is None or stored_dtype == dtype:
+                        found[key] = dequantize(blob, stored_dtype)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+
+            results = [found.get(key) for key in keys]
+            hits = sum(1 for r in results if r is not None)
+            self.hits += hits
+            self.misses += len(results) - hits
+        return results
+
+    def put_many(self, model: str, texts: list[str], vectors: list):
+        """Store vectors for texts, evicting old entries if over budget."""
+        now = time.time()
+        rows = {}
+        for text, vector in zip(texts, vectors):
+            blob = quantize(vector, self.dtype)
+            rows[text_key(model, text)] = (blob, len(blob), now)
+
+        if not rows:
+            return
+
+        with self._lock:
+            keys = list(rows)
+            for start in range(0, len(keys), _SQL_CHUNK):
+                chunk = keys[start:start + _SQL_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                replaced = self._conn.execute(
+                    f"SELECT COALESCE(SUM(size), 0) FROM embeddings WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchone()[0]
+                self._total_bytes -= replaced
+
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, size, last_access, dtype) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(key, blob, size, ts, self.dtype) for key, (blob, size, ts) in rows.items()],
+            )
+            self._total_bytes += sum(size for _, size, _ in rows.values())
+
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Delete least recently used entries until under the target size. Caller holds the lock."""
+        target = int(self.max_bytes * _EVICT_TARGET_RATIO)
+        to_free = self._total_bytes - target
+        freed = 0
+        evicted_keys = []
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM embeddings ORDER BY last_access ASC"
+        ):
+            if freed >= to_free:
+                break
+            evicted_keys.append((key,))
+            freed += size
+
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", evicted_keys)
+        self._total_bytes -= freed
+        self.evictions += len(evicted_keys)
+        logger.info(
+            f"Embedding cache evicted {len(evicted_keys)} entries ({freed // 1024} KiB)"
+        )
+
+    def vectors_for(self, model: str, limit: int | None = None) -> list:
+        """All cached float32 vectors for a model (for offline benchmarks; does not touch LRU order)."""
+        prefix = f"{model}:"
+        query = "SELECT vector, dtype FROM embeddings WHERE substr(key, 1, ?) = ?"
+        params: tuple = (len(prefix), prefix)
+        if limit:
+            query += " LIMIT ?"
+            params += (limit,)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [dequantize(blob, dtype) for blob, dtype in rows]
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "size_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._total_bytes = 0
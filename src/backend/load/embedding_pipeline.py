@@ -0,0 +1,166 @@
+"""
+Async embedding engine for ingestion.
+
+Keeps several embedding batches in flight at once (bounded by max_in_flight,
+paced by the shared rate limiter) and hands finished vectors through a
+bounded queue to a separate upsert stage, so embedding round trips overlap
+with vector store writes while memory stays bounded on large workspaces.
+Embedding and upsert batch sizes are independent.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Coroutine
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MAX_IN_FLIGHT = int(os.getenv("EMBEDDING_MAX_IN_FLIGHT", "4"))
+EMBEDDING_MAX_QUEUED = int(os.getenv("EMBEDDING_MAX_QUEUED", "8"))
+UPSERT_BATCH_SIZE = int(os.getenv("CHROMA_UPSERT_BATCH_SIZE", "500"))
+
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return a long-lived event loop running in a daemon thread.
+    The aio client keeps connections tied to the loop that opened them, so
+    all async embedding work runs on this one loop instead of a fresh
+    asyncio.run() per call (which would also fail inside FastAPI's loop).
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_loop.run_forever, name="embedding-pipeline", daemon=True
+            ).start()
+        return _loop
+
+
+def run_sync(coro: Coroutine):
+    """Run a coroutine on the pipeline loop and block until it finishes."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+
+def _first_error(error: BaseException) -> BaseException:
+    """Unwrap TaskGroup ExceptionGroups so callers see the original error."""
+    while isinstance(error, BaseExceptionGroup):
+        error = error.exceptions[0]
+    return error
+
+
+class EmbeddingPipeline:
+    def __init__(
+        self,
+        embed_fn: Callable[[list[str]], Awaitable[list]],
+        upsert_fn: Callable[[list[str], list[dict], list[str], list], None],
+        max_in_flight: int = EMBEDDING_MAX_IN_FLIGHT,
+        max_queued: int = EMBEDDING_MAX_QUEUED,
+    ):
+        """
+        :param embed_fn: Async function embedding a batch of texts.
+        :param upsert_fn: Blocking function writing one batch
+                          (documents, metadatas, ids, embeddings); run in a worker thread.
+        :param max_in_flight: Maximum number of embedding batches awaiting the API.
+        :param max_queued: Maximum number of embedded batches waiting for the upsert
+                           stage. When full, embedding pauses (backpressure), so at
+                           most max_in_flight + max_queued batches of vectors are held.
+        """
+        self.embed_fn = embed_fn
+        self.upsert_fn = upsert_fn
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queued = max(1, max_queued)
+
+    async def run(self, documents, metadatas, ids, embed_batch_size: int, upsert_batch_size: int):
+        """Embed and upsert all documents. Raises the first error from either stage."""
+        stats = _StageStats(total=len(documents))
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_queued)
+
+        try:
+            async with asyncio.TaskGroup() as stages:
+                stages.create_task(self._upsert_stage(queue, upsert_batch_size, stats))
+                async with asyncio.TaskGroup() as embedders:
+                    for i in range(0, len(documents), embed_batch_size):
+                        # Only start a batch once a slot frees up, so pending work stays bounded
+                        await semaphore.acquire()
+                        batch = (
+                            documents[i:i + embed_batch_size],
+                            metadatas[i:i + embed_batch_size],
+                            ids[i:i + embed_batch_size],
+                        )
+                        embedders.create_task(self._embed_stage(semaphore, queue, batch, stats))
+                await queue.put(None)
+        except BaseExceptionGroup as eg:
+            raise _first_error(eg) from None
+
+        stats.log()
+
+    async def _embed_stage(self, semaphore, queue, batch, stats):
+        docs, metas, batch_ids = batch
+        try:
+            with stats.timed("embed", len(docs)):
+                embeddings = await self.embed_fn(docs)
+            await queue.put((docs, metas, batch_ids, embeddings))
+        finally:
+            semaphore.release()
+
+    async def _upsert_stage(self, queue, upsert_batch_size: int, stats):
+        buffer: list[tuple] = []
+        buffered = 0
+        while True:
+            item = await queue.get()
+            if item is not None:
+                buffer.append(item)
+                buffered += len(item[0])
+            if buffer and (item is None or buffered >= upsert_batch_size):
+                docs, metas, batch_ids, embeddings = (
+                    [x for part in buffer for x in part[field]] for field in range(4)
+                )
+                with stats.timed("upsert", len(docs)):
+                    await asyncio.to_thread(self.upsert_fn, docs, metas, batch_ids, embeddings)
+                print(f"Upserted {len(docs)} docs ({stats.counts['upsert']}/{stats.total})")
+                buffer, buffered = [], 0
+            if item is None:
+                return
+
+
+class _StageStats:
+    """Per-stage document counts and timings, for the end-of-run throughput log."""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.counts = {"embed": 0, "upsert": 0}
+        self.busy = {"embed": 0.0, "upsert": 0.0}
+        self.first_start: dict[str, float] = {}
+        self.last_end: dict[str, float] = {}
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def timed(self, stage: str, count: int):
+        t0 = time.perf_counter()
+        self.first_start.setdefault(stage, t0)
+        yield
+        t1 = time.perf_counter()
+        self.busy[stage] += t1 - t0
+        self.last_end[stage] = t1
+        self.counts[stage] += count
+
+    def log(self):
+        wall = time.perf_counter() - self.started
+        parts = [f"{self.total} docs in {wall:.1f}s"]
+        for stage in ("embed", "upsert"):
+            # Embedding batches overlap, so throughput is measured over the stage's active span
+            span = self.last_end.get(stage, 0.0) - self.first_start.get(stage, 0.0)
+            rate = self.counts[stage] / span if span > 0 else 0.0
+            parts.append(
+                f"{stage}: {self.counts[stage]} docs, {rate:.1f} docs/s "
+                f"(active {span:.1f}s, busy {self.busy[stage]:.1f}s)"
+            )
+        print("Ingestion pipeline: " + " | ".join(parts))
@@ -4,25 +4,64 @@ Implements ChromaDB's EmbeddingFunction protocol.
 """
 
 import os
-import time
 
 from chromadb.api.types import EmbeddingFunction, Documents, Embeddings
 from dotenv import load_dotenv
 from google import genai
 from google.genai import errors as genai_errors
+from google.genai import types
+
+from src.backend.load.quantization import l2_normalize
+
+from src.backend.utils.rate_limiter import (
+    estimate_tokens,
+    get_rate_limiter,
+    is_rate_limit_error,
+    parse_retry_delay,
+)
 
 load_dotenv()
 
+# batchEmbedContents accepts at most 100 contents per request
+MAX_BATCH_SIZE = 100
+# Rough per-request input budget (~4 chars per token, 20k tokens per request)
+MAX_BATCH_CHARS = 80_000
+# Native output size of gemini-embedding-001, used to pad empty inputs
+DEFAULT_EMBEDDING_DIM = 3072
+MAX_RETRIES = 5
+
 
 class GoogleEmbedder(EmbeddingFunction):
     """
     Custom embedding function using Google's gemini-embedding-001 model.
     Implements ChromaDB's EmbeddingFunction protocol.
-    Includes rate limit handling with automatic retries.
+    Sends documents in batched requests, paced by the shared Gemini embedding
+    rate limiter, with automatic retries on rate limit errors.
     """
 
-    def __init__(self, model_name="gemini-embedding-001"):
+    def __init__(
+        self,
+        model_name="gemini-embedding-001",
+        batch_size=MAX_BATCH_SIZE,
+        max_batch_chars=MAX_BATCH_CHARS,
+        output_dimensionality=None,
+    ):
+        """
+        :param output_dimensionality: Request smaller vectors (e.g. 768 or 1536)
+                                      from the API. Reduced vectors are not
+                                      unit length, so they are L2-normalized here.
+        """
         self.model_name = model_name
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)
+        self.max_batch_chars = max_batch_chars
+        self.output_dimensionality = output_dimensionality
+        self.dimension = output_dimensionality or DEFAULT_EMBEDDING_DIM
+        self.config = (
+            types.EmbedContentConfig(output_dimensionality=output_dimensionality)
+            if output_dimensionality
+            else None
+        )
+        self.rate_limiter = get_rate_limiter("gemini-embedding")
 
         api_key = os.getenv("GEMINI_EMBEDDING_API_KEY")
         if not api_key:
@@ -35,38 +74,126 @@ class GoogleEmbedder(EmbeddingFunction):
     def name(self) -> str:
         return "google_embedder"
 
+    @property
+    def cache_namespace(self) -> str:
+        """Identifies the vector space produced, for embedding cache keys."""
+        if self.output_dimensionality:
+            return f"{self.model_name}@{self.output_dimensionality}"
+        return self.model_name
+
     def __call__(self, input: Documents) -> Embeddings:
-        """Embed a list of documents with automatic rate limit handling."""
+        """
+        Embed a list of documents, one output vector per input.
+        Empty or whitespace-only documents get a zero vector so the output
+        stays aligned with the input.
+        """
         if not input:
             return []
 
-        embeddings = []
-        for i, doc in enumerate(input):
+        embeddings: list = [None] * len(input)
+        batches = list(self._make_batches(input))
+        for batch_num, positions in enumerate(batches):
+            vectors = self._embed_batch([input[i] for i in positions], batch_num, len(batches))
+            for pos, vector in zip(positions, vectors):
+                embeddings[pos] = vector
+        return self._fill_empty(embeddings)
+
+    async def aembed(self, input: Documents) -> Embeddings:
+        """
+        Async variant of __call__ using the google.genai aio client.
+        Batches are sent one after another; callers that want several
+        requests in flight run multiple aembed() calls concurrently.
+        """
+        if not input:
+            return []
+
+        embeddings: list = [None] * len(input)
+        batches = list(self._make_batches(input))
+        for batch_num, positions in enumerate(batches):
+            vectors = await self._aembed_batch(
+                [input[i] for i in positions], batch_num, len(batches)
+            )
+            for pos, vector in zip(positions, vectors):
+                embeddings[pos] = vector
+        return self._fill_empty(embeddings)
+
+    def _fill_empty(self, embeddings: list) -> list:
+        zero = [0.0] * self.dimension
+        return [vector if vector is not None else list(zero) for vector in embeddings]
+
+    def _make_batches(self, input: Documents):
+        """Group non-empty input positions into requests bounded by count and total characters."""
+        batch: list[int] = []
+        batch_chars = 0
+        for pos, doc in enumerate(input):
             if not doc.strip():
                 continue
+            doc_chars = len(input[pos])
+            if batch and (
+                len(batch) >= self.batch_size
+                or batch_chars + doc_chars > self.max_batch_chars
+            ):
+                yield batch
+                batch, batch_chars = [], 0
+            batch.append(pos)
+            batch_chars += doc_chars
+        if batch:
+            yield batch
+
+    def _embed_batch(self, docs: list[str], batch_num: int, total_batches: int) -> list[list[float]]:
+        """Embed one batch in a single request, retrying on rate limits."""
+        tokens = sum(estimate_tokens(doc) for doc in docs)
+        for attempt in range(MAX_RETRIES):
+            self.rate_limiter.acquire(tokens=tokens)
+            try:
+                result = self.client.models.embed_content(
+                    model=self.model_name,
+                    contents=docs,
+                    config=self.config,
+                )
+                self.rate_limiter.on_success()
+                return self._extract_vectors(result, len(docs))
+
+            except genai_errors.APIError as e:
+                if is_rate_limit_error(e) and attempt < MAX_RETRIES - 1:
+                    wait_time = self.rate_limiter.on_rate_limited(parse_retry_delay(e))
+                    print(
+                        f"⏳ Rate limited on batch {batch_num + 1}/{total_batches}, retrying in {wait_time:.0f}s..."
+                    )
+                else:
+                    raise e
+
+    async def _aembed_batch(self, docs: list[str], batch_num: int, total_batches: int) -> list[list[float]]:
+        """Async variant of _embed_batch."""
+        tokens = sum(estimate_tokens(doc) for doc in docs)
+        for attempt in range(MAX_RETRIES):
+            await self.rate_limiter.acquire_async(tokens=tokens)
+            try:
+                result = await self.client.aio.models.embed_content(
+                    model=self.model_name,
+                    contents=docs,
+                    config=self.config,
+                )
+                self.rate_limiter.on_success()
+                return self._extract_vectors(result, len(docs))
 
-            for attempt in range(3):
-                try:
-                    result = self.client.models.embed_content(
-                        model=self.model_name,
-                        contents=doc,
+            except genai_errors.APIError as e:
+                if is_rate_limit_error(e) and attempt < MAX_RETRIES - 1:
+                    wait_time = self.rate_limiter.on_rate_limited(parse_retry_delay(e))
+                    print(
+                        f"⏳ Rate limited on batch {batch_num + 1}/{total_batches}, retrying in {wait_time:.0f}s..."
                     )
-                    embeddings.append(result.embeddings[0].values)
-
-                    # Small delay to stay under rate limit (100 req/min = 1 per 0.6s)
-                    if i < len(input) - 1:
-                        time.sleep(0.7)
-                    break
-
-                except genai_errors.ClientError as e:
-                    error_str = str(e)
-                    if "429" in error_str and attempt < 2:
-                        wait_time = 45 * (attempt + 1)
-                        print(
-                            f"⏳ Rate limited on chunk {i + 1}/{len(input)}, waiting {wait_time}s..."
-                        )
-                        time.sleep(wait_time)
-                    else:
-                        raise e
-
-        return embeddings
+                else:
+                    raise e
+
+    def _extract_vectors(self, result, expected: int) -> list[list[float]]:
+        vectors = [e.values for e in result.embeddings]
+        if len(vectors) != expected:
+            raise ValueError(
+                f"Embedding API returned {len(vectors)} vectors for {expected} documents"
+            )
+        if vectors:
+            self.dimension = len(vectors[0])
+        if self.output_dimensionality:
+            vectors = l2_normalize(vectors).tolist()
+        return vectors
@@ -1,15 +1,45 @@
 import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from src.backend.load.bm25_manager import BM25Manager
 from src.backend.load.chroma_manager import ChromaManager
+from src.backend.load.embedding_cache import normalize_query
+from src.backend.utils.ttl_cache import TTLCache
+from src.backend.utils.where_filters import canonical_where
 
 logger = logging.getLogger(__name__)
 
+# Per-leg time budgets in seconds, counted from the start of search(). A leg
+# that misses its budget is left out and RRF runs on the other leg alone
+HYBRID_VECTOR_TIMEOUT = float(os.getenv("HYBRID_VECTOR_TIMEOUT", "10"))
+HYBRID_BM25_TIMEOUT = float(os.getenv("HYBRID_BM25_TIMEOUT", "3"))
+# Threads running retrieval legs. A timed-out leg keeps its thread until it
+# finishes, so this also bounds how many stalled legs can pile up
+HYBRID_LEG_WORKERS = int(os.getenv("HYBRID_LEG_WORKERS", "8"))
+# Fused results per (normalized question, workspace filter, index versions)
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "512"))
+RETRIEVAL_CACHE_TTL = float(os.getenv("RETRIEVAL_CACHE_TTL", "600"))
+
 
 class HybridRetriever:
-    def __init__(self, chroma_manager: ChromaManager, bm25_manager: BM25Manager):
+    def __init__(
+        self,
+        chroma_manager: ChromaManager,
+        bm25_manager: BM25Manager,
+        vector_timeout: float = HYBRID_VECTOR_TIMEOUT,
+        bm25_timeout: float = HYBRID_BM25_TIMEOUT,
+        cache_size: int = RETRIEVAL_CACHE_SIZE,
+    ):
+        """
+        :param cache_size: Capacity of the retrieval result LRU (0 disables it).
+        """
         self.chroma = chroma_manager
         self.bm25 = bm25_manager
+        self.timeouts = {"vector": vector_timeout, "bm25": bm25_timeout}
+        self.result_cache = TTLCache(cache_size, ttl_seconds=RETRIEVAL_CACHE_TTL)
+        self._legs = ThreadPoolExecutor(max_workers=HYBRID_LEG_WORKERS, thread_name_prefix="hybrid-leg")
 
     def search(
         self,
@@ -18,15 +48,140 @@ class HybridRetriever:
         bm25_top_k: int = 15,
         final_top_k: int = 15,
         where: dict | None = None,
+        stats: dict | None = None,
     ) -> list[dict]:
-        vector_results = self._query_chroma(query, vector_top_k, where=where)
-        bm25_results = self.bm25.search(query, top_k=bm25_top_k, where=where)
+        """
+        Run the vector leg (query embedding + Chroma) and the BM25 leg
+        concurrently and merge them with RRF. A leg that fails or exceeds its
+        timeout is dropped, so results degrade to the other source instead of
+        stalling; only if no leg succeeds is the first failure raised.
+
+        Results are cached by question, filter and the versions of the BM25
+        shards and vector collections the filter reads (see index_versions),
+        so any write to them, including the ingestion worker's Chroma-only
+        updates, invalidates the cached results.
+
+        :param stats: If given, filled with the cache outcome, each leg's
+                      status, result count and time in ms, and the total,
+                      for debug output.
+        """
+        started = time.perf_counter()
+        cache_key = (
+            normalize_query(query),
+            canonical_where(where),
+            self.index_versions(where),
+            vector_top_k,
+            bm25_top_k,
+            final_top_k,
+        )
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            if stats is not None:
+                stats.update(cache="hit", total_ms=self._elapsed_ms(started))
+            # Callers edit chunks in place (sibling expansion, truncation)
+            return [dict(chunk) for chunk in cached]
+
+        legs = {
+            "vector": self._legs.submit(self._timed, self._query_chroma, query, vector_top_k, where),
+            "bm25": self._legs.submit(self._timed, self.bm25.search, query, bm25_top_k, where),
+        }
 
-        merged = self.reciprocal_rank_fusion([vector_results, bm25_results])
-        return merged[:final_top_k]
+        results_lists, errors = [], []
+        leg_stats = {}
+        for name, future in legs.items():
+            remaining = max(0.0, started + self.timeouts[name] - time.perf_counter())
+            try:
+                results, elapsed_ms = future.result(timeout=remaining)
+            except TimeoutError as e:
+                future.cancel()
+                logger.warning(f"Hybrid search: {name} leg timed out after {self.timeouts[name]}s, skipping it")
+                leg_stats[name] = {"status": "timeout", "ms": self._elapsed_ms(started)}
+                errors.append(e)
+                continue
+            except Exception as e:
+                logger.error(f"Hybrid search: {name} leg failed, skipping it: {e}")
+                leg_stats[name] = {"status": "error", "ms": self._elapsed_ms(started), "error": str(e)}
+                errors.append(e)
+                continue
+            results_lists.append(results)
+            leg_stats[name] = {"status": "ok", "ms": elapsed_ms, "results": len(results)}
+
+        if stats is not None:
+            stats.update(leg_stats, cache="miss", total_ms=self._elapsed_ms(started))
+        if not results_lists:
+            raise errors[0]
+
+        merged = self.reciprocal_rank_fusion(results_lists)[:final_top_k]
+        # Results missing a leg are not cached, so the next ask retries it
+        if not errors:
+            self.result_cache.put(cache_key, [dict(chunk) for chunk in merged])
+        return merged
+
+    def search_many(
+        self,
+        queries: list[str],
+        vector_top_k: int = 15,
+        bm25_top_k: int = 15,
+        final_top_k: int = 15,
+        where: dict | None = None,
+    ) -> list[list[dict]]:
+        """
+        search() for a batch of questions (evaluation runs, offline Q&A).
+        Questions missing from the result cache are retrieved together: the
+        vector leg embeds them in batched calls and searches Chroma once with
+        all their embeddings, the BM25 leg scores them in matrix form, the two
+        legs run concurrently and RRF is applied per question.
+
+        There are no leg timeouts and a failing leg raises: nobody is waiting
+        on a batch, and silently dropping a leg would skew an evaluation.
+        """
+        versions = self.index_versions(where)
+        keys = [
+            (normalize_query(query), canonical_where(where), versions, vector_top_k, bm25_top_k, final_top_k)
+            for query in queries
+        ]
+        results = []
+        for key in keys:
+            cached = self.result_cache.get(key)
+            results.append(None if cached is None else [dict(chunk) for chunk in cached])
+
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            texts = [queries[i] for i in missing]
+            vector_leg = self._legs.submit(self.chroma.query_many, texts, vector_top_k, where)
+            bm25_leg = self._legs.submit(self.bm25.search_many, texts, bm25_top_k, where)
+            vector_results, bm25_results = vector_leg.result(), bm25_leg.result()
+            for i, vector_hits, bm25_hits in zip(missing, vector_results, bm25_results):
+                merged = self.reciprocal_rank_fusion(
+                    [self._chroma_chunks(vector_hits), bm25_hits]
+                )[:final_top_k]
+                self.result_cache.put(keys[i], [dict(chunk) for chunk in merged])
+                results[i] = merged
+        return results
+
+    def index_versions(self, where: dict | None = None) -> tuple:
+        """
+        Versions of everything a search with this filter reads: the BM25
+        shards and the vector collections. Writes to either (a sync, an
+        upload, a webhook update through the ingestion worker) change it.
+        """
+        return self.bm25.versions_for(where), self.chroma.versions_for(where)
+
+    @staticmethod
+    def _elapsed_ms(started: float) -> float:
+        return round((time.perf_counter() - started) * 1000, 1)
+
+    @classmethod
+    def _timed(cls, fn, *args):
+        started = time.perf_counter()
+        return fn(*args), cls._elapsed_ms(started)
 
     def _query_chroma(self, query: str, top_k: int, where: dict | None = None) -> list[dict]:
-        results = self.chroma.query(query, n_results=top_k, where=where)
+        return self._chroma_chunks(self.chroma.query(query, n_results=top_k, where=where))
+
+    @staticmethod
+    def _chroma_chunks(results: dict) -> list[dict]:
+        """Chunk dicts from a single-query Chroma result."""
         output = []
         if results and results.get("documents") and results["documents"][0]:
             docs = results["documents"][0]
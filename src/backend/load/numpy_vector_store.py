@@ -0,0 +1,594 @@
+"""
+In-process exact vector search that can stand in for a Chroma client.
+
+NumpyVectorClient implements the part of the chromadb client and collection
+API that ChromaManager uses (get_or_create_collection, get_collection,
+list_collections, delete_collection; upsert, query, get, delete, count,
+modify, metadata), so collection layouts, incremental sync and rescoring work on it
+unchanged. It is selected with VECTOR_BACKEND=numpy (see chroma_manager.py)
+and saves away the network hop to a Chroma server, which dominates query
+time for small and medium workspaces.
+
+Each collection is a directory under workmate_db/numpy_vectors/:
+    collection.json          name, configuration, metadata, vector dtype and dimension
+    CURRENT                  number of the active generation
+    gen-<n>/vectors.bin      one raw float32/float16 row per record
+    gen-<n>/records.jsonl    append-only log of upserts and deletes
+Upserts append vectors and one log line; replaced and deleted rows become
+tombstones until the collection is compacted into a new generation. The
+vector matrix is memory-mapped, and a query is one matrix product over the
+rows its where filter allows plus argpartition, so results are exact.
+Metadata is dictionary-encoded per field to build those filter masks.
+
+Writers (in any process) serialize on a lock file; readers pick up other
+writers' changes on their next call by replaying the new tail of the log,
+or by reloading after a compaction.
+"""
+
+import fcntl
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+from chromadb.errors import NotFoundError
+
+NUMPY_VECTOR_DTYPES = ("float32", "float16")
+# Storage precision of new collections. float16 halves the mapped matrix but
+# is converted to float32 block by block at query time, so it searches slower
+NUMPY_VECTOR_DTYPE = os.getenv("NUMPY_VECTOR_DTYPE", "float32")
+
+COLLECTION_CONFIG = "collection.json"
+CURRENT_GENERATION = "CURRENT"
+VECTORS = "vectors.bin"
+RECORDS = "records.jsonl"
+LOCK = "LOCK"
+
+# Compact once at least this many rows are dead and they outnumber live ones
+COMPACT_MIN_DEAD_ROWS = 1024
+# Rows per matrix product (bounds the float32 copy of float16 blocks)
+SCORE_BLOCK_ROWS = 8192
+# Filtered rows are scored as slices when their runs average at least this many rows
+RUN_MIN_ROWS = 64
+# Records per log line when a compaction rewrites the log
+COMPACT_PAGE_SIZE = 1000
+# Reported by get_max_batch_size(); upserts of any size are accepted
+MAX_BATCH_SIZE = 5461
+
+GET_INCLUDE = ("metadatas", "documents")
+QUERY_INCLUDE = ("metadatas", "documents", "distances")
+
+_COMPARISONS = {
+    "$gt": np.greater,
+    "$gte": np.greater_equal,
+    "$lt": np.less,
+    "$lte": np.less_equal,
+}
+
+
+def _value_key(value):
+    # Keeps True and 1 (equal and same hash) as different values
+    return type(value), value
+
+
+def _grow(array: np.ndarray, size: int, fill=0) -> np.ndarray:
+    """array, or a copy with room for at least size rows (new slots hold fill)."""
+    if size <= len(array):
+        return array
+    grown = np.full(max(size, 2 * len(array), 1024), fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class _MetadataColumns:
+    """Dictionary-encoded metadata fields, for turning where filters into row masks."""
+
+    def __init__(self):
+        # Field -> per-row index into its distinct values (-1 when absent)
+        self.codes: dict[str, np.ndarray] = {}
+        self.values: dict[str, list] = {}
+        self.lookups: dict[str, dict] = {}
+        # Field -> (distinct values seen, their float value or nan)
+        self._numbers: dict[str, tuple[int, np.ndarray]] = {}
+
+    def add(self, row: int, metadata: dict | None):
+        for field, value in (metadata or {}).items():
+            if field not in self.codes:
+                self.codes[field] = np.full(0, -1, dtype=np.int32)
+                self.values[field] = []
+                self.lookups[field] = {}
+            lookup = self.lookups[field]
+            code = lookup.get(_value_key(value))
+            if code is None:
+                code = lookup[_value_key(value)] = len(self.values[field])
+                self.values[field].append(value)
+            codes = self.codes[field] = _grow(self.codes[field], row + 1, fill=-1)
+            codes[row] = code
+
+    def _column(self, field: str, rows: int) -> np.ndarray:
+        codes = self.codes[field] = _grow(self.codes[field], rows, fill=-1)
+        return codes[:rows]
+
+    def _code(self, field: str, value) -> int:
+        # -2 matches no row (absent rows hold -1)
+        return self.lookups[field].get(_value_key(value), -2)
+
+    def _as_numbers(self, field: str) -> np.ndarray:
+        values = self.values[field]
+        cached = self._numbers.get(field)
+        if cached is None or cached[0] != len(values):
+            numbers = np.array([
+                float(v) if isinstance(v, (int, float)) and not isinstance(v, bool) else np.nan
+                for v in values
+            ] or [np.nan])
+            cached = self._numbers[field] = (len(values), numbers)
+        return cached[1]
+
+    def mask(self, where: dict | None, rows: int) -> np.ndarray:
+        """Rows (of the first `rows`) matching a Chroma-style where filter."""
+        mask = np.ones(rows, dtype=bool)
+        for key, condition in (where or {}).items():
+            if key in ("$and", "$or"):
+                parts = [self.mask(clause, rows) for clause in condition]
+                if parts:
+                    reduce = np.logical_and if key == "$and" else np.logical_or
+                    mask &= reduce.reduce(parts)
+            else:
+                mask &= self._field_mask(key, condition, rows)
+        return mask
+
+    def _field_mask(self, field: str, condition, rows: int) -> np.ndarray:
+        if field not in self.codes:
+            return np.zeros(rows, dtype=bool)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        codes = self._column(field, rows)
+        # Like Chroma, rows without the field match no condition on it
+        mask = codes >= 0
+        for op, operand in condition.items():
+            if op == "$eq":
+                mask &= codes == self._code(field, operand)
+            elif op == "$ne":
+                mask &= codes != self._code(field, operand)
+            elif op in ("$in", "$nin"):
+                hits = np.isin(codes, [self._code(field, value) for value in operand])
+                mask &= hits if op == "$in" else ~hits
+            elif op in _COMPARISONS:
+                numbers = self._as_numbers(field)[np.maximum(codes, 0)]
+                with np.errstate(invalid="ignore"):
+                    mask &= _COMPARISONS[op](numbers, operand)
+            else:
+                raise ValueError(f"Unsupported where operator '{op}'")
+        return mask
+
+
+class NumpyCollection:
+    """One collection: memory-mapped vectors plus in-memory records replayed from its log."""
+
+    def __init__(self, directory: str, name: str, configuration: dict | None = None,
+                 dtype: str = NUMPY_VECTOR_DTYPE):
+        self.directory = directory
+        self.name = name
+        self._lock = threading.RLock()
+        config_path = os.path.join(directory, COLLECTION_CONFIG)
+        if os.path.exists(config_path):
+            with open(config_path) as f:
+                config = json.load(f)
+            self._configuration = config.get("configuration") or {}
+            self.dtype = config["dtype"]
+            self.dimension = config.get("dimension")
+        else:
+            # Only the HNSW settings are meaningful (and JSON-serializable) here
+            self._configuration = {"hnsw": dict((configuration or {}).get("hnsw") or {})}
+            self.dtype = dtype
+            self.dimension = None
+            os.makedirs(directory, exist_ok=True)
+            self._save_config()
+        # Fixed at creation, like an HNSW index's space
+        self.space = (self._configuration.get("hnsw") or {}).get("space") or "l2"
+        self._reset()
+
+    @property
+    def configuration(self) -> dict:
+        return self._configuration
+
+    @property
+    def metadata(self) -> dict | None:
+        """Collection metadata as last saved by any process (read from disk, like Chroma's sysdb)."""
+        try:
+            with open(os.path.join(self.directory, COLLECTION_CONFIG)) as f:
+                return json.load(f).get("metadata")
+        except FileNotFoundError:
+            return None
+
+    def _save_config(self, metadata: dict | None = None):
+        """Write collection.json; metadata replaces the saved metadata, which is kept otherwise."""
+        tmp_path = os.path.join(self.directory, f"{COLLECTION_CONFIG}.tmp-{os.getpid()}")
+        metadata = self.metadata if metadata is None else metadata
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "name": self.name,
+                "configuration": self._configuration,
+                "metadata": metadata,
+                "dtype": self.dtype,
+                "dimension": self.dimension,
+            }, f)
+        os.replace(tmp_path, os.path.join(self.directory, COLLECTION_CONFIG))
+
+    # ── Loading ──────────────────────────────────────────────────────────
+
+    def _reset(self):
+        self._generation = None
+        self._log_offset = 0
+        self._rows = 0
+        self._ids: list[str | None] = []
+        self._documents: list[str | None] = []
+        self._metadatas: list[dict | None] = []
+        self._index: dict[str, int] = {}
+        self._live = np.zeros(0, dtype=bool)
+        self._norms = np.zeros(0, dtype=np.float32)
+        self._normed = 0
+        self._columns = _MetadataColumns()
+        self._matrix = None
+
+    def _path(self, name: str, generation: int | None = None) -> str:
+        return os.path.join(self.directory, f"gen-{generation or self._generation}", name)
+
+    def _read_generation(self) -> int | None:
+        try:
+            with open(os.path.join(self.directory, CURRENT_GENERATION)) as f:
+                return int(f.read())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_generation(self, generation: int):
+        tmp_path = os.path.join(self.directory, f"{CURRENT_GENERATION}.tmp-{os.getpid()}")
+        with open(tmp_path, "w") as f:
+            f.write(str(generation))
+        os.replace(tmp_path, os.path.join(self.directory, CURRENT_GENERATION))
+
+    def _refresh(self):
+        """Apply log records written since the last call (by anyone), reloading after a compaction."""
+        for attempt in range(3):
+            generation = self._read_generation()
+            if generation != self._generation:
+                self._reset()
+                self._generation = generation
+            if generation is None:
+                return
+            try:
+                self._replay()
+                return
+            except FileNotFoundError:
+                # Compacted away between reading CURRENT and opening its files
+                self._reset()
+        raise RuntimeError(f"Collection '{self.name}' kept changing while it was being loaded")
+
+    def _replay(self):
+        log_path = self._path(RECORDS)
+        size = os.path.getsize(log_path)
+        if size <= self._log_offset:
+            return
+        if self.dimension is None:
+            # Set by the first upsert, possibly in another process
+            with open(os.path.join(self.directory, COLLECTION_CONFIG)) as f:
+                self.dimension = json.load(f).get("dimension")
+        with open(log_path, "rb") as f:
+            f.seek(self._log_offset)
+            data = f.read(size - self._log_offset)
+        # A line still being written is picked up next time
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            self._apply(json.loads(line))
+        self._log_offset += end
+        self._map_vectors()
+
+    def _apply(self, record: dict):
+        if record["op"] == "delete":
+            for chunk_id in record["ids"]:
+                self._kill(chunk_id)
+            return
+        start = record["start"]
+        rows = start + len(record["records"])
+        # Rows between the previous end and start belong to an interrupted write
+        padding = rows - self._rows
+        self._ids.extend([None] * padding)
+        self._documents.extend([None] * padding)
+        self._metadatas.extend([None] * padding)
+        self._live = _grow(self._live, rows, fill=False)
+        for row, (chunk_id, document, metadata) in enumerate(record["records"], start):
+            self._kill(chunk_id)
+            self._ids[row] = chunk_id
+            self._documents[row] = document
+            self._metadatas[row] = metadata
+            self._index[chunk_id] = row
+            self._live[row] = True
+            self._columns.add(row, metadata)
+        self._rows = max(self._rows, rows)
+
+    def _kill(self, chunk_id: str):
+        row = self._index.pop(chunk_id, None)
+        if row is not None:
+            self._live[row] = False
+            self._documents[row] = None
+            self._metadatas[row] = None
+
+    def _map_vectors(self):
+        if not self._rows:
+            self._matrix = None
+            return
+        self._matrix = np.memmap(
+            self._path(VECTORS), dtype=self.dtype, mode="r", shape=(self._rows, self.dimension)
+        )
+        self._norms = _grow(self._norms, self._rows)
+        for start in range(self._normed, self._rows, SCORE_BLOCK_ROWS):
+            block = np.asarray(self._matrix[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            self._norms[start:start + len(block)] = np.linalg.norm(block, axis=1)
+        self._normed = self._rows
+
+    # ── Writes ───────────────────────────────────────────────────────────
+
+    @contextmanager
+    def _write(self):
+        """Exclusive write access, across threads and processes, on an up-to-date collection."""
+        with self._lock, open(os.path.join(self.directory, LOCK), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                if self._generation is None:
+                    os.makedirs(os.path.join(self.directory, "gen-1"), exist_ok=True)
+                    for name in (VECTORS, RECORDS):
+                        open(self._path(name, 1), "ab").close()
+                    self._write_generation(1)
+                    self._refresh()
+                yield
+                self._refresh()
+                self._maybe_compact()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _log(self, record: dict):
+        with open(self._path(RECORDS), "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def upsert(self, ids, embeddings=None, metadatas=None, documents=None, **kwargs):
+        if embeddings is None:
+            raise ValueError("NumpyCollection stores precomputed embeddings only")
+        ids = [ids] if isinstance(ids, str) else list(ids)
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(ids):
+            raise ValueError(f"Expected {len(ids)} embeddings, got an array of shape {vectors.shape}")
+        documents = list(documents) if documents is not None else [None] * len(ids)
+        metadatas = list(metadatas) if metadatas is not None else [None] * len(ids)
+
+        with self._write():
+            if self.dimension is None:
+                self.dimension = int(vectors.shape[1])
+                self._save_config()
+            elif vectors.shape[1] != self.dimension:
+                raise ValueError(
+                    f"Collection '{self.name}' expects {self.dimension}-dimensional embeddings, "
+                    f"got {vectors.shape[1]}"
+                )
+            row_bytes = self.dimension * np.dtype(self.dtype).itemsize
+            with open(self._path(VECTORS), "ab") as f:
+                start = f.tell() // row_bytes
+                f.write(vectors.astype(self.dtype).tobytes())
+            self._log({
+                "op": "upsert",
+                "start": start,
+                "records": [list(record) for record in zip(ids, documents, metadatas)],
+            })
+
+    add = upsert
+
+    def delete(self, ids=None, where=None, **kwargs):
+        with self._write():
+            doomed = [self._ids[row] for row in self._select(ids, where)]
+            if doomed:
+                self._log({"op": "delete", "ids": doomed})
+
+    def modify(self, name=None, metadata=None, configuration=None, **kwargs):
+        with self._write():
+            if configuration:
+                hnsw = {
+                    key: value for key, value in (configuration.get("hnsw") or {}).items()
+                    if key != "space"
+                }
+                self._configuration = {
+                    **self._configuration,
+                    "hnsw": {**(self._configuration.get("hnsw") or {}), **hnsw},
+                }
+            if name and name != self.name:
+                directory = os.path.join(os.path.dirname(self.directory), name)
+                if os.path.exists(directory):
+                    raise ValueError(f"Collection '{name}' already exists")
+                os.rename(self.directory, directory)
+                self.directory, self.name = directory, name
+            self._save_config(metadata)
+
+    def _maybe_compact(self):
+        """Rewrite live rows into a new generation once tombstones dominate."""
+        dead = self._rows - len(self._index)
+        if dead < COMPACT_MIN_DEAD_ROWS or dead <= len(self._index):
+            return
+        old_generation = self._generation
+        generation = old_generation + 1
+        os.makedirs(os.path.join(self.directory, f"gen-{generation}"), exist_ok=True)
+        live_rows = np.flatnonzero(self._live[:self._rows])
+        with open(self._path(VECTORS, generation), "wb") as f:
+            for start in range(0, len(live_rows), SCORE_BLOCK_ROWS):
+                f.write(np.asarray(self._matrix[live_rows[start:start + SCORE_BLOCK_ROWS]]).tobytes())
+        with open(self._path(RECORDS, generation), "w", encoding="utf-8") as f:
+            for start in range(0, len(live_rows), COMPACT_PAGE_SIZE):
+                page = live_rows[start:start + COMPACT_PAGE_SIZE]
+                f.write(json.dumps({
+                    "op": "upsert",
+                    "start": start,
+                    "records": [[self._ids[r], self._documents[r], self._metadatas[r]] for r in page],
+                }, ensure_ascii=False) + "\n")
+        self._write_generation(generation)
+        shutil.rmtree(os.path.join(self.directory, f"gen-{old_generation}"), ignore_errors=True)
+        self._refresh()
+
+    # ── Reads ────────────────────────────────────────────────────────────
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._index)
+
+    def _select(self, ids, where) -> np.ndarray:
+        """Live rows matching the ids and where filter, in insertion order."""
+        mask = self._live[:self._rows]
+        if where:
+            mask = mask & self._columns.mask(where, self._rows)
+        if ids is None:
+            return np.flatnonzero(mask)
+        ids = [ids] if isinstance(ids, str) else ids
+        rows = (self._index.get(chunk_id) for chunk_id in dict.fromkeys(ids))
+        return np.array([row for row in rows if row is not None and mask[row]], dtype=np.int64)
+
+    def _vectors(self, rows: np.ndarray) -> np.ndarray:
+        if not len(rows):
+            return np.zeros((0, self.dimension or 0), dtype=np.float32)
+        return np.asarray(self._matrix[rows], dtype=np.float32)
+
+    def _result(self, rows, include) -> dict:
+        return {
+            "ids": [self._ids[row] for row in rows],
+            "documents": [self._documents[row] for row in rows] if "documents" in include else None,
+            "metadatas": [self._metadatas[row] for row in rows] if "metadatas" in include else None,
+            "embeddings": self._vectors(np.asarray(rows, dtype=np.int64)) if "embeddings" in include else None,
+        }
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=GET_INCLUDE, **kwargs) -> dict:
+        with self._lock:
+            self._refresh()
+            rows = self._select(ids, where)[offset or 0:]
+            if limit is not None:
+                rows = rows[:limit]
+            return {**self._result(rows, include), "distances": None}
+
+    def query(self, query_embeddings, n_results=10, where=None, include=QUERY_INCLUDE, **kwargs) -> dict:
+        """Exact nearest neighbours of each query embedding among rows matching where."""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        fields = ("ids", "documents", "metadatas", "distances", "embeddings")
+        results = {field: [] if field == "ids" or field in include else None for field in fields}
+
+        with self._lock:
+            self._refresh()
+            candidates = self._select(None, where)
+            k = min(n_results, len(candidates))
+            if k <= 0:
+                for field in results:
+                    if results[field] is not None:
+                        results[field] = [[] for _ in queries]
+                return results
+
+            distances = self._distances(queries, candidates)
+            if k < len(candidates):
+                top = np.argpartition(distances, k - 1, axis=0)[:k]
+            else:
+                top = np.broadcast_to(np.arange(len(candidates))[:, None], distances.shape)
+            top = np.take_along_axis(
+                top, np.take_along_axis(distances, top, axis=0).argsort(axis=0, kind="stable"), axis=0
+            )
+
+            for q in range(len(queries)):
+                rows = candidates[top[:, q]]
+                for field, values in self._result(rows, include).items():
+                    if results[field] is not None:
+                        results[field].append(values)
+                if results["distances"] is not None:
+                    results["distances"].append(distances[top[:, q], q].tolist())
+        return results
+
+    def _blocks(self, rows: np.ndarray):
+        """
+        (start, stop, first row) pieces of rows to score; first is None for
+        pieces that have to be gathered. A sync writes a workspace's chunks
+        together, so filtered rows are usually a few contiguous runs, which
+        are scored as slices of the mapped matrix instead of being copied.
+        """
+        breaks = np.flatnonzero(np.diff(rows) != 1) + 1
+        if len(breaks) * RUN_MIN_ROWS > len(rows):
+            for start in range(0, len(rows), SCORE_BLOCK_ROWS):
+                yield start, min(start + SCORE_BLOCK_ROWS, len(rows)), None
+            return
+        bounds = [0, *breaks.tolist(), len(rows)]
+        for run_start, run_stop in zip(bounds, bounds[1:]):
+            for start in range(run_start, run_stop, SCORE_BLOCK_ROWS):
+                yield start, min(start + SCORE_BLOCK_ROWS, run_stop), int(rows[start])
+
+    def _distances(self, queries: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """(len(rows), len(queries)) distances in the collection's space, as Chroma reports them."""
+        dots = np.empty((len(rows), len(queries)), dtype=np.float32)
+        for start, stop, first in self._blocks(rows):
+            if first is None:
+                block = self._matrix[rows[start:stop]]
+            else:
+                block = self._matrix[first:first + stop - start]
+            dots[start:stop] = np.asarray(block, dtype=np.float32) @ queries.T
+
+        if self.space == "ip":
+            return 1 - dots
+        norms = self._norms[rows][:, None]
+        query_norms = np.linalg.norm(queries, axis=1)[None, :]
+        if self.space == "cosine":
+            scale = norms * query_norms
+            return 1 - np.divide(dots, scale, out=np.zeros_like(dots), where=scale > 0)
+        # Squared L2, like hnswlib
+        return np.maximum(norms ** 2 - 2 * dots + query_norms ** 2, 0)
+
+
+class NumpyVectorClient:
+    """The chromadb client methods ChromaManager needs, over NumpyCollection directories."""
+
+    def __init__(self, path: str, dtype: str = NUMPY_VECTOR_DTYPE):
+        """
+        :param path: Directory holding one sub-directory per collection.
+        :param dtype: Storage precision of new collections, "float32" or "float16".
+        """
+        if dtype not in NUMPY_VECTOR_DTYPES:
+            raise ValueError(f"Unsupported vector dtype '{dtype}'. Use one of {NUMPY_VECTOR_DTYPES}")
+        self.path = path
+        self.dtype = dtype
+        os.makedirs(path, exist_ok=True)
+        self._collections: dict[str, NumpyCollection] = {}
+        self._lock = threading.Lock()
+
+    def _exists(self, name: str) -> bool:
+        return os.path.exists(os.path.join(self.path, name, COLLECTION_CONFIG))
+
+    def get_or_create_collection(self, name: str, configuration: dict | None = None, **kwargs) -> NumpyCollection:
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None or collection.name != name:
+                collection = NumpyCollection(os.path.join(self.path, name), name, configuration, self.dtype)
+                self._collections[name] = collection
+            return collection
+
+    def get_collection(self, name: str, **kwargs) -> NumpyCollection:
+        if not self._exists(name):
+            with self._lock:
+                self._collections.pop(name, None)
+            raise NotFoundError(f"Collection [{name}] does not exist")
+        return self.get_or_create_collection(name)
+
+    def list_collections(self) -> list[NumpyCollection]:
+        return [self.get_collection(name) for name in sorted(os.listdir(self.path)) if self._exists(name)]
+
+    def delete_collection(self, name: str):
+        if not self._exists(name):
+            raise NotFoundError(f"Collection [{name}] does not exist")
+        with self._lock:
+            self._collections.pop(name, None)
+        shutil.rmtree(os.path.join(self.path, name))
+
+    def get_max_batch_size(self) -> int:
+        return MAX_BATCH_SIZE
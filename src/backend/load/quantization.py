@@ -0,0 +1,59 @@
+"""
+Vector compression helpers: Matryoshka-style dimension reduction and
+float16 / int8 scalar quantization for stored embeddings.
+"""
+
+import numpy as np
+
+VECTOR_DTYPES = ("float32", "float16", "int8")
+
+
+def l2_normalize(vectors) -> np.ndarray:
+    """Row-wise L2 normalization (zero rows are left as zeros)."""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def reduce_dimension(vectors, dimension: int | None) -> np.ndarray:
+    """
+    Truncate gemini-embedding-001 vectors to their first `dimension`
+    components and re-normalize. The model is trained with Matryoshka
+    representation learning, so this matches requesting output_dimensionality.
+    """
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if dimension is None or matrix.shape[-1] <= dimension:
+        return matrix
+    return l2_normalize(matrix[..., :dimension])
+
+
+def quantize(vector, dtype: str) -> bytes:
+    """Serialize one vector. int8 uses symmetric per-vector scaling (scale stored first)."""
+    values = np.asarray(vector, dtype=np.float32)
+    if dtype == "float32":
+        return values.tobytes()
+    if dtype == "float16":
+        return values.astype(np.float16).tobytes()
+    if dtype == "int8":
+        max_abs = float(np.abs(values).max()) if values.size else 0.0
+        scale = max_abs / 127 if max_abs > 0 else 1.0
+        codes = np.clip(np.rint(values / scale), -127, 127).astype(np.int8)
+        return np.float32(scale).tobytes() + codes.tobytes()
+    raise ValueError(f"Unsupported vector dtype '{dtype}'. Use one of {VECTOR_DTYPES}")
+
+
+def dequantize(blob: bytes, dtype: str) -> np.ndarray:
+    """Inverse of quantize(); always returns float32."""
+    if dtype == "float32":
+        return np.frombuffer(blob, dtype=np.float32).copy()
+    if dtype == "float16":
+        return np.frombuffer(blob, dtype=np.float16).astype(np.float32)
+    if dtype == "int8":
+        scale = np.frombuffer(blob[:4], dtype=np.float32)[0]
+        return np.frombuffer(blob[4:], dtype=np.int8).astype(np.float32) * scale
+    raise ValueError(f"Unsupported vector dtype '{dtype}'. Use one of {VECTOR_DTYPES}")
+
+
+def cosine_scores(query, candidates) -> np.ndarray:
+    """Cosine similarity of one query vector against a matrix of candidates."""
+    return l2_normalize(candidates) @ l2_normalize(query)
@@ -0,0 +1,122 @@
+"""
+Full-precision vectors for rescoring reduced-dimension searches.
+
+With EMBEDDING_DIMENSION and RESCORE_OVERSAMPLE set, the vector index holds
+only each chunk's truncated vector (optionally float16 on the numpy backend).
+The full-size float32 vector of every indexed chunk is kept here, keyed by
+chunk id, so rescoring never depends on what the embedding cache has evicted
+or quantized. Unlike the cache there is no size budget: rows are removed only
+when their chunks are deleted from the index.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+from src.backend.load.embedding_cache import text_key
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../../"))
+RESCORE_VECTORS_PATH = os.getenv(
+    "RESCORE_VECTORS_PATH",
+    os.path.join(PROJECT_ROOT, "workmate_db", "rescore_vectors.sqlite3"),
+)
+
+# SQLite limits the number of bound parameters per statement
+_SQL_CHUNK = 500
+
+
+class RescoreVectorStore:
+    def __init__(self, path: str = RESCORE_VECTORS_PATH):
+        """
+        :param path: SQLite file to store vectors in.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS vectors (
+                id TEXT PRIMARY KEY,
+                text_key TEXT NOT NULL,
+                workspace_id TEXT,
+                vector BLOB NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_vectors_text_key ON vectors(text_key)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_vectors_workspace ON vectors(workspace_id)")
+        self._conn.commit()
+
+    def put_many(self, model: str, ids: list[str], texts: list[str], workspace_ids: list, vectors: list):
+        """Store the full-size vectors of indexed chunks, replacing earlier versions."""
+        rows = [
+            (chunk_id, text_key(model, text), workspace_id, np.asarray(vector, dtype=np.float32).tobytes())
+            for chunk_id, text, workspace_id, vector in zip(ids, texts, workspace_ids, vectors)
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (id, text_key, workspace_id, vector) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def get_many(self, model: str, ids: list[str]) -> list:
+        """Float32 vectors aligned with ids (None for chunks stored without one, or by another model)."""
+        prefix = f"{model}:"
+        found = {
+            chunk_id: vector
+            for chunk_id, key, vector in self._select("id", list(dict.fromkeys(ids)))
+            if key.startswith(prefix)
+        }
+        return [found.get(chunk_id) for chunk_id in ids]
+
+    def get_by_texts(self, model: str, texts: list[str]) -> list:
+        """Float32 vectors of indexed chunks with the same content, aligned with texts (None if none)."""
+        keys = [text_key(model, text) for text in texts]
+        found = {key: vector for _, key, vector in self._select("text_key", list(dict.fromkeys(keys)))}
+        return [found.get(key) for key in keys]
+
+    def _select(self, column: str, values: list):
+        rows = []
+        with self._lock:
+            for start in range(0, len(values), _SQL_CHUNK):
+                chunk = values[start:start + _SQL_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows.extend(self._conn.execute(
+                    f"SELECT id, text_key, vector FROM vectors WHERE {column} IN ({placeholders})",
+                    chunk,
+                ).fetchall())
+        return [(chunk_id, key, np.frombuffer(blob, dtype=np.float32).copy()) for chunk_id, key, blob in rows]
+
+    def delete(self, ids: list[str]):
+        with self._lock:
+            for start in range(0, len(ids), _SQL_CHUNK):
+                chunk = ids[start:start + _SQL_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                self._conn.execute(f"DELETE FROM vectors WHERE id IN ({placeholders})", chunk)
+            self._conn.commit()
+
+    def delete_workspace(self, workspace_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM vectors WHERE workspace_id = ?", (workspace_id,))
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM vectors")
+            self._conn.commit()
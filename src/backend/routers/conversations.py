@@ -1,3 +1,4 @@
+import asyncio
 import json
 import logging
 from datetime import datetime, timezone
@@ -8,10 +9,15 @@ from sse_starlette.sse import EventSourceResponse
 
 from src.backend.database import get_db
 from src.backend.dependencies.auth import get_current_user
-from src.backend.dependencies.services import get_gemini_client, get_hybrid_retriever, get_voyage_reranker
+from src.backend.dependencies.services import (
+    get_answer_cache,
+    get_gemini_client,
+    get_hybrid_retriever,
+    get_voyage_reranker,
+)
 from src.backend.dependencies.workspace import get_workspace_filter
 from src.backend.load.hybrid_retriever import HybridRetriever
-from src.backend.llm.gemini_client import GeminiClient
+from src.backend.llm.gemini_client import GENERATION_ERROR_MESSAGE, RATE_LIMIT_MESSAGE_PREFIX, GeminiClient
 from src.backend.llm.voyage_reranker import VoyageReranker
 from src.backend.models.conversation import Conversation, MessageRecord
 REFUSAL_PHRASES = [
@@ -31,11 +37,144 @@ from src.backend.schemas.conversation import (
     SendMessageResponse,
     UpdateConversationRequest,
 )
+from src.backend.utils.semantic_cache import SemanticCache
+from src.backend.utils.where_filters import canonical_where, where_workspace_ids
 
 router = APIRouter(prefix="/api/conversations", tags=["conversations"])
 logger = logging.getLogger(__name__)
 
 MAX_CONTEXT_CHARS = 15000
+NO_CONTEXT_ANSWER = "I cannot find relevant information in your Notion docs to answer this question."
+PIPELINE_ERROR_ANSWER = "Sorry, I encountered an error processing your question. Please try again."
+STREAM_ERROR_ANSWER = "Sorry, something went wrong while generating a response."
+
+
+def _sources(final_chunks: list[dict]) -> list[dict]:
+    return [
+        {
+            "title": c.get("page_title", "Unknown Source"),
+            "excerpt": (c.get("text") or "")[:200],
+        }
+        for c in final_chunks
+    ]
+
+
+def _is_refusal(answer: str) -> bool:
+    answer_lower = answer.lower()
+    return any(phrase in answer_lower for phrase in REFUSAL_PHRASES)
+
+
+def _answer_cache_key(hybrid: HybridRetriever, question: str, where_filter: dict | None):
+    """
+    (scope, question embedding, index versions) for the semantic answer cache.
+    The versions cover the BM25 shards and vector collections the filter reads,
+    so any write to them, including a page update through the ingestion
+    worker, retires the cached answers. The embedding goes through the query
+    embedding cache, so the search that follows a miss does not embed the
+    question again.
+    """
+    return (
+        canonical_where(where_filter),
+        hybrid.chroma.embed_query(question),
+        hybrid.index_versions(where_filter),
+    )
+
+
+def _cache_answer(answer_cache: SemanticCache, cache_key, where_filter, answer: str, final_chunks: list[dict]):
+    """Store a grounded answer; refusals, errors and rate-limit notices are not reused."""
+    if not final_chunks or _is_refusal(answer):
+        return
+    if any(notice in answer for notice in (GENERATION_ERROR_MESSAGE, RATE_LIMIT_MESSAGE_PREFIX, STREAM_ERROR_ANSWER)):
+        return
+    scope, embedding, version = cache_key
+    answer_cache.put(
+        scope, embedding, version,
+        {"answer": answer, "sources": _sources(final_chunks)},
+        workspace_ids=where_workspace_ids(where_filter) or (),
+    )
+
+
+def _expand_siblings(hybrid: HybridRetriever, all_chunks: list[dict], where_filter: dict | None):
+    """
+    Append sibling chunks of short chunks (< 100 chars) to all_chunks in place.
+    All parents are fetched with one get_by_parents() query, scoped to where_filter.
+    """
+    seen_ids = {chunk["chunk_id"] for chunk in all_chunks}
+    parent_ids_to_expand = list(dict.fromkeys(
+        chunk.get("parent_id")
+        for chunk in all_chunks
+        if len(chunk["text"].strip()) < 100 and chunk.get("parent_id")
+    ))
+    if not parent_ids_to_expand:
+        return
+
+    workspace_ids = [chunk["workspace_id"] for chunk in all_chunks if chunk.get("workspace_id")]
+    siblings_by_parent = hybrid.chroma.get_by_parents(
+        parent_ids_to_expand, per_parent_limit=5, where=where_filter, workspace_ids=workspace_ids
+    )
+    for parent_id in parent_ids_to_expand:
+        sibling_results = siblings_by_parent.get(parent_id, {})
+        for doc, meta, chunk_id in zip(
+            sibling_results.get("documents", []),
+            sibling_results.get("metadatas", []),
+            sibling_results.get("ids", []),
+        ):
+            if chunk_id not in seen_ids:
+                seen_ids.add(chunk_id)
+                all_chunks.append({
+                    "chunk_id": chunk_id,
+                    "page_title": meta.get("title", "Unknown Source"),
+                    "section": meta.get("section_header") or meta.get("parent_title", ""),
+                    "text": doc.strip().replace("\r\n", "\n"),
+                })
+
+
+async def _retrieve_context(
+    hybrid: HybridRetriever,
+    reranker: VoyageReranker,
+    question: str,
+    where_filter: dict | None,
+    stats: dict | None = None,
+):
+    """
+    Retrieve, expand and rerank; returns (all_chunks, scored_chunks, final_chunks) within the context cap.
+    Retrieval and sibling expansion block, so they run in worker threads to keep the event loop free.
+    """
+    # Step 1: Hybrid Retrieval (vector + BM25 concurrently, merged via RRF)
+    all_chunks = await asyncio.to_thread(
+        hybrid.search,
+        question, vector_top_k=20, bm25_top_k=10, final_top_k=20,
+        where=where_filter, stats=stats,
+    )
+
+    # Step 2: Sibling Expansion
+    await asyncio.to_thread(_expand_siblings, hybrid, all_chunks, where_filter)
+
+    # Step 3: VoyageAI Re-ranking (keeps the RRF order if Voyage misses RERANK_TIMEOUT)
+    reranked_for_generation, scored_chunks = await reranker.arerank(
+        all_chunks, question, top_k=10, stats=stats
+    )
+
+    logger.info(
+        f"[RAG] unfiltered={len(all_chunks)} chunks, "
+        f"after_rerank={len(reranked_for_generation)} chunks | "
+        f"titles={[c['page_title'] for c in reranked_for_generation]}"
+    )
+
+    # Enforce context cap
+    final_chunks = []
+    total_chars = 0
+    for chunk in reranked_for_generation:
+        text = chunk["text"]
+        if total_chars + len(text) > MAX_CONTEXT_CHARS:
+            remaining = MAX_CONTEXT_CHARS - total_chars
+            if remaining > 100:
+                chunk["text"] = text[:remaining] + "... [truncated]"
+            else:
+                break
+        final_chunks.append(chunk)
+        total_chars += len(chunk["text"])
+    return all_chunks, scored_chunks, final_chunks
 
 
 @router.post("/", response_model=ConversationSummary)
@@ -90,6 +229,7 @@ async def send_message(
     hybrid: HybridRetriever = Depends(get_hybrid_retriever),
     gemini: GeminiClient = Depends(get_gemini_client),
     reranker: VoyageReranker = Depends(get_voyage_reranker),
+    answer_cache: SemanticCache = Depends(get_answer_cache),
 ):
     conv = (
         db.query(Conversation)
@@ -113,82 +253,44 @@ async def send_message(
     ]
 
     # RAG pipeline
+    retrieval_stats = {}
+    cache_key, cached = None, None
     try:
-        # Step 1: Hybrid Retrieval (vector + BM25, merged via RRF)
         where_filter = get_workspace_filter(current_user.id, db)
-        all_chunks = hybrid.search(
-            request.question, vector_top_k=20, bm25_top_k=10, final_top_k=20,
-            where=where_filter,
-        )
-
-        # Step 2: Sibling Expansion
-        seen_ids = {chunk["chunk_id"] for chunk in all_chunks}
-        parent_ids_to_expand = {
-            chunk.get("parent_id")
-            for chunk in all_chunks
-            if len(chunk["text"].strip()) < 100 and chunk.get("parent_id")
-        }
-
-        for parent_id in parent_ids_to_expand:
-            sibling_results = hybrid.chroma.get_by_parent(parent_id, limit=5)
-            if sibling_results and sibling_results.get("documents"):
-                sib_docs = sibling_results["documents"]
-                sib_metas = sibling_results.get("metadatas", [{}] * len(sib_docs))
-                sib_ids = sibling_results.get("ids", [str(i) for i in range(len(sib_docs))])
-
-                for doc, meta, chunk_id in zip(sib_docs, sib_metas, sib_ids):
-                    if chunk_id not in seen_ids:
-                        seen_ids.add(chunk_id)
-                        all_chunks.append({
-                            "chunk_id": chunk_id,
-                            "page_title": meta.get("title", "Unknown Source"),
-                            "section": meta.get("section_header") or meta.get("parent_title", ""),
-                            "text": doc.strip().replace("\r\n", "\n"),
-                        })
-
-        # Step 3: VoyageAI Re-ranking
-        reranked_for_generation, scored_chunks = reranker.rerank(
-            all_chunks, request.question, top_k=10
-        )
 
-        logger.info(
-            f"[RAG] unfiltered={len(all_chunks)} chunks, "
-            f"after_rerank={len(reranked_for_generation)} chunks | "
-            f"titles={[c['page_title'] for c in reranked_for_generation]}"
-        )
+        # Standalone questions may reuse the answer to an earlier paraphrase;
+        # follow-ups depend on the conversation, and debug answers on chunk ids
+        if not conversation_history and not request.debug:
+            cache_key = await asyncio.to_thread(_answer_cache_key, hybrid, request.question, where_filter)
+            cached = answer_cache.get(*cache_key)
 
-        # Enforce context cap
-        final_chunks = []
-        total_chars = 0
-        for chunk in reranked_for_generation:
-            text = chunk["text"]
-            if total_chars + len(text) > MAX_CONTEXT_CHARS:
-                remaining = MAX_CONTEXT_CHARS - total_chars
-                if remaining > 100:
-                    chunk["text"] = text[:remaining] + "... [truncated]"
-                else:
-                    break
-            final_chunks.append(chunk)
-            total_chars += len(chunk["text"])
-
-        if not final_chunks:
-            answer = "I cannot find relevant information in your Notion docs to answer this question."
+        if cached is not None:
+            logger.info(f"[RAG] answer cache hit (similarity={cached[1]:.3f})")
+            all_chunks, scored_chunks, final_chunks = [], [], []
+            answer = cached[0]["answer"]
         else:
-            answer = gemini.ask_workmate(
-                chunks=final_chunks,
-                user_question=request.question,
-                debug=request.debug,
-                conversation_history=conversation_history,
+            all_chunks, scored_chunks, final_chunks = await _retrieve_context(
+                hybrid, reranker, request.question, where_filter, stats=retrieval_stats
             )
 
+            if not final_chunks:
+                answer = NO_CONTEXT_ANSWER
+            else:
+                answer = await gemini.ask_workmate_async(
+                    chunks=final_chunks,
+                    user_question=request.question,
+                    debug=request.debug,
+                    conversation_history=conversation_history,
+                )
+                if cache_key is not None:
+                    _cache_answer(answer_cache, cache_key, where_filter, answer, final_chunks)
+
     except Exception as e:
         logger.error(f"RAG pipeline error: {e}")
         all_chunks = []
         scored_chunks = []
         final_chunks = []
-        answer = (
-            "Sorry, I encountered an error processing your question. Please try again."
-        )
+        answer = PIPELINE_ERROR_ANSWER
 
     # Save assistant message
     assistant_msg = MessageRecord(
@@ -213,12 +315,14 @@ async def send_message(
             "unfiltered_chunks": all_chunks,
             "reranked_chunks": scored_chunks,
             "final_chunks": final_chunks,
+            "retrieval_timings": retrieval_stats,
         }
 
     return SendMessageResponse(
         user_message=user_msg,
         assistant_message=assistant_msg,
         debug_info=debug_info,
+        cached=cached is not None,
     )
 
 
@@ -254,6 +358,7 @@ async def stream_message(
     hybrid: HybridRetriever = Depends(get_hybrid_retriever),
     gemini: GeminiClient = Depends(get_gemini_client),
     reranker: VoyageReranker = Depends(get_voyage_reranker),
+    answer_cache: SemanticCache = Depends(get_answer_cache),
 ):
     conv = (
         db.query(Conversation)
@@ -273,70 +378,44 @@ async def stream_message(
     db.commit()
     db.refresh(user_msg)
 
+    # Load conversation history (last 6 messages before the new user message)
+    conversation_history = [
+        {"role": m.role, "content": m.content}
+        for m in (conv.messages or [])[-7:-1]  # exclude the just-committed user msg
+    ]
+
     # RAG retrieval
+    where_filter = None
+    retrieval_stats = {}
+    cache_key, cached = None, None
+    final_chunks = []
     try:
-        # Step 1: Hybrid Retrieval (vector + BM25, merged via RRF)
         where_filter = get_workspace_filter(current_user.id, db)
-        all_chunks = hybrid.search(
-            request.question, vector_top_k=20, bm25_top_k=10, final_top_k=20,
-            where=where_filter,
-        )
-
-        # Step 2: Sibling Expansion
-        seen_ids = {chunk["chunk_id"] for chunk in all_chunks}
-        parent_ids_to_expand = {
-            chunk.get("parent_id")
-            for chunk in all_chunks
-            if len(chunk["text"].strip()) < 100 and chunk.get("parent_id")
-        }
 
-        for parent_id in parent_ids_to_expand:
-            sibling_results = hybrid.chroma.get_by_parent(parent_id, limit=5)
-            if sibling_results and sibling_results.get("documents"):
-                sib_docs = sibling_results["documents"]
-                sib_metas = sibling_results.get("metadatas", [{}] * len(sib_docs))
-                sib_ids = sibling_results.get("ids", [str(i) for i in range(len(sib_docs))])
-
-                for doc, meta, chunk_id in zip(sib_docs, sib_metas, sib_ids):
-                    if chunk_id not in seen_ids:
-                        seen_ids.add(chunk_id)
-                        all_chunks.append({
-                            "chunk_id": chunk_id,
-                            "page_title": meta.get("title", "Unknown Source"),
-                            "section": meta.get("section_header") or meta.get("parent_title", ""),
-                            "text": doc.strip().replace("\r\n", "\n"),
-                        })
-
-        reranked_for_generation, _ = reranker.rerank(all_chunks, request.question, top_k=10)
+        # Same answer cache rules as send_message
+        if not conversation_history and not request.debug:
+            cache_key = await asyncio.to_thread(_answer_cache_key, hybrid, request.question, where_filter)
+            cached = answer_cache.get(*cache_key)
 
-        final_chunks = []
-        total_chars = 0
-        for chunk in reranked_for_generation:
-            text = chunk["text"]
-            if total_chars + len(text) > MAX_CONTEXT_CHARS:
-                remaining = MAX_CONTEXT_CHARS - total_chars
-                if remaining > 100:
-                    chunk["text"] = text[:remaining] + "... [truncated]"
-                else:
-                    break
-            final_chunks.append(chunk)
-            total_chars += len(chunk["text"])
+        if cached is None:
+            _, _, final_chunks = await _retrieve_context(
+                hybrid, reranker, request.question, where_filter, stats=retrieval_stats
+            )
+            logger.info(f"[RAG] retrieval timings: {retrieval_stats}")
 
     except Exception as e:
         logger.error(f"RAG retrieval error: {e}")
         final_chunks = []
 
-    # Load conversation history (last 6 messages before the new user message)
-    conversation_history = [
-        {"role": m.role, "content": m.content}
-        for m in (conv.messages or [])[-7:-1]  # exclude the just-committed user msg
-    ]
-
     async def event_generator():
         full_answer = ""
 
-        if not final_chunks:
-            full_answer = "I cannot find relevant information in your Notion docs to answer this question."
+        if cached is not None:
+            logger.info(f"[RAG] answer cache hit (similarity={cached[1]:.3f})")
+            full_answer = cached[0]["answer"]
+            yield {"data": json.dumps({"chunk": full_answer})}
+        elif not final_chunks:
+            full_answer = NO_CONTEXT_ANSWER
             yield {"data": json.dumps({"chunk": full_answer})}
         else:
             try:
@@ -350,9 +429,10 @@ async def stream_message(
                     yield {"data": json.dumps({"chunk": text_chunk})}
             except Exception as e:
                 logger.error(f"Streaming error: {e}")
-                error_msg = "Sorry, something went wrong while generating a response."
-                full_answer = error_msg
-                yield {"data": json.dumps({"chunk": error_msg})}
+                full_answer = STREAM_ERROR_ANSWER
+                yield {"data": json.dumps({"chunk": STREAM_ERROR_ANSWER})}
+            if cache_key is not None:
+                _cache_answer(answer_cache, cache_key, where_filter, full_answer, final_chunks)
 
         # Save the full assembled answer
         assistant_msg = MessageRecord(
@@ -371,22 +451,21 @@ async def stream_message(
         db.refresh(assistant_msg)
 
         # Only send sources if the LLM actually used them (not a refusal)
-        sources = []
-        answer_lower = full_answer.lower()
-        has_refusal = any(phrase in answer_lower for phrase in REFUSAL_PHRASES)
-        if not has_refusal:
-            sources = [
-                {
-                    "title": c.get("page_title", "Unknown Source"),
-                    "excerpt": (c.get("text") or "")[:200],
-                }
-                for c in final_chunks
-            ]
-        yield {
-            "data": json.dumps(
-                {"done": True, "message_id": assistant_msg.id, "sources": sources}
-            )
+        if cached is not None:
+            sources = cached[0]["sources"]
+        elif _is_refusal(full_answer):
+            sources = []
+        else:
+            sources = _sources(final_chunks)
+        done = {
+            "done": True,
+            "message_id": assistant_msg.id,
+            "sources": sources,
+            "cached": cached is not None,
         }
+        if request.debug:
+            done["retrieval_timings"] = retrieval_stats
+        yield {"data": json.dumps(done)}
 
     return EventSourceResponse(event_generator())
 
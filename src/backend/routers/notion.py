@@ -10,7 +10,8 @@ from sqlalchemy.orm import Session, joinedload
 from src.backend.config import settings
 from src.backend.database import SessionLocal, get_db
 from src.backend.dependencies.auth import get_current_user, verify_token
-from src.backend.dependencies.services import get_chroma_manager
+from src.backend.dependencies.services import get_answer_cache, get_chroma_manager
+from src.backend.load.bm25_manager import BM25Manager
 from src.backend.load.chroma_manager import ChromaManager
 from src.backend.models.notion import NotionConnection, NotionWorkspace
 from src.backend.models.user import User
@@ -60,6 +61,8 @@ def _ingest_workspace(workspace_db_id: int, access_token: str, notion_workspace_
         # Run the ingestion pipeline with workspace_id tagging
         ingestor = NotionIngestor(workspace_id=notion_workspace_id)
         ingestor.run_pipeline_from_docs(raw_docs)
+        # Cached answers were grounded in the workspace's previous content
+        get_answer_cache().invalidate_workspace(notion_workspace_id)
 
         workspace.sync_status = "idle"
         workspace.last_synced_at = datetime.now(timezone.utc)
@@ -240,7 +243,6 @@ def sync_workspace(
     background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
-    chroma: ChromaManager = Depends(get_chroma_manager),
 ):
     """Trigger a manual re-sync for a connected workspace."""
     connection = (
@@ -258,9 +260,7 @@ def sync_workspace(
     if workspace.sync_status == "syncing":
         return {"status": "already_syncing"}
 
-    # Delete existing chunks for this workspace before re-ingesting
-    chroma.delete_by_workspace(workspace.workspace_id)
-
+    # No purge needed: ingestion upserts changed chunks and deletes stale ones
     workspace.sync_status = "syncing"
     db.commit()
 
@@ -280,7 +280,7 @@ def disconnect_workspace(
     chroma: ChromaManager = Depends(get_chroma_manager),
 ):
     """Disconnect the current user from a Notion workspace.
-    If this is the last connected user, also delete workspace data from ChromaDB.
+    If this is the last connected user, also delete workspace data from ChromaDB and its BM25 shard.
     """
     connection = (
         db.query(NotionConnection)
@@ -307,5 +307,7 @@ def disconnect_workspace(
     if remaining == 0:
         # Last user disconnected — purge workspace data
         chroma.delete_by_workspace(workspace.workspace_id)
+        BM25Manager.open_writer().drop_shard(workspace.workspace_id)
+        get_answer_cache().invalidate_workspace(workspace.workspace_id)
         db.delete(workspace)
         db.commit()
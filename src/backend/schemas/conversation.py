@@ -45,3 +45,4 @@ class SendMessageResponse(BaseModel):
     user_message: MessageSchema
     assistant_message: MessageSchema
     debug_info: Optional[dict] = None
+    cached: bool = Field(False, description="The answer was reused from an earlier, near-identical question.")
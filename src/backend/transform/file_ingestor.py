@@ -5,6 +5,7 @@ from langchain_text_splitters import (
     RecursiveCharacterTextSplitter,
 )
 
+from src.backend.load.bm25_manager import BM25Manager
 from src.backend.load.chroma_manager import ChromaManager
 
 ALLOWED_EXTENSIONS = {".pdf", ".txt", ".md"}
@@ -91,5 +92,6 @@ class FileIngestor:
             ids.append(f"upload_{file_hash}_{i}")
 
         chroma.add_documents(chunks, metadatas, ids)
+        BM25Manager.open_writer().upsert(chunks, metadatas, ids)
 
         return {"filename": filename, "chunk_count": len(chunks)}
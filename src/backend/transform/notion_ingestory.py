@@ -222,20 +222,31 @@ class NotionIngestor:
             print("No chunks were created.")
 
     def run_pipeline_from_docs(self, raw_docs):
-        """Run the ingestion pipeline from in-memory document dicts (no file I/O)."""
+        """
+        Run the ingestion pipeline from in-memory document dicts (no file I/O).
+        Chroma is updated incrementally: only changed chunks are re-embedded,
+        and chunks of pages that shrank or disappeared from the workspace are deleted.
+        A workspace sync runs even with no chunks, so a workspace whose pages
+        were all deleted or unshared is emptied.
+        """
         all_chunks, all_metadatas, all_ids = self.chunk_documents(raw_docs)
 
-        if all_chunks:
-            print(f"Storing {len(all_chunks)} chunks into Chroma...")
-            self.db.add_documents(all_chunks, all_metadatas, all_ids)
+        if not all_chunks and not self.workspace_id:
+            print("No chunks were created.")
+            return
 
-            print("Building BM25 index...")
-            bm25 = BM25Manager()
-            bm25.build_index(all_chunks, all_metadatas, all_ids)
-            bm25.save(BM25_INDEX_PATH)
-            print(f"BM25 index saved to {BM25_INDEX_PATH}")
+        print(f"Indexing {len(all_chunks)} chunks into Chroma...")
+        scope = {"workspace_id": self.workspace_id} if self.workspace_id else None
+        self.db.upsert_changed(all_chunks, all_metadatas, all_ids, scope=scope)
+
+        # Only this workspace's BM25 shard is updated; other workspaces keep theirs
+        print("Updating BM25 index...")
+        bm25 = BM25Manager.open_writer(BM25_INDEX_PATH)
+        if self.workspace_id:
+            bm25.sync_shard(self.workspace_id, all_chunks, all_metadatas, all_ids)
         else:
-            print("No chunks were created.")
+            bm25.upsert(all_chunks, all_metadatas, all_ids)
+        print(f"BM25 index updated at {BM25_INDEX_PATH}")
 
 # --- Execution ---
 if __name__ == "__main__":
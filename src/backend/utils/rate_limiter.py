@@ -0,0 +1,189 @@
+"""
+Adaptive token-bucket rate limiter for the Gemini APIs.
+
+Each limiter enforces a requests-per-minute and a tokens-per-minute budget.
+On a 429 it pauses every caller sharing the limiter for the server-provided
+retryDelay and halves its effective rate; each success ramps the rate back up
+additively (AIMD), so callers settle just under the real quota.
+
+Limiters are shared per quota name within a process via get_rate_limiter(),
+so the API handlers and background ingestion draw from the same budget.
+Separate deployments (e.g. the worker Lambda) should be given their share of
+the quota through the *_RPM / *_TPM environment variables.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Fallback pause when a 429 carries no retryDelay
+DEFAULT_RETRY_DELAY = 10.0
+
+_RETRY_DELAY_RE = re.compile(r"retryDelay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)s")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True if the exception is a quota / rate limit error from the Gemini API."""
+    if getattr(error, "code", None) == 429:
+        return True
+    error_str = str(error)
+    return "429" in error_str or "RESOURCE_EXHAUSTED" in error_str
+
+
+def parse_retry_delay(error: Exception) -> float | None:
+    """Extract the server-suggested retry delay (seconds) from a Gemini error."""
+    details = getattr(error, "details", None)
+    if isinstance(details, dict):
+        for detail in details.get("error", {}).get("details", []) or []:
+            delay = detail.get("retryDelay") if isinstance(detail, dict) else None
+            if delay:
+                try:
+                    return float(str(delay).rstrip("s"))
+                except ValueError:
+                    pass
+
+    match = _RETRY_DELAY_RE.search(str(error))
+    if match:
+        return float(match.group(1))
+    return None
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        min_rate: float = 0.1,
+        increase_step: float = 0.05,
+    ):
+        """
+        :param name: Quota name, used in log messages.
+        :param requests_per_minute: Request budget at full rate.
+        :param tokens_per_minute: Input token budget at full rate.
+        :param min_rate: Lowest fraction of the budget the limiter backs off to.
+        :param increase_step: Fraction of the budget regained per successful call.
+        """
+        self.name = name
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.min_rate = min_rate
+        self.increase_step = increase_step
+
+        self.rate = 1.0
+        self.rate_limited_count = 0
+        self._request_tokens = float(requests_per_minute)
+        self._input_tokens = float(tokens_per_minute)
+        self._blocked_until = 0.0
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        rpm = self.requests_per_minute * self.rate
+        tpm = self.tokens_per_minute * self.rate
+        self._request_tokens = min(rpm, self._request_tokens + elapsed * rpm / 60)
+        self._input_tokens = min(tpm, self._input_tokens + elapsed * tpm / 60)
+
+    def _reserve(self, requests: int, tokens: int) -> float:
+        """Take budget for a call and return how long the caller must wait before making it."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            rpm = self.requests_per_minute * self.rate
+            tpm = self.tokens_per_minute * self.rate
+            # A single call larger than the whole bucket only has to wait for a full bucket
+            tokens = min(tokens, tpm)
+
+            self._request_tokens -= requests
+            self._input_tokens -= tokens
+
+            wait = max(0.0, self._blocked_until - now)
+            if self._request_tokens < 0:
+                wait = max(wait, -self._request_tokens * 60 / rpm)
+            if self._input_tokens < 0:
+                wait = max(wait, -self._input_tokens * 60 / tpm)
+            return wait
+
+    def acquire(self, tokens: int = 1, requests: int = 1) -> float:
+        """Block until a call of the given size fits the budget. Returns seconds waited."""
+        wait = self._reserve(requests, tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens: int = 1, requests: int = 1) -> float:
+        """Async variant of acquire() that yields to the event loop while waiting."""
+        wait = self._reserve(requests, tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def on_success(self):
+        """Additive increase after a successful call."""
+        with self._lock:
+            self.rate = min(1.0, self.rate + self.increase_step)
+
+    def on_rate_limited(self, retry_after: float | None = None) -> float:
+        """
+        Multiplicative decrease after a 429. Pauses all callers for retry_after
+        seconds (or DEFAULT_RETRY_DELAY) and returns the pause length.
+        """
+        delay = retry_after if retry_after is not None else DEFAULT_RETRY_DELAY
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._blocked_until = max(self._blocked_until, now + delay)
+            # Drain the buckets so callers resume gradually after the pause
+            self._request_tokens = min(self._request_tokens, 0.0)
+            self._input_tokens = min(self._input_tokens, 0.0)
+            self.rate_limited_count += 1
+        logger.warning(
+            f"[RateLimiter:{self.name}] rate limited, pausing {delay:.1f}s "
+            f"(rate now {self.rate:.0%} of quota)"
+        )
+        return delay
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "rate": round(self.rate, 3),
+            "requests_per_minute": self.requests_per_minute * self.rate,
+            "tokens_per_minute": self.tokens_per_minute * self.rate,
+            "rate_limited_count": self.rate_limited_count,
+        }
+
+
+# Default budgets (free tier); override per deployment via environment
+_DEFAULT_BUDGETS = {
+    "gemini-embedding": ("GEMINI_EMBEDDING_RPM", 100, "GEMINI_EMBEDDING_TPM", 30_000),
+    "gemini-llm": ("GEMINI_LLM_RPM", 10, "GEMINI_LLM_TPM", 250_000),
+}
+
+_limiters: dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name: str) -> RateLimiter:
+    """Return the process-wide limiter for a quota, creating it on first use."""
+    with _limiters_lock:
+        if name not in _limiters:
+            rpm_env, rpm_default, tpm_env, tpm_default = _DEFAULT_BUDGETS[name]
+            _limiters[name] = RateLimiter(
+                name,
+                requests_per_minute=float(os.getenv(rpm_env, rpm_default)),
+                tokens_per_minute=float(os.getenv(tpm_env, tpm_default)),
+            )
+        return _limiters[name]
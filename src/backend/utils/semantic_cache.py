@@ -0,0 +1,130 @@
+"""
+Thread-safe semantic cache: values are looked up by embedding similarity
+instead of exact key, within a scope (e.g. one workspace filter).
+
+Each entry also records the index version it was computed against and the
+workspaces it depends on, so entries are dropped when the index moves on or
+a workspace is invalidated. Capacity is bounded with LRU eviction plus a
+per-entry time-to-live.
+"""
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Hashable
+
+import numpy as np
+
+
+@dataclass
+class _Entry:
+    scope: str
+    vector: np.ndarray
+    version: Hashable
+    workspace_ids: frozenset
+    value: Any
+    stored_at: float
+
+
+class SemanticCache:
+    def __init__(self, capacity: int, threshold: float, ttl_seconds: float | None = None):
+        """
+        :param capacity: Maximum number of entries; least recently used are evicted first.
+        :param threshold: Minimum cosine similarity for a hit.
+        :param ttl_seconds: Entry lifetime, or None for no expiry.
+        """
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        # Scope -> (entry ids, stacked unit vectors), rebuilt when the scope changes
+        self._matrices: dict[str, tuple[list[int], np.ndarray]] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, scope: str, embedding, version: Hashable) -> tuple[Any, float] | None:
+        """(value, similarity) of the closest live entry in scope above the threshold, or None."""
+        query = self._unit(embedding)
+        with self._lock:
+            self._drop_stale(scope, version)
+            ids, matrix = self._matrix(scope)
+            if ids:
+                similarities = matrix @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self._entries.move_to_end(ids[best])
+                    self.hits += 1
+                    return self._entries[ids[best]].value, float(similarities[best])
+            self.misses += 1
+            return None
+
+    def put(self, scope: str, embedding, version: Hashable, value: Any, workspace_ids=()):
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._entries[next(self._ids)] = _Entry(
+                scope, self._unit(embedding), version, frozenset(workspace_ids), value, time.monotonic()
+            )
+            self._matrices.pop(scope, None)
+            while len(self._entries) > self.capacity:
+                _, evicted = self._entries.popitem(last=False)
+                self._matrices.pop(evicted.scope, None)
+
+    def invalidate_workspace(self, workspace_id) -> int:
+        """Drop every entry that depends on a workspace; returns how many were dropped."""
+        with self._lock:
+            return self._remove([
+                entry_id for entry_id, entry in self._entries.items()
+                if workspace_id in entry.workspace_ids
+            ])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrices.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _drop_stale(self, scope: str, version: Hashable):
+        ids, _ = self._matrix(scope)
+        now = time.monotonic()
+        self._remove([
+            entry_id for entry_id in ids
+            if self._entries[entry_id].version != version
+            or (self.ttl_seconds is not None and now - self._entries[entry_id].stored_at >= self.ttl_seconds)
+        ])
+
+    def _remove(self, entry_ids) -> int:
+        for entry_id in entry_ids:
+            self._matrices.pop(self._entries.pop(entry_id).scope, None)
+        return len(entry_ids)
+
+    def _matrix(self, scope: str) -> tuple[list[int], np.ndarray]:
+        cached = self._matrices.get(scope)
+        if cached is None:
+            ids = [entry_id for entry_id, entry in self._entries.items() if entry.scope == scope]
+            matrix = np.stack([self._entries[i].vector for i in ids]) if ids else np.empty((0, 0), np.float32)
+            cached = self._matrices[scope] = (ids, matrix)
+        return cached
@@ -0,0 +1,47 @@
+"""Helpers for inspecting ChromaDB-style where filters."""
+
+import json
+
+
+def where_workspace_ids(where) -> list | None:
+    """
+    Workspace ids a Chroma where filter restricts results to, or None when
+    it does not restrict by workspace. Understands plain equality, $eq, $in
+    and top-level $and clauses.
+    """
+    if not where:
+        return None
+    if "$and" in where:
+        for clause in where["$and"]:
+            workspace_ids = where_workspace_ids(clause)
+            if workspace_ids is not None:
+                return workspace_ids
+        return None
+    condition = where.get("workspace_id")
+    if condition is None:
+        return None
+    if isinstance(condition, dict):
+        if "$in" in condition:
+            return list(condition["$in"])
+        if "$eq" in condition:
+            return [condition["$eq"]]
+        return None
+    return [condition]
+
+
+def canonical_where(where) -> str:
+    """
+    Stable string form of a where filter for use in cache keys: dict keys
+    and $in lists are sorted, so equivalent filters share a key.
+    """
+    def canonical(value):
+        if isinstance(value, dict):
+            return {
+                key: sorted(map(canonical, item), key=repr) if key in ("$in", "$nin") else canonical(item)
+                for key, item in value.items()
+            }
+        if isinstance(value, list):
+            return [canonical(item) for item in value]
+        return value
+
+    return json.dumps(canonical(where or {}), sort_keys=True, default=str)
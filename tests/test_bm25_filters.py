@@ -0,0 +1,45 @@
+from src.backend.load.bm25_manager import BM25Manager
+
+CHUNKS = [
+    "quarterly roadmap review notes",
+    "roadmap for the mobile launch",
+    "uploaded roadmap slides",
+    "roadmap draft without a source",
+]
+METADATAS = [
+    {"workspace_id": "A", "source_type": "page", "title": "Review"},
+    {"workspace_id": "B", "source_type": "database_row", "title": "Launch"},
+    {"source_type": "upload", "title": "Slides"},
+    {"workspace_id": "A", "title": "Draft"},
+]
+IDS = ["a-page", "b-row", "upload", "a-draft"]
+
+
+def _manager():
+    manager = BM25Manager()
+    manager.build_index(CHUNKS, METADATAS, IDS)
+    return manager
+
+
+def _ids(manager, where):
+    return {hit["chunk_id"] for hit in manager.search("roadmap", top_k=10, where=where)}
+
+
+def test_ne_on_source_type_excludes_matching_chunks():
+    assert _ids(_manager(), {"source_type": {"$ne": "upload"}}) == {"a-page", "b-row", "a-draft"}
+
+
+def test_nin_on_workspace_id_excludes_listed_workspaces():
+    # Like Chroma, rows without the field are not excluded
+    assert _ids(_manager(), {"workspace_id": {"$nin": ["A"]}}) == {"b-row", "upload"}
+
+
+def test_negated_conditions_combine_with_inclusive_ones():
+    where = {"workspace_id": "A", "source_type": {"$ne": "page"}}
+    assert _ids(_manager(), where) == {"a-draft"}
+
+
+def test_search_many_applies_negated_conditions():
+    where = {"source_type": {"$nin": ["upload", "database_row"]}}
+    results = _manager().search_many(["roadmap", "launch roadmap"], top_k=10, where=where)
+    assert [{hit["chunk_id"] for hit in hits} for hits in results] == [{"a-page", "a-draft"}] * 2
@@ -0,0 +1,82 @@
+import hashlib
+
+import numpy as np
+import pytest
+
+from src.backend.load import chroma_manager
+from src.backend.load.bm25_manager import BM25Manager
+from src.backend.load.embedding_cache import EmbeddingCache
+from src.backend.load.hybrid_retriever import HybridRetriever
+
+
+class FakeEmbedder:
+    """Deterministic stand-in for GoogleEmbedder (no API calls)."""
+
+    cache_namespace = "fake-embedder"
+
+    def __call__(self, texts):
+        return [self._vector(text) for text in texts]
+
+    async def aembed(self, texts):
+        return self(texts)
+
+    @staticmethod
+    def _vector(text):
+        seed = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+        return np.random.default_rng(seed).normal(size=16).astype(np.float32).tolist()
+
+
+CHUNKS = ["sprint planning notes", "sprint retro action items"]
+METADATAS = [
+    {"workspace_id": "A", "parent_id": "p1", "title": "Planning"},
+    {"workspace_id": "A", "parent_id": "p2", "title": "Retro"},
+]
+IDS = ["c1", "c2"]
+
+
+@pytest.fixture(params=[("chroma", "single"), ("numpy", "single"), ("numpy", "per_workspace")])
+def hybrid(request, tmp_path, monkeypatch):
+    backend, layout = request.param
+    monkeypatch.setattr(chroma_manager, "GoogleEmbedder", lambda *args, **kwargs: FakeEmbedder())
+    chroma = chroma_manager.ChromaManager(
+        db_path=str(tmp_path / "db"),
+        embedding_cache=EmbeddingCache(path=str(tmp_path / "cache.sqlite3")),
+        layout=layout,
+        backend=backend,
+    )
+    chroma.upsert_changed(CHUNKS, METADATAS, IDS)
+    bm25 = BM25Manager()
+    bm25.build_index(CHUNKS, METADATAS, IDS)
+    return HybridRetriever(chroma, bm25)
+
+
+def _search(hybrid, where):
+    stats = {}
+    results = hybrid.search("sprint", vector_top_k=5, bm25_top_k=5, final_top_k=5, where=where, stats=stats)
+    return {chunk["chunk_id"] for chunk in results}, stats["cache"]
+
+
+def test_chroma_only_write_invalidates_cached_results(hybrid):
+    where = {"workspace_id": {"$in": ["A"]}}
+    assert _search(hybrid, where) == ({"c1", "c2"}, "miss")
+    assert _search(hybrid, where) == ({"c1", "c2"}, "hit")
+
+    # The ingestion worker updates Chroma alone; the BM25 index is untouched
+    hybrid.chroma.upsert_changed(
+        ["sprint demo agenda"],
+        [{"workspace_id": "A", "parent_id": "p3", "title": "Demo"}],
+        ["c3"],
+    )
+    found, cache = _search(hybrid, where)
+    assert cache == "miss"
+    assert "c3" in found
+
+
+def test_chroma_only_delete_invalidates_cached_results(hybrid):
+    where = {"workspace_id": "A"}
+    assert _search(hybrid, where) == ({"c1", "c2"}, "miss")
+
+    # Re-syncing p2 without chunks drops c2 from Chroma only
+    hybrid.chroma.upsert_changed([], [], [], scope={"parent_id": "p2"})
+    assert _search(hybrid, where)[1] == "miss"
+